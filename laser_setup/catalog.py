@@ -0,0 +1,445 @@
+"""Catalog of the data files, kept in an SQLite database in the data
+directory. Each data file is recorded with its procedure, date and index
+from the file name, size, modification time, number of rows and the
+parameters of its header, so that finding files does not walk the data
+directory nor read their headers.
+
+The catalog is updated incrementally. Directories whose modification time
+has not changed since the last update are skipped, and only files that are
+new or whose size or modification time changed are read again. Files that
+grow without changing their directory, i.e. the runs still being written,
+are found by checking the files of the last few days on every update.
+
+The Dirac point of each IVg file is also kept, so the latest one of a chip
+is found without reading any data. IVg runs store it in their header, and
+for older files it is found from the data once and cached until the file
+changes.
+"""
+import datetime
+import json
+import logging
+import math
+import os
+import posixpath
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from collections.abc import Iterator, Mapping
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .config import CONFIG
+from .storage import ARCHIVE_SUFFIX, BinaryStore, binary_path, open_data
+from .utils import (extract_date_and_number, find_dp, read_file_parameters,
+                    read_pymeasure)
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    procedure TEXT,
+    date TEXT,
+    number INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    rows INTEGER,
+    parameters TEXT
+);
+CREATE INDEX IF NOT EXISTS files_by_procedure ON files (procedure, date, number);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS dirac_points (
+    path TEXT PRIMARY KEY,
+    dirac_point REAL,
+    found INTEGER
+);
+"""
+
+# Header metadata with the Dirac point of an IVg run
+DIRAC_POINT = 'Dirac point'
+
+
+@dataclass
+class CatalogEntry:
+    """A data file recorded in the catalog.
+
+    :param path: Path of the data file
+    :param procedure: Procedure type, taken from the file name
+    :param date: Date of the file name, if any
+    :param number: Index of the file name, if any
+    :param size: Size of the file, in bytes
+    :param mtime_ns: Modification time of the file, in nanoseconds
+    :param rows: Number of data rows. None if the file could not be read
+    :param parameters: Parameters and metadata of the header
+    """
+    path: Path
+    procedure: str = ''
+    date: datetime.date | None = None
+    number: int | None = None
+    size: int = 0
+    mtime_ns: int = 0
+    rows: int | None = 0
+    parameters: dict[str, str] = field(default_factory=dict)
+
+
+def count_rows(file: str | Path) -> int:
+    """Counts the data rows of a data file, excluding the column labels."""
+    if binary_path(file).exists():
+        return BinaryStore(binary_path(file)).rows
+
+    with open_data(file) as f:
+        count = sum(1 for line in f if not line.startswith(b'#'))
+    return max(count - 1, 0)
+
+
+class Catalog:
+    """SQLite catalog of the data files of a data directory.
+
+    :param data_dir: The data directory
+    :param database: Path of the database file
+    :param pattern: Name pattern of the data files
+    :param recent_days: Files up to this number of days old are checked for
+        changes on every update
+    """
+    def __init__(
+        self,
+        data_dir: str | Path,
+        database: str | Path,
+        pattern: str = '*.csv',
+        recent_days: int = 2,
+    ):
+        self.data_dir = Path(data_dir)
+        self.database = Path(database)
+        self.pattern = pattern
+        self.recent_days = recent_days
+        self._lock = threading.Lock()
+
+        self.database.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.database, timeout=10.)) as conn:
+            with conn:
+                yield conn
+
+    def _key(self, path: str | Path) -> str:
+        path = Path(path)
+        try:
+            return path.relative_to(self.data_dir).as_posix()
+        except ValueError:
+            return path.as_posix()
+
+    def _stat(self, path: Path) -> tuple[int, int]:
+        """Returns the size and modification time of a data file. The size
+        includes its binary file, so appending to it is noticed.
+        """
+        stat = path.stat()
+        size = stat.st_size
+        if binary_path(path).exists():
+            size += binary_path(path).stat().st_size
+        return size, stat.st_mtime_ns
+
+    def _row(self, path: Path) -> tuple:
+        try:
+            date, number = extract_date_and_number(path)
+            date = date.date().isoformat()
+        except ValueError:
+            date, number = None, None
+
+        try:
+            parameters = read_file_parameters(path)
+        except (OSError, UnicodeDecodeError) as e:
+            log.warning(f"Could not read the header of {path}: {e}")
+            parameters = {}
+
+        try:
+            rows = count_rows(path)
+        except OSError as e:
+            # Unknown, so the file never matches a maximum number of rows
+            log.warning(f"Could not count the rows of {path}: {e}")
+            rows = None
+
+        return (
+            self._key(path), path.name, re.match(r'\D*', path.stem).group(), date, number,
+            *self._stat(path), rows, json.dumps(parameters),
+        )
+
+    def _match(self, path: Path) -> bool:
+        """Returns whether a file is a data file, archived or not."""
+        return path.match(self.pattern) or path.match(self.pattern + ARCHIVE_SUFFIX)
+
+    def _scan(
+        self, directory: Path, files: dict[str, tuple[int, int]], changed: list[Path]
+    ) -> list[Path]:
+        """Lists a directory, adding its new or modified data files to
+        `changed` and popping the files found from `files`.
+
+        :return: The subdirectories
+        """
+        subdirs = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                path = Path(entry.path)
+                if entry.is_dir():
+                    subdirs.append(path)
+                elif self._match(path) and \
+                        files.pop(self._key(path), None) != self._stat(path):
+                    changed.append(path)
+        return subdirs
+
+    def update(self, full: bool = False) -> int:
+        """Updates the catalog with the changes of the data directory.
+
+        :param full: Lists every directory, not only the changed ones
+        :return: Number of files (re)indexed or removed
+        """
+        with self._lock, self._connect() as conn:
+            known_dirs = dict(conn.execute("SELECT path, mtime_ns FROM directories"))
+            subdirs: dict[str, list[str]] = defaultdict(list)
+            for key in known_dirs:
+                if key != '.':
+                    subdirs[posixpath.dirname(key) or '.'].append(key)
+
+            known_files: dict[str, dict[str, tuple[int, int]]] = defaultdict(dict)
+            for key, size, mtime_ns in conn.execute("SELECT path, size, mtime_ns FROM files"):
+                known_files[posixpath.dirname(key) or '.'][key] = (size, mtime_ns)
+
+            recent = (
+                datetime.date.today() - datetime.timedelta(days=self.recent_days)
+            ).isoformat()
+            recent_files = {
+                key for (key,) in conn.execute("SELECT path FROM files WHERE date >= ?", (recent,))
+            }
+
+            changed: list[Path] = []
+            removed: list[str] = []
+            seen_dirs: dict[str, int] = {}
+            stack = [self.data_dir] if self.data_dir.is_dir() else []
+            while stack:
+                directory = stack.pop()
+                key = self._key(directory)
+                try:
+                    seen_dirs[key] = directory.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                files = known_files.pop(key, {})
+
+                if not full and known_dirs.get(key) == seen_dirs[key]:
+                    # No entries were added or removed, only check the recent files
+                    stack += [self.data_dir / k for k in subdirs[key]]
+                    for file_key in recent_files.intersection(files):
+                        path = self.data_dir / file_key
+                        if not path.exists():
+                            removed.append(file_key)
+                        elif self._stat(path) != files[file_key]:
+                            changed.append(path)
+                    continue
+
+                stack += self._scan(directory, files, changed)
+                removed += files
+
+            for files in known_files.values():
+                removed += files
+
+            conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._row(path) for path in changed)
+            )
+            conn.executemany("DELETE FROM files WHERE path = ?", [(k,) for k in removed])
+            conn.executemany(
+                "DELETE FROM dirac_points WHERE path = ?",
+                [(k,) for k in removed] + [(self._key(path),) for path in changed]
+            )
+            conn.execute("DELETE FROM directories")
+            conn.executemany("INSERT INTO directories VALUES (?, ?)", seen_dirs.items())
+
+        if changed or removed:
+            log.debug(f"Catalog updated: {len(changed)} files indexed, {len(removed)} removed")
+        return len(changed) + len(removed)
+
+    def refresh(self, *paths: str | Path):
+        """Indexes the given files again, or removes them if they no longer
+        exist.
+        """
+        with self._lock, self._connect() as conn:
+            for path in map(Path, paths):
+                conn.execute("DELETE FROM dirac_points WHERE path = ?", (self._key(path),))
+                if path.is_file():
+                    conn.execute(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        self._row(path)
+                    )
+                else:
+                    conn.execute("DELETE FROM files WHERE path = ?", (self._key(path),))
+
+    def entries(
+        self,
+        pattern: str | None = None,
+        procedure: str | None = None,
+        parameters: Mapping[str, str] | None = None,
+        since: datetime.date | None = None,
+        until: datetime.date | None = None,
+        max_rows: int | None = None,
+        latest_first: bool = False,
+        limit: int | None = None,
+        update: bool = True,
+    ) -> list[CatalogEntry]:
+        """Returns the data files matching all the given conditions, sorted
+        by date and index.
+
+        :param pattern: Glob pattern of the file name. Archived files match
+            the pattern of their original name
+        :param procedure: Procedure type
+        :param parameters: Values of header parameters
+        :param since: Earliest date of the file name
+        :param until: Latest date of the file name
+        :param max_rows: Maximum number of data rows. Files whose rows could
+            not be counted never match
+        :param latest_first: Sorts the latest files first
+        :param limit: Maximum number of files to return
+        :param update: Updates the catalog before the query
+        """
+        if update:
+            self.update()
+
+        conditions, values = [], []
+        if pattern is not None:
+            conditions.append("(name GLOB ? OR name GLOB ?)")
+            values += [pattern, pattern + ARCHIVE_SUFFIX]
+        if procedure is not None:
+            conditions.append("procedure = ?")
+            values.append(procedure)
+        for name, value in (parameters or {}).items():
+            conditions.append("json_extract(parameters, ?) = ?")
+            values += [f'$."{name}"', str(value)]
+        if since is not None:
+            conditions.append("date >= ?")
+            values.append(since.isoformat())
+        if until is not None:
+            conditions.append("date <= ?")
+            values.append(until.isoformat())
+        if max_rows is not None:
+            conditions.append("rows <= ?")
+            values.append(max_rows)
+
+        order = 'DESC' if latest_first else 'ASC'
+        query = "SELECT * FROM files"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY date {order}, number {order}, path {order}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        with self._connect() as conn:
+            rows = conn.execute(query, values).fetchall()
+
+        return [CatalogEntry(
+            path=self.data_dir / path,
+            procedure=procedure or '',
+            date=datetime.date.fromisoformat(date) if date else None,
+            number=number,
+            size=size,
+            mtime_ns=mtime_ns,
+            rows=rows,
+            parameters=json.loads(parameters or '{}'),
+        ) for path, _, procedure, date, number, size, mtime_ns, rows, parameters in rows]
+
+    def files(self, pattern: str | None = None, **kwargs) -> list[Path]:
+        """Returns the paths of the data files matching the given conditions.
+        Takes the same arguments as `entries`.
+        """
+        return [entry.path for entry in self.entries(pattern, **kwargs)]
+
+    def dirac_point(self, entry: CatalogEntry, compute: bool = True) -> float:
+        """Returns the Dirac point of an IVg data file. It is read from the
+        header if the run stored it, or else found from the data and cached
+        until the file changes.
+
+        :param entry: The data file
+        :param compute: Finds the Dirac point from the data if it is not
+            indexed yet. Otherwise, NaN is returned
+        :return: The Dirac point, or NaN if none was found
+        """
+        if DIRAC_POINT in entry.parameters:
+            try:
+                return float(entry.parameters[DIRAC_POINT].split()[0])
+            except (ValueError, IndexError):
+                pass
+
+        key = self._key(entry.path)
+        with self._connect() as conn:
+            cached = conn.execute(
+                "SELECT dirac_point, found FROM dirac_points WHERE path = ?", (key,)
+            ).fetchone()
+        if cached is not None:
+            return cached[0] if cached[1] else math.nan
+        if not compute:
+            return math.nan
+
+        try:
+            _, data = read_pymeasure(entry.path, ['Vg (V)', 'I (A)'], dtype=float)
+            dirac_point = float(find_dp(data))
+        except Exception as e:
+            log.warning(f"Could not find the Dirac point of {entry.path}: {e}")
+            dirac_point = math.nan
+
+        found = math.isfinite(dirac_point)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO dirac_points VALUES (?, ?, ?)",
+                (key, dirac_point if found else None, int(found))
+            )
+        return dirac_point
+
+    def latest_dirac_point(
+        self, chip_group: str, chip_number: int | str, sample: str, max_files: int = 1
+    ) -> tuple[float, Path | None]:
+        """Returns the latest Dirac point of a chip, from its IVg data files.
+        Only the catalog is read: the data directory is not scanned, and the
+        Dirac points that are not indexed yet, see the "Index Dirac points"
+        script, are skipped.
+
+        :param chip_group: The chip group name
+        :param chip_number: The chip number
+        :param sample: The sample name
+        :param max_files: The maximum number of IVg files of the chip to look
+            at, starting from the latest one
+        :return: The Dirac point and its data file, or NaN and None
+        """
+        for entry in self.entries(procedure='IVg', parameters={
+            'Chip group name': chip_group,
+            'Chip number': str(chip_number),
+            'Sample': sample,
+        }, latest_first=True, limit=max_files, update=False):
+            dirac_point = self.dirac_point(entry, compute=False)
+            if math.isfinite(dirac_point):
+                return dirac_point, entry.path
+
+        return math.nan, None
+
+
+_catalogs: dict[Path, Catalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Returns the catalog of the configured data directory. It can be
+    called from several threads, e.g. the GUI and the background cleanup.
+    """
+    data_dir = Path(CONFIG.Dir.data_dir)
+    database = data_dir / CONFIG.Dir.catalog
+    with _catalogs_lock:
+        if database not in _catalogs:
+            _catalogs[database] = Catalog(
+                data_dir, database, pattern=f"*.{CONFIG.Filename.ext}"
+            )
+        return _catalogs[database]
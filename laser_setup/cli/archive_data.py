@@ -0,0 +1,47 @@
+import datetime
+import logging
+
+from ..catalog import get_catalog
+from ..config import CONFIG
+from ..storage import archive_file, is_archived
+
+log = logging.getLogger(__name__)
+
+
+def archive_data(days: int | None = None, parent=None):
+    """Compresses the data files older than a number of days with gzip. The
+    archived files stay in the catalog, and are read transparently.
+
+    :param days: Age of the files to archive, in days, from the date of the
+        file name. Defaults to the configured `Dir.archive_days`
+    """
+    days = CONFIG.Dir.archive_days if days is None else days
+    until = datetime.date.today() - datetime.timedelta(days=days)
+    catalog = get_catalog()
+    entries = [e for e in catalog.entries(until=until) if not is_archived(e.path)]
+
+    archived = []
+    size = 0
+    for i, entry in enumerate(entries):
+        if parent is not None:
+            parent.status_bar.showMessage(f'Archiving data ({i+1}/{len(entries)})')
+        else:
+            print(f'Archiving data ({i+1}/{len(entries)})', end='\r')
+
+        try:
+            archived.append(archive_file(entry.path))
+            size += entry.size - archived[-1].stat().st_size
+        except OSError as e:
+            log.error(f"Error archiving {entry.path}: {e}. Skipping.")
+
+    catalog.refresh(*(e.path for e in entries), *archived)
+    log.info(f"Archived {len(archived)} data files, saving {size / 1e6:.1f} MB")
+    if parent is not None:
+        parent.status_bar.showMessage('Done', 3000)
+    else:
+        print('Done' + ' '*30)
+
+
+def main(parent=None):
+    """Archive old data"""
+    archive_data(parent=parent)
@@ -74,7 +74,7 @@ def main(parent=None):
 
     for path in path_to_files:
         try:
-            data = read_pymeasure(path)
+            data = read_pymeasure(path, ['VL (V)', 'Power (W)'], dtype=float)
             print(f"File: '{Path(path)}'")
 
             for power in powers:
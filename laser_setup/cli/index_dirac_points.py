@@ -0,0 +1,34 @@
+import logging
+import math
+
+from ..catalog import get_catalog
+
+log = logging.getLogger(__name__)
+
+
+def index_dirac_points(parent=None):
+    """Finds the Dirac point of every IVg data file that does not have one
+    in its header or in the catalog yet, and stores it in the catalog, so the
+    lookups of `get_latest_DP` do not have to read any data.
+    """
+    catalog = get_catalog()
+    entries = catalog.entries(procedure='IVg')
+    found = 0
+    for i, entry in enumerate(entries):
+        if parent is not None:
+            parent.status_bar.showMessage(f'Indexing Dirac points ({i+1}/{len(entries)})')
+        else:
+            print(f'Indexing Dirac points ({i+1}/{len(entries)})', end='\r')
+
+        found += math.isfinite(catalog.dirac_point(entry))
+
+    log.info(f"Found the Dirac point of {found} of {len(entries)} IVg files")
+    if parent is not None:
+        parent.status_bar.showMessage('Done', 3000)
+    else:
+        print('Done' + ' '*30)
+
+
+def main(parent=None):
+    """Index Dirac points"""
+    index_dirac_points(parent=parent)
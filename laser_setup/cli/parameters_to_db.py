@@ -4,8 +4,9 @@ import logging
 from pathlib import Path
 from typing import Dict, Set
 
+from ..catalog import get_catalog
 from ..config import CONFIG
-from ..utils import read_file_parameters, get_data_files
+from ..utils import read_file_parameters
 
 log = logging.getLogger(__name__)
 all_params: Dict[str, Set[str]] = {}
@@ -47,8 +48,9 @@ def insert_data_with_columns(
     ''', [row_name] + row_filled)
 
 
-def add_to_parameters_db(csv_file: Path, conn: sqlite3.Connection):
-    params = read_file_parameters(csv_file)
+def add_to_parameters_db(csv_file: Path, conn: sqlite3.Connection, params: dict | None = None):
+    if params is None:
+        params = read_file_parameters(csv_file)
 
     # Use the base filename as the row name
     basename = csv_file.stem
@@ -69,7 +71,7 @@ def add_to_parameters_db(csv_file: Path, conn: sqlite3.Connection):
 
 
 def create_db(parent=None):
-    csv_files = get_data_files()
+    entries = get_catalog().entries()
     new_db: Path = Path(CONFIG.Dir.data_dir) / CONFIG.Dir.database
 
     new_db.parent.mkdir(parents=True, exist_ok=True)
@@ -86,16 +88,16 @@ def create_db(parent=None):
         new_db.touch()
 
     with sqlite3.connect(new_db) as conn:
-        for i, csv_file in enumerate(csv_files):
+        for i, entry in enumerate(entries):
             if parent is not None:
-                parent.status_bar.showMessage(f'Processing database ({i+1}/{len(csv_files)})')
+                parent.status_bar.showMessage(f'Processing database ({i+1}/{len(entries)})')
             else:
-                print(f'Processing database ({i+1}/{len(csv_files)})', end='\r')
+                print(f'Processing database ({i+1}/{len(entries)})', end='\r')
 
             try:
-                add_to_parameters_db(csv_file, conn)
+                add_to_parameters_db(entry.path, conn, entry.parameters)
             except Exception as e:
-                log.error(f"Error reading file {csv_file}: {e}. Skipping.")
+                log.error(f"Error reading file {entry.path}: {e}. Skipping.")
                 continue
 
         if parent is not None:
@@ -61,6 +61,14 @@ class DirConfig:
         default='database.db',
         metadata={'title': 'Database file', 'type': 'str'}
     )
+    catalog: str = field(
+        default='catalog.db',
+        metadata={'title': 'Catalog file', 'type': 'str'}
+    )
+    archive_days: int = field(
+        default=365,
+        metadata={'title': 'Archive data older than (days)', 'type': 'int'}
+    )
 
 
 @dataclass
@@ -227,6 +235,14 @@ class FilenameConfig:
         default='%Y-%m-%d',
         metadata={'title': 'Datetime format'}
     )
+    backend: str = field(
+        default='csv',
+        metadata={'title': 'Storage backend', 'type': 'list', 'limits': ['csv', 'npy']}
+    )
+    export_csv: bool = field(
+        default=False,
+        metadata={'title': 'Export CSV on completion', 'type': 'bool'}
+    )
 
 
 @dataclass
@@ -294,6 +310,14 @@ class AppConfig:
                 name="Find calibration voltage",
                 target='${function:laser_setup.cli.find_calibration_voltage.main}'
             ),
+            'index_dirac_points': MenuItemConfig(
+                name="Index Dirac points",
+                target='${function:laser_setup.cli.index_dirac_points.main}'
+            ),
+            'archive_data': MenuItemConfig(
+                name="Archive old data",
+                target='${function:laser_setup.cli.archive_data.main}'
+            ),
         },
         metadata={'title': 'Scripts', 'readonly': True}
     )
@@ -1,4 +1,5 @@
 import sys
+import threading
 from pathlib import Path
 
 from pymeasure.experiment import Procedure
@@ -135,8 +136,13 @@ def display_window(procedure: type[Procedure] | None = None, **kwargs):
 
     splash.finish(window)
     window.show()
+
+    # Removes the empty data files in the background, once the window is shown
+    cleanup = threading.Thread(target=remove_empty_data, name='remove_empty_data')
+    QtCore.QTimer.singleShot(0, cleanup.start)
     app.exec()
-    remove_empty_data()
+    if cleanup.is_alive():
+        cleanup.join()
 
 
 def _patch_taskbar_icon():
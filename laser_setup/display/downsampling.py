@@ -0,0 +1,173 @@
+"""Min/max downsampling of the curves of long runs. A MinMaxPyramid keeps,
+for each level, the indices of the minimum and maximum of every bucket of
+`factor ** level` points, and is extended as points are appended. A plot
+then draws, for the visible range, the level with about two points per
+pixel, so drawing a curve costs the same for any number of points while
+keeping every peak visible.
+"""
+import numpy as np
+
+
+class _IndexBuffer:
+    """Growable array of indices."""
+    def __init__(self):
+        self._values = np.empty(64, dtype=np.int64)
+        self.size = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._values[:self.size]
+
+    def extend(self, values: np.ndarray):
+        size = self.size + len(values)
+        if size > len(self._values):
+            grown = np.empty(max(size, 2 * len(self._values)), dtype=np.int64)
+            grown[:self.size] = self._values[:self.size]
+            self._values = grown
+        self._values[self.size:size] = values
+        self.size = size
+
+
+class MinMaxPyramid:
+    """Multi-resolution min/max decimation of a curve.
+
+    :param factor: Number of buckets of a level merged into one bucket of
+        the next level
+    :param min_size: Number of points below which curves are not decimated
+    """
+    def __init__(self, factor: int = 4, min_size: int = 4096):
+        self.factor = factor
+        self.min_size = min_size
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def clear(self):
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.monotonic = True
+        self._levels: list[tuple[_IndexBuffer, _IndexBuffer]] = []
+
+    @staticmethod
+    def _argextremes(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the positions of the minimum and maximum of each row of
+        `values`, ignoring NaN values.
+        """
+        nan = np.isnan(values)
+        return (
+            np.where(nan, np.inf, values).argmin(axis=1),
+            np.where(nan, -np.inf, values).argmax(axis=1),
+        )
+
+    def _extremes(self, indices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the indices of the minimum and maximum of the points of
+        each row of `indices`.
+        """
+        rows = np.arange(len(indices))
+        amin, amax = self._argextremes(self.y[indices])
+        return indices[rows, amin], indices[rows, amax]
+
+    def update(self, x: np.ndarray, y: np.ndarray):
+        """Updates the pyramid with the current points of the curve. Points
+        appended since the last update are added to the levels, and the
+        pyramid is rebuilt if the earlier points changed.
+
+        :param x: The x values of all the points
+        :param y: The y values of all the points
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        size = len(self.x)
+        if len(x) < size or (size and (x[0] != self.x[0] or x[size - 1] != self.x[-1])):
+            self.clear()
+            size = 0
+
+        if size == 0:
+            self.monotonic = bool(np.all(np.diff(x) >= 0))
+        elif len(x) > size:
+            self.monotonic = self.monotonic and bool(np.all(np.diff(x[size - 1:]) >= 0))
+        self.x, self.y = x, y
+
+        # Extends each level with its new complete buckets
+        below = None
+        for level in range(1, len(x)):
+            bucket = self.factor ** level
+            if len(x) < bucket:
+                break
+            if level > len(self._levels):
+                self._levels.append((_IndexBuffer(), _IndexBuffer()))
+
+            imin, imax = self._levels[level - 1]
+            start, stop = imin.size, len(x) // bucket
+            if stop > start:
+                if below is None:
+                    offsets = np.arange(start, stop) * bucket
+                    amin, amax = self._argextremes(
+                        y[start * bucket:stop * bucket].reshape(-1, bucket)
+                    )
+                    new_min, new_max = offsets + amin, offsets + amax
+                else:
+                    lmin, lmax = below
+                    span = slice(start * self.factor, stop * self.factor)
+                    new_min = self._extremes(lmin.values[span].reshape(-1, self.factor))[0]
+                    new_max = self._extremes(lmax.values[span].reshape(-1, self.factor))[1]
+                imin.extend(new_min)
+                imax.extend(new_max)
+            below = (imin, imax)
+
+    def _indices(self, start: int, stop: int, width: int) -> list[np.ndarray]:
+        """Returns the indices of the points drawn for the range
+        [start, stop), with about two points per pixel.
+        """
+        if stop - start <= 2 * width or not self._levels:
+            return [np.arange(start, stop)]
+
+        level = min(
+            len(self._levels),
+            int(np.ceil(np.log((stop - start) / width) / np.log(self.factor)))
+        )
+        bucket = self.factor ** level
+        imin, imax = self._levels[level - 1]
+        first = min(-(-start // bucket), imin.size)
+        last = max(min(stop // bucket, imin.size), first)
+
+        indices = [
+            imin.values[first:last], imax.values[first:last], np.array([start, stop - 1])
+        ]
+        # Partial buckets at the edges of the range
+        for a, b in ((start, first * bucket), (last * bucket, stop)):
+            if b > a:
+                indices += list(self._extremes(np.arange(a, b).reshape(1, -1)))
+        return indices
+
+    def view(
+        self, x_range: tuple[float, float] | None = None, width: int = 1000
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the points to draw for a view of the curve. If the x values
+        are increasing, the visible range is drawn at the resolution of the
+        view and the rest at the resolution of the whole curve, so the data
+        bounds of the curve are kept.
+
+        :param x_range: The visible range of x values. Defaults to all
+        :param width: The width of the view, in pixels
+        :return: The x and y values of the points
+        """
+        size = len(self.x)
+        width = max(int(width), 1)
+        if size <= max(self.min_size, 2 * width):
+            return self.x, self.y
+
+        start, stop = 0, size
+        if x_range is not None and self.monotonic:
+            start = max(int(np.searchsorted(self.x, x_range[0])) - 1, 0)
+            stop = min(int(np.searchsorted(self.x, x_range[1], side='right')) + 1, size)
+
+        indices = self._indices(start, stop, width)
+        if start > 0:
+            indices += self._indices(0, start, width)
+        if stop < size:
+            indices += self._indices(stop, size, width)
+
+        indices = np.unique(np.concatenate(indices))
+        return self.x[indices], self.y[indices]
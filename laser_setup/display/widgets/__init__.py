@@ -1,4 +1,5 @@
 from .config_widget import ConfigWidget
+from .heatmap_widget import HeatmapWidget
 from .log_widget import LogsWidget, LogWidget
 from .sqlite_widget import SQLiteWidget
 from .text_widget import TextWidget
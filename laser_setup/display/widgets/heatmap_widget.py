@@ -0,0 +1,128 @@
+import logging
+
+import numpy as np
+import pyqtgraph as pg
+from pymeasure.display.widgets import ImageWidget
+from pymeasure.display.widgets.image_frame import ImageFrame
+from pymeasure.experiment import Results
+
+from ..Qt import QtCore, QtWidgets
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class ResultsHeatmap(pg.ImageItem):
+    """Heatmap of a data column over the grid of two other columns, updated
+    incrementally from a Results object. The grid is given by the
+    `heatmap_grid` method of the procedure, and every sample fills its
+    nearest cell, so later samples overwrite earlier ones. Samples outside
+    the grid are not shown.
+    """
+    def __init__(self, results: Results, x: str, y: str, z: str, wdg=None, **kwargs):
+        self.results = results
+        self.wdg = wdg
+        self.x = x
+        self.y = y
+        self._z = z
+
+        x_grid, y_grid = results.procedure.heatmap_grid()
+        self.x_grid = np.sort(np.asarray(x_grid, dtype=float))
+        self.y_grid = np.sort(np.asarray(y_grid, dtype=float))
+        self.values = np.full((len(self.x_grid), len(self.y_grid)), np.nan)
+        self._rows = 0
+
+        super().__init__()
+        self.setColorMap(pg.colormap.get('viridis'))
+
+        dx, dy = self._cell(self.x_grid), self._cell(self.y_grid)
+        self.setRect(QtCore.QRectF(
+            self.x_grid[0] - dx / 2, self.y_grid[0] - dy / 2,
+            len(self.x_grid) * dx, len(self.y_grid) * dy,
+        ))
+
+    @property
+    def z(self) -> str:
+        return self._z
+
+    @z.setter
+    def z(self, z: str):
+        if z != self._z:
+            self.values.fill(np.nan)
+            self._rows = 0
+        self._z = z
+
+    @staticmethod
+    def _cell(grid: np.ndarray) -> float:
+        return float(np.diff(grid).mean()) if len(grid) > 1 else 1.
+
+    @classmethod
+    def _index(cls, grid: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the indices of the nearest grid cells of the values, and a
+        mask of the values that fall within the grid.
+        """
+        half = cls._cell(grid) / 2
+        index = np.searchsorted((grid[1:] + grid[:-1]) / 2, values)
+        inside = (values >= grid[0] - half) & (values <= grid[-1] + half)
+        return index, inside
+
+    def update_data(self):
+        x, y, z = self.results.get_columns(self.x, self.y, self.z)
+        if len(x) < self._rows:
+            self.values.fill(np.nan)
+            self._rows = 0
+
+        new = slice(self._rows, len(x))
+        self._rows = len(x)
+        if new.start == new.stop:
+            return
+
+        x_index, x_inside = self._index(self.x_grid, x[new])
+        y_index, y_inside = self._index(self.y_grid, y[new])
+        inside = x_inside & y_inside
+        self.values[x_index[inside], y_index[inside]] = z[new][inside]
+
+        finite = self.values[np.isfinite(self.values)]
+        levels = (finite.min(), finite.max()) if finite.size else (0., 1.)
+        if levels[0] == levels[1]:
+            levels = (levels[0] - 1., levels[1] + 1.)
+
+        self.setImage(self.values, autoLevels=False, levels=levels)
+
+
+class HeatmapFrame(ImageFrame):
+    ResultsClass = ResultsHeatmap
+
+
+class HeatmapWidget(ImageWidget):
+    """Live heatmap of a procedure that defines a `heatmap_grid` method, e.g.
+    a map over two voltages. The column shown as color can be changed.
+    """
+    def _setup_ui(self):
+        self.columns_z_label = QtWidgets.QLabel(self)
+        self.columns_z_label.setMaximumSize(QtCore.QSize(45, 16777215))
+        self.columns_z_label.setText('Z Axis:')
+
+        self.columns_z = QtWidgets.QComboBox(self)
+        for column in self.columns:
+            self.columns_z.addItem(column)
+        self.columns_z.activated.connect(self.update_z_column)
+
+        self.image_frame = HeatmapFrame(
+            self.x_axis,
+            self.y_axis,
+            self.columns[0],
+            self.refresh_time,
+            self.check_status
+        )
+        self.updated = self.image_frame.updated
+        self.plot = self.image_frame.plot
+
+    def new_curve(self, results: Results, color=None, **kwargs) -> ResultsHeatmap:
+        return ResultsHeatmap(
+            results,
+            wdg=self,
+            x=self.image_frame.x_axis,
+            y=self.image_frame.y_axis,
+            z=self.image_frame.z_axis,
+        )
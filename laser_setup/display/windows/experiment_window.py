@@ -1,4 +1,5 @@
 import logging
+import threading
 import time
 
 from pymeasure.display.widgets import PlotFrame, PlotWidget
@@ -6,10 +7,12 @@ from pymeasure.display.widgets.dock_widget import DockWidget
 from pymeasure.display.windows import ManagedWindowBase
 from pymeasure.experiment import Procedure, Results, unique_filename
 
+from ...catalog import get_catalog
 from ...config import CONFIG, configurable
 from ...procedures import BaseProcedure
+from ...storage import split_filename_config
 from ..Qt import QtCore, QtGui, QtWidgets
-from ..widgets import LogWidget, TextWidget
+from ..widgets import HeatmapWidget, LogWidget, TextWidget
 
 log = logging.getLogger(__name__)
 
@@ -67,6 +70,9 @@ class ExperimentWindow(ManagedWindowBase):
                 plot_widget.plot_frame.plot_widget.setBackground('k')
 
         widget_list = (self.plot_widget, self.log_widget, self.text_widget, self.dock_widget)
+        if hasattr(cls, 'HEATMAP'):
+            self.heatmap_widget = HeatmapWidget("Heatmap", cls.DATA_COLUMNS, *cls.HEATMAP)
+            widget_list = (self.plot_widget, self.heatmap_widget, *widget_list[1:])
 
         super().__init__(
             procedure_class=cls,
@@ -97,6 +103,7 @@ class ExperimentWindow(ManagedWindowBase):
         self.queue_button.setText('&Queue')
 
         self.browser_widget.browser.measured_quantities.update([self.x_axis, self.y_axis])
+        self.manager.finished.connect(self.index_results)
 
         self.log = logging.getLogger()
         self.log.addHandler(self.log_widget.handler)
@@ -106,7 +113,7 @@ class ExperimentWindow(ManagedWindowBase):
         if procedure is None:
             procedure = self.make_procedure()
 
-        filename_kwargs: dict = dict(CONFIG.Filename).copy()
+        filename_kwargs, storage_kwargs = split_filename_config(CONFIG.Filename)
         prefix = filename_kwargs.pop('prefix', '') or type(procedure).__name__
         filename = unique_filename(CONFIG.Dir.data_dir,
                                    prefix=prefix, **filename_kwargs)
@@ -115,11 +122,21 @@ class ExperimentWindow(ManagedWindowBase):
         if hasattr(procedure, 'pre_startup') and callable(procedure.pre_startup):
             procedure.pre_startup()
 
-        results = Results(procedure, filename)
+        results = Results(procedure, filename, **storage_kwargs)
         experiment = self.new_experiment(results)
 
         self.manager.queue(experiment)
 
+    def index_results(self, experiment):
+        """Indexes the data files of a finished experiment in the catalog, in
+        the background, so lookups that do not scan the data directory, like
+        the latest Dirac point of a chip, find them.
+        """
+        threading.Thread(
+            target=get_catalog().refresh, args=experiment.results.data_filenames,
+            name='index_results', daemon=True,
+        ).start()
+
     def closeEvent(self, event: QtGui.QCloseEvent):
         if self.manager.is_running():
             reply = QtWidgets.QMessageBox.question(
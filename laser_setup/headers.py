@@ -0,0 +1,217 @@
+"""Cache of the parsed headers of the data files. Headers are keyed by the
+path of the file together with its size and modification time, so a cached
+header is used only while the file is unchanged. The latest headers are
+kept in memory, with least recently used eviction, and the headers of the
+files in the data directory are also stored in an SQLite table, so they
+are not read again in later sessions.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .storage import open_data
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS headers (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    text TEXT,
+    count INTEGER,
+    parameters TEXT
+);
+"""
+
+
+@dataclass(frozen=True)
+class Header:
+    """The header of a data file.
+
+    :param text: The header lines, as parsed by `Results.parse_header`
+    :param count: Number of lines of the header
+    :param parameters: Parameters and metadata of the header, by name
+    """
+    text: str
+    count: int
+    parameters: dict[str, str] = field(default_factory=dict, compare=False)
+
+    @classmethod
+    def from_text(cls, text: str, count: int) -> 'Header':
+        parameters = {}
+        for line in text.split('\n'):
+            if line.startswith('#Data:'):
+                break           # The column labels follow
+
+            if ':' in line:
+                if line.startswith(('#Parameters:', '#Metadata:')):
+                    continue    # Skip these lines
+
+                key, value = map(str.strip, line.split(':', 1))
+                key = key.lstrip('#\t')
+                parameters[key] = value
+        return cls(text, count, parameters)
+
+
+def parse_file_header(filename: str | Path, encoding: str = 'utf-8') -> Header:
+    """Reads the header of a data file: its comment lines up to the column
+    labels.
+    """
+    lines = []
+    with open_data(filename, 'r', encoding=encoding) as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            # Trailing spaces are dropped, so the padding of the Metadata
+            # section is not cached
+            lines.append(line.strip('\t\v\n\r\f').rstrip(' '))
+    return Header.from_text('\n'.join(lines), len(lines))
+
+
+class HeaderCache:
+    """Cache of the parsed headers of the data files.
+
+    :param data_dir: The data directory. Only the headers of its files are
+        stored in the database
+    :param database: Path of the database file. The headers are only kept
+        in memory if None
+    :param maxsize: Number of headers kept in memory
+    """
+    def __init__(
+        self,
+        data_dir: str | Path | None = None,
+        database: str | Path | None = None,
+        maxsize: int = 1024,
+    ):
+        self.data_dir = None if data_dir is None else Path(os.path.abspath(data_dir))
+        self.database = None if database is None else Path(database)
+        self.maxsize = maxsize
+        self._memory: OrderedDict[str, tuple[tuple[int, int], Header]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the connection to the database, opened on first use. A
+        single connection is kept, since opening one costs more than reading
+        a header.
+        """
+        if self._conn is None:
+            self.database.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.database, timeout=10., check_same_thread=False)
+            # The headers can be read again, so they are not synced to disk
+            self._conn.execute("PRAGMA synchronous = OFF")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _key(self, path: Path) -> str | None:
+        """Returns the key of a file in the database, or None if its header
+        is not stored there.
+        """
+        if self.database is None or self.data_dir is None:
+            return None
+        try:
+            return path.relative_to(self.data_dir).as_posix()
+        except ValueError:
+            return None
+
+    def _load(self, key: str, stat: tuple[int, int]) -> Header | None:
+        try:
+            with self._db_lock:
+                row = self._connection().execute(
+                    "SELECT text, count, parameters FROM headers "
+                    "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                    (key, *stat)
+                ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            log.debug(f"Could not read the header cache {self.database}: {e}")
+            return None
+        if row is None:
+            return None
+        text, count, parameters = row
+        return Header(text, count, json.loads(parameters))
+
+    def _store(self, key: str, stat: tuple[int, int], header: Header):
+        try:
+            with self._db_lock, self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, *stat, header.text, header.count, json.dumps(header.parameters))
+                )
+        except (sqlite3.Error, OSError) as e:
+            log.debug(f"Could not write the header cache {self.database}: {e}")
+
+    def get(self, filename: str | Path, encoding: str = 'utf-8') -> Header:
+        """Returns the header of a data file, reading it only if the file
+        changed since it was cached.
+
+        :param filename: Path of the data file
+        :param encoding: Encoding of the data file
+        :return: The parsed header
+        """
+        path = Path(os.path.abspath(filename))
+        stat = os.stat(path)
+        stat = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._memory.get(str(path))
+            if cached is not None and cached[0] == stat:
+                self._memory.move_to_end(str(path))
+                return cached[1]
+
+        key = self._key(path)
+        header = None if key is None else self._load(key, stat)
+        if header is None:
+            header = parse_file_header(path, encoding)
+            if key is not None:
+                self._store(key, stat, header)
+
+        with self._lock:
+            self._memory[str(path)] = (stat, header)
+            self._memory.move_to_end(str(path))
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+        return header
+
+    def clear(self):
+        """Removes the cached headers from memory and from the database."""
+        with self._lock:
+            self._memory.clear()
+        if self.database is not None:
+            with self._db_lock, self._connection() as conn:
+                conn.execute("DELETE FROM headers")
+
+    def close(self):
+        """Closes the connection to the database."""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_caches: dict[Path, HeaderCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_header_cache() -> HeaderCache:
+    """Returns the header cache of the configured data directory. Its
+    headers are stored in the catalog database.
+    """
+    from .config import CONFIG
+    data_dir = Path(CONFIG.Dir.data_dir)
+    database = data_dir / CONFIG.Dir.catalog
+    with _caches_lock:
+        if database not in _caches:
+            _caches[database] = HeaderCache(data_dir, database)
+        return _caches[database]
+
+
+def read_header(filename: str | Path, encoding: str = 'utf-8') -> Header:
+    """Returns the header of a data file, from the header cache."""
+    return get_header_cache().get(filename, encoding)
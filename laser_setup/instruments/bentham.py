@@ -124,8 +124,20 @@ class Bentham(SCPIMixin, Instrument):
 
     def set_wavelength(self, wavelength: float, timeout: float = 10.):
         """Sets the wavelength to the specified value."""
+        self.set_monochromator(wavelength)
+        self.set_filter(wavelength)
+
+    def set_monochromator(self, wavelength: float):
+        """Moves only the monochromator to the specified wavelength. The filter
+        wheel is left in place, so the output stays dark if it was.
+        """
         self.mono = wavelength
         self.move
+
+    def set_filter(self, wavelength: float):
+        """Moves the filter wheel to the position matching the specified
+        wavelength.
+        """
         self.filt = wavelength
         self.move
 
@@ -2,6 +2,7 @@ import logging
 import time
 from typing import TypeVar
 
+import numpy as np
 from pymeasure.instruments import Instrument
 from pymeasure.instruments.keithley import Keithley2450 as _Keithley2450
 from pymeasure.instruments.keithley import Keithley6517B  # noqa: F401
@@ -75,6 +76,7 @@ class Songs:
 
 class Keithley2450(_Keithley2450):
     buffer_name: str = "defbuffer1"
+    buffer_size: int = 100_000
     buffer_modes = ['CONT', 'ONCE']
 
     def __init__(self, adapter: str, name: str = None, includeSCPI=False, **kwargs):
@@ -99,6 +101,7 @@ class Keithley2450(_Keithley2450):
 
         self.write(f':TRACe:MAKE "{name}", {int(size)}')
         self.buffer_name = name
+        self.buffer_size = int(size)
         self.write(f'TRACe:FILL:MODE {mode}')
 
     def clear_buffer(self, name: str = None):
@@ -121,6 +124,68 @@ class Keithley2450(_Keithley2450):
         time = float(self.ask(f':READ? "{self.buffer_name}", REL')[:-1])
         return time
 
+    def get_reading(self, elements: tuple[str, ...] = ('READ', 'SOUR')) -> np.ndarray:
+        """Takes a reading into the buffer and returns some of its elements.
+        With source readback on, 'SOUR' is the measured source value.
+
+        :param elements: Buffer elements to return. The default is the
+            measured value and the source value
+        :return: Array with one value per element
+        """
+        values = self.ask(f':READ? "{self.buffer_name}", {", ".join(elements)}')
+        return np.array(values.split(','), dtype=float)
+
+    def start_buffer(self, duration: float = 100_000., delay: float = 0.):
+        """Starts taking readings into the buffer, timed by the instrument
+        itself, until `stop_buffer` is called or the duration passes. The
+        readings are then fetched in bulk with `get_buffer_data`. The readings
+        stop after the duration, check `buffer_running` to start them again.
+
+        :param duration: Maximum duration of the acquisition, in seconds
+        :param delay: Delay between readings, in seconds
+        """
+        self.write(
+            f':TRIGger:LOAD "DurationLoop", {duration:g}, {delay:g}, "{self.buffer_name}"'
+        )
+        self.write(':INITiate')
+
+    def buffer_running(self) -> bool:
+        """Returns whether the readings started by `start_buffer` are still
+        being taken, from the state of the trigger model.
+        """
+        state = self.ask(':TRIGger:STATe?').split(';')[0].strip()
+        return state in ('RUNNING', 'WAITING', 'BUILDING')
+
+    def stop_buffer(self):
+        """Stops the readings started by `start_buffer`."""
+        self.write(':ABORt')
+
+    def buffer_end(self) -> int:
+        """Returns the index of the latest reading in the buffer, or 0 if it
+        is empty. In 'CONT' mode, the index wraps around the buffer size.
+        """
+        return int(self.ask(f':TRACe:ACTual:END? "{self.buffer_name}"'))
+
+    def get_buffer_data(
+        self, start: int, end: int, elements: tuple[str, ...] = ('REL', 'READ', 'SOUR')
+    ) -> np.ndarray:
+        """Returns the readings of the buffer from index `start` to `end`,
+        both included, in a single query.
+
+        :param start: Index of the first reading, from 1
+        :param end: Index of the last reading
+        :param elements: Buffer elements to read. The default is the relative
+            time, the measured value and the source value
+        :return: Array with one row per reading and one column per element
+        """
+        if end < start:
+            return np.empty((0, len(elements)))
+
+        values = self.ask(
+            f':TRACe:DATA? {start}, {end}, "{self.buffer_name}", {", ".join(elements)}'
+        )
+        return np.array(values.split(','), dtype=float).reshape(-1, len(elements))
+
     def shutdown(self):
         for freq, t in Songs.samsung:
             if freq != 0:
@@ -1,13 +1,25 @@
 """Implements QoL patches for the PyMeasure library.
 """
 import logging
+import os
+import threading
+from collections.abc import Iterator, Mapping, Sequence
 from contextlib import contextmanager
 from enum import IntEnum
 from functools import wraps
-
-from pymeasure.experiment import Procedure, Results, Parameter
+from logging.handlers import QueueListener
+
+import numpy as np
+import pandas as pd
+from pymeasure.experiment import Procedure, Results, Parameter, Worker
+from pymeasure.experiment.listeners import Recorder
+from pymeasure.experiment.results import CSVFormatter
+from pymeasure.display.curves import ResultsCurve
 from pymeasure.display.inputs import Input
 
+from . import headers, storage
+from .display.downsampling import MinMaxPyramid
+
 log = logging.getLogger(__name__)
 
 
@@ -30,12 +42,119 @@ class Status(IntEnum):
 for status in Status:
     setattr(Procedure, status.name, status)
 
+
+class ResultsBatch:
+    """Block of result rows sent as a single 'results' message. It is built
+    from a 2D array (one row per sample, columns in the given order) or from
+    a mapping of column names to 1D arrays. Consumers of the 'results' topic
+    receive the whole block at once instead of one dictionary per sample.
+
+    :param columns: Names of the columns in the block
+    :param values: 2D array with shape (rows, len(columns))
+    """
+    __slots__ = ('columns', 'values')
+
+    def __init__(self, columns: Sequence[str], values: np.ndarray):
+        self.columns = list(columns)
+        self.values = values
+
+    @classmethod
+    def from_data(
+        cls,
+        data: 'np.ndarray | Sequence | Mapping[str, Sequence]',
+        columns: Sequence[str] | None = None,
+    ) -> 'ResultsBatch':
+        """Creates a batch from a 2D array-like or from column arrays.
+
+        :param data: 2D array-like with one row per sample, or a mapping of
+            column names to 1D arrays of the same length
+        :param columns: Column names of a 2D array. Ignored for mappings
+        :return: The batch of results
+        """
+        if isinstance(data, Mapping):
+            columns = list(data.keys())
+            values = np.column_stack([np.asarray(v) for v in data.values()]) \
+                if columns else np.empty((0, 0))
+
+        else:
+            values = np.asarray(data)
+            if values.ndim == 1:
+                values = values.reshape(1, -1)
+
+            if columns is None or len(columns) < values.shape[1]:
+                raise ValueError(
+                    f"Got {values.shape[1]} columns of data but only {len(columns or [])} names"
+                )
+            columns = list(columns)[:values.shape[1]]
+
+        return cls(columns, values)
+
+    def __len__(self) -> int:
+        return self.values.shape[0]
+
+    def __repr__(self) -> str:
+        return f"<ResultsBatch rows={len(self)} columns={self.columns}>"
+
+    def rows(self) -> Iterator[dict]:
+        """Iterates over the rows of the batch as dictionaries."""
+        for row in self.values.tolist():
+            yield dict(zip(self.columns, row))
+
+    def to_array(self, columns: Sequence[str]) -> np.ndarray:
+        """Returns the values as a float array with the given column order.
+        Columns missing from the batch are filled with NaN.
+
+        :param columns: Column order of the returned array
+        """
+        if self.columns == list(columns) and self.values.dtype.kind == 'f':
+            return self.values
+
+        array = np.full((len(self), len(columns)), np.nan)
+        for j, column in enumerate(columns):
+            if column in self.columns:
+                array[:, j] = self.values[:, self.columns.index(column)]
+        return array
+
+
+# CSVFormatter
+_CSVFormatter_format = CSVFormatter.format
+
+
+@wraps(_CSVFormatter_format)
+def format(self: CSVFormatter, record):
+    """Formats a record as csv. A ResultsBatch is formatted as one line per
+    row in a single call, so that the Recorder writes it in one operation.
+    """
+    if not isinstance(record, ResultsBatch):
+        return _CSVFormatter_format(self, record)
+
+    try:
+        values = record.to_array(self.columns)
+    except (TypeError, ValueError):
+        # Non-numeric data, fall back to formatting row by row
+        return Results.LINE_BREAK.join(
+            _CSVFormatter_format(self, row) for row in record.rows()
+        )
+
+    return Results.LINE_BREAK.join(map(self.delimiter.join, values.astype(str).tolist()))
+
+
+CSVFormatter.format = format
+
 # Results
 Results.EXCLUDE = 'EXCLUDE'
+# Bytes reserved in the header of new data files for the Metadata section
+Results.METADATA_RESERVE = 4096
 
 _Results_init = Results.__init__
+_Results_header = Results.header
 _Results_reload = Results.reload
 _Results_parse_header = Results.parse_header
+_Results_load = Results.load
+_Results_data = Results.data
+_Results_getstate = Results.__getstate__
+# Serializes header rewrites with reads of the data file
+_Results_file_lock = threading.RLock()
 
 
 @contextmanager
@@ -56,11 +175,36 @@ def supress_logs(logger_name: str, level: int = logging.WARNING):
 
 
 @wraps(_Results_init)
-def __init__(self: Results, procedure: Procedure, data_filename: str):
+def __init__(
+    self: Results,
+    procedure: Procedure,
+    data_filename: str,
+    backend: str | None = None,
+    export_csv: bool = False,
+):
     """Overwrites the Results class to exclude parameters from the save file.
     Excludes parameters in the EXCLUDE list attribute of the procedure class.
     Restores those parameters to their default values after saving for consistency.
+
+    Adds the storage backend of the rows, 'csv' or 'npy'. The backend of an
+    existing data file is found from its files.
+
+    :param backend: Storage backend of a new data file. Defaults to 'csv'
+    :param export_csv: Exports the rows of a binary data file as CSV when
+        the run finishes
     """
+    first_filename = data_filename[0] if isinstance(data_filename, (list, tuple)) \
+        else data_filename
+    if storage.binary_path(first_filename).exists():
+        backend = 'npy'
+    elif os.path.exists(first_filename) or backend is None:
+        backend = 'csv'
+    elif backend not in storage.BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}'. Use one of {storage.BACKENDS}")
+
+    self.backend = backend
+    self.export_csv = export_csv
+
     unsaved_parameters: dict[str, Parameter] = {}
     if isinstance(procedure, Procedure):
         for key in getattr(procedure, Results.EXCLUDE, []):
@@ -71,6 +215,13 @@ def __init__(self: Results, procedure: Procedure, data_filename: str):
     _Results_init(self, procedure, data_filename)
     procedure._parameters.update(unsaved_parameters)
 
+    if self.backend == 'npy':
+        for filename in self.data_filenames:
+            if not storage.binary_path(filename).exists():
+                storage.BinaryStore(
+                    storage.binary_path(filename), len(self.procedure.DATA_COLUMNS)
+                )
+
 
 @staticmethod
 @wraps(_Results_parse_header)
@@ -80,19 +231,303 @@ def parse_header(header: str, procedure_class=None):
         return _Results_parse_header(header, procedure_class)
 
 
+@staticmethod
+@wraps(_Results_load)
+def load(data_filename: str, procedure_class=None) -> Results:
+    """Reads the header of the data file from the header cache, so loading
+    a file again does not read its header unless the file changed.
+    """
+    header = headers.read_header(data_filename, Results.ENCODING)
+    procedure = Results.parse_header(header.text, procedure_class)
+    results = Results(procedure, data_filename)
+    results._header_count = header.count
+    return results
+
+
+def _live(self: Results) -> 'storage.LiveStore | None':
+    """Returns the live store of the results, if they are read from it. Once
+    the run is over, a store that dropped its oldest rows is left for the
+    data file, which holds all of them.
+    """
+    live = getattr(self, 'live', None)
+    if live is not None and live.dropped and self.procedure.status != Procedure.RUNNING:
+        return None
+    return live
+
+
 @wraps(_Results_reload)
 def reload(self: Results):
-    """Reloads the data from the file, ensuring missing columns are present."""
-    _Results_reload(self)
+    """Reloads the data from the file, ensuring missing columns are present.
+    Only the rows appended since the last reload are parsed, and the
+    columns missing from the file are added when it is first read. Results
+    with a live store are read from memory and are not reloaded.
+    """
+    if _live(self) is not None:
+        return
+
+    with _Results_file_lock:
+        if getattr(self, '_tail', None) is None:
+            self._tail = storage.TailReader(self.data_filename, Results.ENCODING)
+
+        rows, restart = self._tail.read()
+        if restart or self._data is None:
+            missing_cols = [col for col in self.procedure.DATA_COLUMNS if col not in rows.columns]
+            self._data = rows.reindex(columns=[*rows.columns, *missing_cols])
+        elif len(rows):
+            self._data = pd.concat(
+                [self._data, rows.reindex(columns=self._data.columns)], ignore_index=True
+            )
+
+
+@property
+@wraps(_Results_data.fget)
+def data(self: Results):
+    if (live := _live(self)) is not None:
+        return live.frame()
+
+    with _Results_file_lock:
+        try:
+            self.reload()
+        except Exception:
+            # Empty dataframe
+            self._data = pd.DataFrame(columns=self.procedure.DATA_COLUMNS)
+            self._tail = None
+        return self._data
+
+
+def get_columns(self: Results, *names: str, start: int = 0) -> tuple[np.ndarray, ...]:
+    """Returns the values of some data columns. Results of a run are read
+    from its live store without copies, other results from their data. While
+    a long run is going, the live store only holds its latest rows.
+
+    :param names: Names of the columns
+    :param start: First row to return
+    :return: One array per column
+    """
+    if (live := _live(self)) is not None:
+        return tuple(live.column(name, start) for name in names)
+
+    data = self.data
+    return tuple(data[name].to_numpy(dtype=float)[start:] for name in names)
+
+
+@wraps(_Results_getstate)
+def __getstate__(self: Results):
+    """Leaves the live store out of the pickled state."""
+    state = _Results_getstate(self)
+    state.pop('live', None)
+    return state
 
-    missing_cols = [col for col in self.procedure.DATA_COLUMNS if col not in self._data.columns]
-    for col in missing_cols:
-        self._data[col] = float('nan')  # Add missing columns with NaN values
+
+def write(self: Results, record):
+    """Appends a row dictionary or a ResultsBatch to the data files, outside
+    of a Recorder.
+
+    :param record: The rows to write
+    """
+    if getattr(self, 'backend', 'csv') == 'npy':
+        values = storage.to_rows(record, self.procedure.DATA_COLUMNS)
+        for filename in self.data_filenames:
+            store = storage.BinaryStore(storage.binary_path(filename))
+            store.append(values)
+            store.close()
+        return
+
+    for filename in self.data_filenames:
+        with open(filename, 'a', encoding=Results.ENCODING) as f:
+            f.write(self.format(record) + Results.LINE_BREAK)
+
+
+@wraps(_Results_header)
+def header(self: Results) -> str:
+    """Reserves a Metadata section before the column labels, padded to
+    `Results.METADATA_RESERVE` bytes with a blank comment line. Metadata
+    is then written over the padding, so the header keeps its size and the
+    data rows are never moved.
+    """
+    h = _Results_header(self).split(Results.LINE_BREAK)
+    padding = Results.COMMENT + ' ' * (Results.METADATA_RESERVE - 1)
+    h[-2:-2] = [Results.COMMENT + "Metadata:", padding]
+    self._header_count += 2
+    self._metadata_count = 1
+    return Results.LINE_BREAK.join(h)
+
+
+def _is_padding(line: bytes) -> bool:
+    """Whether a header line is the padding of the Metadata section."""
+    return line.startswith(b'# ') and not line.rstrip(b'\r\n').strip(b' #')
+
+
+def append_metadata(self: Results, metadata: Mapping):
+    """Writes values obtained during the run at the end of the Metadata
+    section of the header, over its padding. The header keeps its size, so
+    this is safe while rows are appended to the file. Files without padding
+    left are not changed.
+
+    :param metadata: Dictionary with the names and values to store
+    """
+    if not metadata:
+        return
+
+    lines = [
+        Results.COMMENT + "\t{}: {}".format(
+            name, str(value).encode("unicode_escape").decode("utf-8")
+        ) for name, value in metadata.items()
+    ]
+    with _Results_file_lock:
+        for filename in self.data_filenames:
+            with open(filename, 'r+b') as f:
+                offset = 0
+                for line in f:
+                    if not line.startswith(b'#') or _is_padding(line):
+                        break
+                    offset += len(line)
+                else:
+                    line = b''
+
+                line_break = line[len(line.rstrip(b'\r\n')):]
+                block = line_break.join(line.encode(Results.ENCODING) for line in lines) \
+                    + line_break
+                if not _is_padding(line) or len(block) + 2 > len(line.rstrip(b'\r\n')):
+                    log.warning(
+                        f"No space left for metadata in the header of {filename}, "
+                        f"not stored: {dict(metadata)}"
+                    )
+                    return
+
+                padding = b'#'.ljust(len(line) - len(block) - len(line_break)) + line_break
+                f.seek(offset)
+                f.write(block + padding)
+
+        self._header_count += len(lines)
+        self._metadata_count = max(self._metadata_count, 1) + len(metadata)
+
+
+def store_metadata(self: Results):
+    """Writes the metadata of the procedure in the reserved Metadata section
+    of the header.
+    """
+    self.append_metadata({
+        metadata.name: metadata for metadata in self.procedure.metadata_objects().values()
+    })
 
 
 Results.__init__ = __init__
 Results.parse_header = parse_header
+Results.load = load
 Results.reload = reload
+Results.data = data
+Results.header = header
+Results.append_metadata = append_metadata
+Results.store_metadata = store_metadata
+Results.write = write
+Results.get_columns = get_columns
+Results.__getstate__ = __getstate__
+
+# Recorder
+_Recorder_init = Recorder.__init__
+
+
+@wraps(_Recorder_init)
+def __init__(self: Recorder, results: Results, queue, **kwargs):
+    """Writes the results of a binary data file with a BinaryHandler."""
+    if getattr(results, 'backend', 'csv') != 'npy':
+        return _Recorder_init(self, results, queue, **kwargs)
+
+    handlers = [
+        storage.BinaryHandler(
+            filename, results.procedure.DATA_COLUMNS, export=results.export_csv
+        ) for filename in results.data_filenames
+    ]
+    QueueListener.__init__(self, queue, *handlers)
+
+
+Recorder.__init__ = __init__
+
+# Worker
+_Worker_init = Worker.__init__
+_Worker_emit = Worker.emit
+
+
+@wraps(_Worker_init)
+def __init__(self: Worker, results: Results, *args, **kwargs):
+    """Creates the live store of the results, which is shared with the
+    procedure as its `live` attribute.
+    """
+    _Worker_init(self, results, *args, **kwargs)
+    results.live = storage.LiveStore(results.procedure.DATA_COLUMNS)
+    results.procedure.live = results.live
+
+
+@wraps(_Worker_emit)
+def emit(self: Worker, topic: str, record):
+    """Handles the 'metadata' topic by storing the record in the header of
+    the data file, and appends the results to the live store before they are
+    written.
+    """
+    if topic == 'metadata':
+        self.results.append_metadata(record)
+    elif topic == 'results':
+        self.results.live.append(storage.to_rows(record, self.results.live.columns))
+
+    _Worker_emit(self, topic, record)
+
+
+Worker.__init__ = __init__
+Worker.emit = emit
+
+# ResultsCurve
+_ResultsCurve_update_data = ResultsCurve.update_data
+_ResultsCurve_viewRangeChanged = ResultsCurve.viewRangeChanged
+
+
+def set_view_data(self: ResultsCurve, force: bool = False):
+    """Draws the points of the downsampling pyramid of the curve for the
+    visible x range and the width of the view. The points are only set again
+    if the view changed, or if `force` is True.
+    """
+    x_range, width = None, 1000
+    if (view := self.getViewBox()) is not None:
+        width = max(int(view.width()), 1)
+        if not view.autoRangeEnabled()[0]:
+            x_range = tuple(view.viewRange()[0])
+            if self.opts['logMode'][0]:
+                x_range = tuple(10 ** np.array(x_range))
+
+    if force or getattr(self, '_view', None) != (x_range, width):
+        self._view = (x_range, width)
+        self.setData(*self.pyramid.view(x_range, width))
+
+
+@wraps(_ResultsCurve_update_data)
+def update_data(self: ResultsCurve):
+    """Reads the curve data from the columns of the results, and draws it
+    through a min/max downsampling pyramid, so long runs are drawn with about
+    two points per pixel.
+    """
+    if self.force_reload:
+        self.results.reload()
+
+    if getattr(self, 'pyramid', None) is None:
+        self.pyramid = MinMaxPyramid()
+    if self.force_reload:
+        self.pyramid.clear()
+
+    self.pyramid.update(*self.results.get_columns(self.x, self.y))
+    self.set_view_data(force=True)
+
+
+@wraps(_ResultsCurve_viewRangeChanged)
+def viewRangeChanged(self: ResultsCurve, *args, **kwargs):
+    """Draws the downsampling level that matches the new view."""
+    if getattr(self, 'pyramid', None) is not None:
+        self.set_view_data()
+    _ResultsCurve_viewRangeChanged(self, *args, **kwargs)
+
+
+ResultsCurve.update_data = update_data
+ResultsCurve.set_view_data = set_view_data
+ResultsCurve.viewRangeChanged = viewRangeChanged
 
 # Parameter
 Parameter.__doc__ += """
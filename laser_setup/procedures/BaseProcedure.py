@@ -1,6 +1,8 @@
 import logging
 import time
-from collections.abc import Mapping, MutableMapping
+import weakref
+from collections.abc import Callable, Iterator, Mapping, MutableMapping, Sequence
+from contextlib import contextmanager
 from functools import wraps
 from typing import Any
 
@@ -9,6 +11,12 @@ from pymeasure.experiment import (BooleanParameter, Metadata, Parameter,
 
 from ..config import CONFIG, configurable
 from ..instruments import InstrumentManager
+from ..patches import ResultsBatch
+from ..storage import LiveStore
+from .pipeline import SamplePublisher
+from .scheduler import SampleScheduler
+from .timeline import SteadyState, Timeline
+from .utils import Parameters
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
@@ -34,6 +42,9 @@ class BaseProcedure(Procedure):
     :attr EXCLUDE: List of parameters to exclude from the save file
     :attr DATA_COLUMNS: List of data columns
     :attr SEQUENCER_INPUTS: List of inputs for the sequencer
+    :attr progress_interval: Minimum time between progress updates, in seconds
+    :attr live: In-memory results of the run, set by the Worker. Long runs
+        only keep their latest rows in it (see `LiveStore`)
     """
     name: str = ""
 
@@ -47,6 +58,13 @@ class BaseProcedure(Procedure):
     skip_startup = BooleanParameter("Skip startup", default=False, group_by='show_more')
     skip_shutdown = BooleanParameter("Skip shutdown", default=False, group_by='show_more')
 
+    # Steady-state early termination of timeline segments, shown by the
+    # procedures that list them in INPUTS
+    steady_state_stop = Parameters.Control.steady_state_stop
+    steady_state_tol = Parameters.Control.steady_state_tol
+    steady_state_window = Parameters.Control.steady_state_window
+    steady_state_hold = Parameters.Control.steady_state_hold
+
     # Metadata
     start_time = Metadata("Start time", fget="time.time")
     # Access to time module as attribute for Metadata.fget
@@ -55,6 +73,11 @@ class BaseProcedure(Procedure):
     INPUTS: list[str] = ['show_more', 'skip_startup', 'skip_shutdown', 'info']
     EXCLUDE: list[str] = ['show_more', 'skip_startup', 'skip_shutdown']
 
+    progress_interval: float = 0.2
+    live: LiveStore | None = None
+    _running: weakref.ReferenceType | None = None
+    _deferred_metadata: dict[str, Any] | None = None
+
     def connect_instruments(self):
         """Connects all queued instruments via the InstrumentManager,
         replacing the InstrumentProxy instances with actual instrument instances.
@@ -87,11 +110,169 @@ class BaseProcedure(Procedure):
         """
         self.override_parameters(parameters or {})
         super().__init__(**kwargs)
+        self._last_progress = float('-inf')
 
         # Wrap methods to skip execution
         self.startup = self._wrap_skip(self.startup, 'skip_startup', self.connect_instruments)
         self.shutdown = self._wrap_skip(self.shutdown, 'skip_shutdown')
 
+    def set_running(self):
+        """Registers this instance as the running procedure of its class. The
+        estimator widget calls `get_estimates` on a new instance made from the
+        inputs, which can then reach the data of the running one with
+        `get_running`.
+        """
+        type(self)._running = weakref.ref(self)
+
+    def get_running(self) -> 'BaseProcedure | None':
+        """Returns the running (or last run) procedure of this class, if it
+        still exists.
+        """
+        ref = type(self).__dict__.get('_running')
+        return ref() if ref is not None else None
+
+    def emit_progress(self, progress: float, force: bool = False):
+        """Emits the progress of the procedure. Updates are coalesced so that
+        at most one is sent every `progress_interval` seconds. The final update,
+        at 100%, is always sent.
+
+        :param progress: Progress percentage, from 0 to 100
+        :param force: Emit the progress even if the interval has not passed
+        """
+        now = time.monotonic()
+        if not force and progress < 100 and now - self._last_progress < self.progress_interval:
+            return
+
+        self._last_progress = now
+        self.emit('progress', progress)
+
+    def emit_batch(
+        self,
+        data: ResultsBatch | Any,
+        columns: Sequence[str] | None = None,
+        progress: float | None = None,
+    ):
+        """Emits many rows of results in a single message. The Recorder writes
+        the whole batch at once, instead of one line per emitted dictionary.
+
+        :param data: A ResultsBatch, a 2D array with one row per sample, or a
+            mapping of column names to 1D arrays
+        :param columns: Column names of a 2D array. Defaults to DATA_COLUMNS
+        :param progress: If given, the progress is emitted after the batch
+        """
+        if not isinstance(data, ResultsBatch):
+            data = ResultsBatch.from_data(data, columns or self.DATA_COLUMNS)
+
+        if len(data) > 0:
+            self.emit('results', data)
+
+        if progress is not None:
+            self.emit_progress(progress)
+
+    def emit_metadata(self, metadata: Mapping[str, Any]):
+        """Stores values obtained during the run (e.g. timing statistics) in the
+        Metadata section of the data file header. While a publisher is
+        running, the values are kept and stored once it has stopped.
+
+        :param metadata: Dictionary with the names and values to store
+        """
+        if self._deferred_metadata is not None:
+            self._deferred_metadata.update(metadata)
+        elif metadata:
+            self.emit('metadata', dict(metadata))
+
+    @contextmanager
+    def publisher(
+        self,
+        columns: Sequence[str] | None = None,
+        progress: Callable[[Any], float] | None = None,
+        **kwargs
+    ) -> Iterator[SamplePublisher]:
+        """Runs a publisher thread for the duration of the context. Samples
+        pushed to it from the acquisition loop are emitted in batches from the
+        publisher thread, together with the progress. The drop statistics are
+        logged and stored in the run metadata when the context exits, after
+        the publisher thread has stopped, together with the metadata emitted
+        while it was running.
+
+        :param columns: Columns of the pushed samples. Defaults to DATA_COLUMNS
+        :param progress: Function that returns the progress given the last sample
+        :param kwargs: Additional arguments for the SamplePublisher
+        """
+        publisher = SamplePublisher(self, columns or self.DATA_COLUMNS, progress, **kwargs)
+        deferred, self._deferred_metadata = self._deferred_metadata, {}
+        publisher.start()
+        try:
+            yield publisher
+
+        finally:
+            publisher.stop()
+            stats = publisher.stats()
+            log_level = logging.WARNING if stats['Samples dropped'] else logging.DEBUG
+            log.log(log_level, f"Publisher statistics: {stats}")
+            metadata, self._deferred_metadata = self._deferred_metadata, deferred
+            self.emit_metadata(metadata | stats)
+
+    @contextmanager
+    def scheduler(self, period: float, **kwargs) -> Iterator[SampleScheduler]:
+        """Paces a sampling loop on a fixed grid of a monotonic clock for the
+        duration of the context. Call `wait` at the end of each sample. The
+        timing statistics are logged and stored in the run metadata when the
+        context exits.
+
+        :param period: Target sampling period, in seconds
+        :param kwargs: Additional arguments for the SampleScheduler
+        """
+        scheduler = SampleScheduler(period, **kwargs)
+        try:
+            yield scheduler
+
+        finally:
+            stats = scheduler.stats()
+            log_level = logging.WARNING if scheduler.missed else logging.DEBUG
+            log.log(log_level, f"Scheduler statistics: {stats}")
+            self.emit_metadata(stats)
+
+    def run_timeline(
+        self,
+        timeline: Timeline,
+        read: Callable[[], Sequence[float]],
+        period: float = 0.,
+    ) -> bool:
+        """Runs a timeline in a single acquisition loop, publishing the samples
+        and pacing them with a scheduler.
+
+        :param timeline: Timeline with the segments to run
+        :param read: Function that takes a sample and returns its measured
+            values, starting with the time
+        :param period: Target sampling period, in seconds
+        :return: False if the measurement was aborted
+        """
+        with self.scheduler(period) as scheduler, \
+                self.publisher(timeline.columns, progress=timeline.progress) as publisher:
+            completed = timeline.run(read, publisher.push, scheduler.wait, self.should_stop)
+
+        if not completed:
+            log.warning('Measurement aborted')
+        self.emit_metadata(timeline.stats())
+        return completed
+
+    def steady_state(self, index: int = 1, absolute: bool = False) -> SteadyState | None:
+        """Returns the steady-state criterion of the timeline segments, from
+        the steady_state_stop, steady_state_tol, steady_state_window and
+        steady_state_hold parameters. None if the criterion is disabled.
+
+        :param index: Index of the monitored value in the read values
+        :param absolute: The tolerance is in the units of the monitored value
+        """
+        if not self.steady_state_stop:
+            return None
+
+        return SteadyState(
+            self.steady_state_tol, self.steady_state_window, self.steady_state_hold, index,
+            absolute,
+        )
+
     def override_parameters(self, parameters: Mapping[str, Any]):
         """Override the procedure parameters with a dictionary. It will update
         the instance attributes with the new values.
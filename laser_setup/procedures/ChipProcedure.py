@@ -1,8 +1,12 @@
 import logging
+from functools import wraps
 
-from .BaseProcedure import BaseProcedure
-from .utils import Parameters
+from ..config import CONFIG
+from ..instruments import InstrumentProxy
 from ..utils import send_telegram_alert
+from .BaseProcedure import BaseProcedure
+from .devices import Device, MeterPool, parse_devices
+from .utils import Instruments, Parameters
 
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
@@ -19,7 +23,105 @@ class ChipProcedure(BaseProcedure):
 
     INPUTS = BaseProcedure.INPUTS + ['chip_group', 'chip_number', 'sample']
 
+    extra_devices: list[Device]
+    meter_pool: MeterPool | None = None
+
+    def __init__(self, *args, **kwargs):
+        """Wraps the execute method so the extra devices are closed when it
+        ends, even if shutdown is skipped.
+        """
+        super().__init__(*args, **kwargs)
+        self.extra_devices = []
+
+        execute = self.execute
+
+        @wraps(execute)
+        def wrapper(*args, **kwargs):
+            try:
+                return execute(*args, **kwargs)
+            finally:
+                self.close_devices()
+
+        self.execute = wrapper
+
+    def pre_startup(self):
+        self.check_devices()
+
+    def check_devices(self) -> list[Device]:
+        """Parses the `devices` parameter and checks that each extra device is
+        read by its own configured meter, other than the main meter, so a
+        wrong entry fails before any instrument is connected.
+
+        :return: The list of devices
+        :raises ValueError: If an instrument is not configured, is given to
+            more than one device or is the main meter of the procedure
+        """
+        devices = parse_devices(getattr(self, 'devices', ''))
+
+        main = getattr(type(self), 'meter', None)
+        main_keys = set()
+        if isinstance(main, InstrumentProxy):
+            main_keys = {
+                key for key, config in Instruments.items()
+                if (config.target, config.adapter, config.get('name')) ==
+                (main.instrument_class, main.adapter, main.name)
+            }
+
+        seen = set()
+        for device in devices:
+            if device.instrument not in Instruments:
+                raise ValueError(f"Instrument '{device.instrument}' is not configured")
+            if device.instrument in main_keys:
+                raise ValueError(
+                    f"Instrument '{device.instrument}' is the main meter of the procedure"
+                )
+            if device.instrument in seen:
+                raise ValueError(
+                    f"Instrument '{device.instrument}' is given to more than one device"
+                )
+            seen.add(device.instrument)
+
+        return devices
+
+    def connect_devices(self) -> MeterPool:
+        """Connects the meters of the extra devices, given by the `devices`
+        parameter of the procedure, and pools them with the main meter so they
+        can be read concurrently.
+
+        :return: The pool of meters, with the main meter first
+        """
+        self.extra_devices = self.check_devices()
+        for device in self.extra_devices:
+            config = Instruments[device.instrument]
+            device.meter = self.instruments.connect(
+                instrument_class=config.target,
+                adapter=config.adapter,
+                name=config.get('name'),
+                debug=CONFIG._session.args.debug,
+                **config.get('kwargs', {})
+            )
+
+        self.meter_pool = MeterPool([self.meter] + [d.meter for d in self.extra_devices])
+        return self.meter_pool
+
+    def open_devices(self):
+        """Creates the data files of the extra devices."""
+        for device in self.extra_devices:
+            device.open(self)
+
+    def close_devices(self):
+        """Writes the remaining rows of the extra devices and stops the pool.
+        It can be called more than once.
+        """
+        for device in self.extra_devices:
+            device.flush()
+
+        if self.meter_pool is not None:
+            self.meter_pool.close()
+            self.meter_pool = None
+
     def shutdown(self):
+        self.close_devices()
         if not self.should_stop() and self.status >= self.RUNNING:
             send_telegram_alert(
                 f"Finished {type(self).__name__} measurement for Chip "
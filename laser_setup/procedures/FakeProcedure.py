@@ -4,9 +4,7 @@ from types import SimpleNamespace
 
 import numpy as np
 from pymeasure.experiment import FloatParameter
-from scipy.signal import find_peaks
 
-from ..utils import voltage_sweep_ramp
 from .BaseProcedure import BaseProcedure
 from .IVg import IVg
 from .utils import Parameters
@@ -21,7 +19,6 @@ class FakeProcedure(BaseProcedure):
     total_time = FloatParameter('Total time', units='s', default=10.)
     INPUTS = BaseProcedure.INPUTS + ['total_time', 'fake_parameter']
     DATA_COLUMNS = ['t (s)', 'fake_data']
-    DATA = [[0], [0]]
 
     def startup(self):
         log.info("Starting fake procedure.")
@@ -30,15 +27,14 @@ class FakeProcedure(BaseProcedure):
         log.info("Executing fake procedure.")
         t0 = time.time()
         tc = t0
+        self.set_running()
         while tc - t0 < self.total_time:
             if self.should_stop():
                 log.warning('Measurement aborted')
                 break
 
-            self.emit('progress', (tc - t0)/self.total_time*100)
+            self.emit_progress((tc - t0)/self.total_time*100)
             data = self.fake_parameter + hash(tc-t0) % 1000 / 1000
-            self.DATA[0].append(tc - t0)
-            self.DATA[1].append(data)
             self.emit('results', dict(zip(self.DATA_COLUMNS, [tc - t0, data])))
             time.sleep(0.2)
             tc = time.time()
@@ -47,9 +43,11 @@ class FakeProcedure(BaseProcedure):
         log.info("Shutting down fake procedure.")
 
     def get_estimates(self):
+        procedure = self.get_running() or self
+        data = procedure.live.column('fake_data') if procedure.live is not None else []
         estimates = [
             ('Fake Estimate', f"{self.fake_parameter + hash(time.time()) % 1000 / 1000:.2f}"),
-            ('Data average', f"{sum(self.DATA[1])/len(self.DATA[1]):.2f}")
+            ('Data average', f"{np.mean(data) if len(data) else 0.:.2f}")
         ]
         return estimates
 
@@ -83,9 +81,6 @@ class FakeIVg(IVg):
     Irange = Parameters.Instrument.Irange
     NPLC = Parameters.Instrument.NPLC
 
-    # Fix Data not defined for get_estimates. TODO: Find a better way to handle this.
-    DATA = [[], []]
-
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.tenma_laser = None if not self.laser_toggle else self.tenma_laser
@@ -102,14 +97,14 @@ class FakeIVg(IVg):
         self.meter.source_voltage = self.vds
 
         # Set the Vg ramp and the measuring loop
-        self.vg_ramp = voltage_sweep_ramp(self.vg_start, self.vg_end, self.vg_step)
-        type(self).DATA[0] = list(self.vg_ramp)
-        for i, vg in enumerate(self.vg_ramp):
+        sweep = self.make_sweep()
+        self.set_running()
+        for vg in sweep:
             if self.should_stop():
                 log.warning('Measurement aborted')
                 break
 
-            self.emit('progress', 100 * i / len(self.vg_ramp))
+            self.emit_progress(sweep.progress)
 
             self.tenma_neg.voltage = -vg * (vg < 0)
             self.tenma_pos.voltage = vg * (vg >= 0)
@@ -118,35 +113,12 @@ class FakeIVg(IVg):
 
             current = self.meter.current + np.random.normal(0, 1e-7) + 1e-9*vg**2
 
-            type(self).DATA[1].append(current)
+            sweep.update(vg, current)
+            self.dp_estimator.update(vg, current)
             self.emit(
                 'results',
-                dict(zip(self.DATA_COLUMNS, [vg, type(self).DATA[1][-1]]))
+                dict(zip(self.DATA_COLUMNS, [vg, current]))
             )
 
-    def shutdown(self):
-        type(self).DATA = [[], []]
-        super().shutdown()
-
-    def get_estimates(self):
-        """Estimate the Dirac Point.
-        """
-        try:
-            x = np.array(type(self).DATA[0])
-            y = np.array(type(self).DATA[1])
-            if x.size == 0 or y.size == 0:
-                raise ValueError("Data is empty")
-
-            R = 1/y
-
-            # Find peaks in the resistance data
-            peaks, _ = find_peaks(R)
-
-            estimates = [
-                ('Dirac Point', f"{x[peaks].mean():.1f}"),
-            ]
-            return estimates
-
-        except Exception as e:
-            log.debug(e)
-            return [('Dirac Point', 'None')]
+        if self.adaptive_sweep:
+            self.emit_metadata(sweep.stats())
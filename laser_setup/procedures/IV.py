@@ -5,6 +5,7 @@ from ..instruments import (TENMA, Keithley2450, PT100SerialSensor,
                            InstrumentManager)
 from ..utils import get_latest_DP, voltage_ds_sweep_ramp
 from .ChipProcedure import ChipProcedure
+from .sweeps import AdaptiveSweep, FixedSweep
 from .utils import Parameters, Instruments
 
 log = logging.getLogger(__name__)
@@ -42,13 +43,16 @@ class IV(ChipProcedure):
     # Additional Parameters, preferably don't change
     sense_T = Parameters.Instrument.sense_T
     vsd_step = Parameters.Control.vsd_step
+    adaptive_sweep = Parameters.Control.adaptive_sweep
+    max_points = Parameters.Control.max_points
     step_time = Parameters.Control.step_time
     Irange = Parameters.Instrument.Irange
     NPLC = Parameters.Instrument.NPLC
 
     INPUTS = ChipProcedure.INPUTS + [
         'vg_toggle', 'vg', 'vsd_start', 'vsd_end', 'vsd_step', 'Irange', 'step_time',
-        'laser_toggle', 'laser_wl', 'laser_v', 'burn_in_t', 'sense_T', 'NPLC'
+        'laser_toggle', 'laser_wl', 'laser_v', 'burn_in_t', 'sense_T', 'NPLC', 'adaptive_sweep',
+        'max_points'
     ]
     DATA_COLUMNS = ['Vsd (V)', 'I (A)'] + PT100SerialSensor.DATA_COLUMNS
     SEQUENCER_INPUTS = ['laser_v', 'vg', 'vds']
@@ -127,13 +131,13 @@ class IV(ChipProcedure):
         temperature_data = ()
 
         # Set the Vsd ramp and the measuring loop
-        self.vsd_ramp = voltage_ds_sweep_ramp(self.vsd_start, self.vsd_end, self.vsd_step)
-        for i, vsd in enumerate(self.vsd_ramp):
+        sweep = self.make_sweep()
+        for vsd in sweep:
             if self.should_stop():
                 log.warning('Measurement aborted')
                 break
 
-            self.emit('progress', 100 * i / len(self.vsd_ramp))
+            self.emit_progress(sweep.progress)
 
             self.meter.source_voltage = vsd
 
@@ -143,6 +147,26 @@ class IV(ChipProcedure):
             if self.sense_T:
                 temperature_data = self.temperature_sensor.data
 
+            sweep.update(vsd, current)
             self.emit('results', dict(zip(
                 self.DATA_COLUMNS, [vsd, current, *temperature_data]
             )))
+
+        if self.adaptive_sweep:
+            self.emit_metadata(sweep.stats())
+
+    def make_sweep(self) -> FixedSweep | AdaptiveSweep:
+        """Creates the drain-source sweep of the run. The adaptive sweep has
+        the same vertices as `voltage_ds_sweep_ramp`, and refines its step
+        around 0 V.
+        """
+        if not self.adaptive_sweep:
+            self.vsd_ramp = voltage_ds_sweep_ramp(self.vsd_start, self.vsd_end, self.vsd_step)
+            return FixedSweep(self.vsd_ramp)
+
+        return AdaptiveSweep(
+            [0., self.vsd_start, self.vsd_end, 0.],
+            self.vsd_step,
+            self.max_points,
+            focus=lambda: 0.,
+        )
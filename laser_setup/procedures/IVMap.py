@@ -0,0 +1,91 @@
+import logging
+import math
+import time
+
+import numpy as np
+
+from ..instruments import PT100SerialSensor
+from .IVg import IVg
+from .utils import Parameters
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class IVMap(IVg):
+    """Measures a gate sweep for each drain-source voltage in a range, with
+    the same instruments as IVg. The instruments are configured once for the
+    whole map, and all the sweeps are written to a single data file, with a
+    live heatmap of the current over the (Vg, Vsd) grid.
+    """
+    name = 'I vs Vg, Vsd map'
+
+    # The drain-source voltage is set by the outer loop
+    vds = None
+
+    # Important Parameters
+    vsd_start = Parameters.Control.vsd_start
+    vsd_end = Parameters.Control.vsd_end
+    vsd_step = Parameters.Control.vsd_step
+
+    INPUTS = IVg.INPUTS[:IVg.INPUTS.index('vds')] + [
+        'vsd_start', 'vsd_end', 'vsd_step'
+    ] + IVg.INPUTS[IVg.INPUTS.index('vds') + 1:]
+    DATA_COLUMNS = ['Vg (V)', 'I (A)', 'Vsd (V)'] + PT100SerialSensor.DATA_COLUMNS
+    HEATMAP = ('Vg (V)', 'Vsd (V)', 'I (A)')
+
+    def execute(self):
+        log.info("Starting the measurement")
+        self.open_devices()
+        self.meter_pool.read(lambda m: m.clear_buffer())
+
+        # Set the laser if toggled and wait for burn-in
+        if self.laser_toggle:
+            self.tenma_laser.voltage = self.laser_v
+            log.info(
+                f"Laser is ON. Sleeping for {self.burn_in_t} seconds to let the current stabilize."
+            )
+            time.sleep(self.burn_in_t)
+
+        vsd_values = self.vsd_values()
+        points = 0
+        dirac_points = []
+        dirac_point = math.nan
+        self.set_running()
+        for i, vsd in enumerate(vsd_values):
+            log.info(f"Sweeping the gate at Vsd = {vsd:g} V ({i + 1}/{len(vsd_values)})")
+            self.meter_pool.read(lambda m: setattr(m, 'source_voltage', vsd))
+
+            # Each sweep refines around the Dirac point of the previous one
+            sweep = self.make_sweep(dirac_point)
+            completed = self.sweep_gate(
+                sweep, {'Vsd (V)': vsd},
+                progress=lambda p, i=i: 100 * (i + p / 100) / len(vsd_values),
+            )
+            points += sweep.points
+            if np.isfinite(self.dp_estimator.dirac_point):
+                dirac_point = self.dp_estimator.dirac_point
+            dirac_points.append(self.dp_estimator.dirac_point)
+            if not completed:
+                break
+
+        self.emit_metadata({
+            'Map sweeps': len(dirac_points),
+            'Map points': points,
+            'Dirac points': ', '.join(f"{dp:.2f}" for dp in dirac_points) + ' V',
+        })
+
+    def vsd_values(self) -> np.ndarray:
+        """Returns the drain-source voltages of the map, from `vsd_start` to
+        `vsd_end` in steps of `vsd_step`.
+        """
+        if not self.vsd_step or self.vsd_start == self.vsd_end:
+            return np.array([self.vsd_start])
+
+        n = round(abs(self.vsd_end - self.vsd_start) / abs(self.vsd_step))
+        return np.linspace(self.vsd_start, self.vsd_end, n + 1)
+
+    def heatmap_grid(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the grid of the heatmap, along Vg and Vsd."""
+        n = round(abs(self.vg_end - self.vg_start) / self.vg_step) if self.vg_step else 0
+        return np.linspace(self.vg_start, self.vg_end, n + 1), self.vsd_values()
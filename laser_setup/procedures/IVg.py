@@ -1,13 +1,17 @@
 import logging
+import math
 import time
+from collections.abc import Callable, Mapping
 
 import numpy as np
-from scipy.signal import find_peaks
 
 from ..instruments import (TENMA, InstrumentManager, Keithley2450,
                            PT100SerialSensor)
-from ..utils import voltage_sweep_ramp
+from ..catalog import DIRAC_POINT
+from ..utils import find_dp, voltage_sweep_ramp
 from .ChipProcedure import ChipProcedure
+from .estimators import DiracPointEstimator
+from .sweeps import AdaptiveSweep, FixedSweep
 from .utils import Parameters, Instruments
 
 log = logging.getLogger(__name__)
@@ -17,7 +21,8 @@ log.addHandler(logging.NullHandler())
 class IVg(ChipProcedure):
     """Measures a gate sweep with a Keithley 2450. The gate voltage is
     controlled by two TENMA sources. The plate and ambient temperatures are
-    measured using a PT100 sensor.
+    measured using a PT100 sensor. Extra devices sharing the gate can be
+    measured in parallel by other meters, each into its own data file.
     """
     name = 'I vs Vg'
 
@@ -44,35 +49,43 @@ class IVg(ChipProcedure):
     # Additional Parameters, preferably don't change
     sense_T = Parameters.Instrument.sense_T
     vg_step = Parameters.Control.vg_step
+    adaptive_sweep = Parameters.Control.adaptive_sweep
+    max_points = Parameters.Control.max_points
     step_time = Parameters.Control.step_time
     Irange = Parameters.Instrument.Irange
     NPLC = Parameters.Instrument.NPLC
+    devices = Parameters.Chip.devices
 
     INPUTS = ChipProcedure.INPUTS + [
         'vds', 'vg_start', 'vg_end', 'vg_step', 'Irange', 'step_time', 'laser_toggle', 'laser_wl',
-        'laser_v', 'burn_in_t', 'sense_T', 'NPLC'
+        'laser_v', 'burn_in_t', 'sense_T', 'NPLC', 'adaptive_sweep', 'max_points',
+        'devices'
     ]
     DATA_COLUMNS = ['Vg (V)', 'I (A)'] + PT100SerialSensor.DATA_COLUMNS
     # SEQUENCER_INPUTS = ['vds']
     EXCLUDE = ChipProcedure.EXCLUDE + ['sense_T']
 
-    DATA = [[], []]
+    dp_estimator: DiracPointEstimator | None = None
 
     def connect_instruments(self):
         self.tenma_laser = None if not self.laser_toggle else self.tenma_laser
         self.temperature_sensor = None if not self.sense_T else self.temperature_sensor
         super().connect_instruments()
+        self.connect_devices()
+
+    def setup_meter(self, meter: Keithley2450):
+        meter.reset()
+        meter.make_buffer()
+        meter.apply_voltage(compliance_current=self.Irange * 1.1 or 0.1)
+        meter.measure_current(
+            current=self.Irange, nplc=self.NPLC, auto_range=not bool(self.Irange)
+        )
 
     def startup(self):
         self.connect_instruments()
 
-        # Keithley 2450 meter
-        self.meter.reset()
-        self.meter.make_buffer()
-        self.meter.apply_voltage(compliance_current=self.Irange * 1.1 or 0.1)
-        self.meter.measure_current(
-            current=self.Irange, nplc=self.NPLC, auto_range=not bool(self.Irange)
-        )
+        # Keithley 2450 meters
+        self.meter_pool.read(self.setup_meter)
         # TENMA sources
         self.tenma_neg.apply_voltage(0.)
         self.tenma_pos.apply_voltage(0.)
@@ -80,7 +93,7 @@ class IVg(ChipProcedure):
             self.tenma_laser.apply_voltage(0.)
 
         # Turn on the outputs
-        self.meter.enable_source()
+        self.meter_pool.read(lambda m: m.enable_source())
         time.sleep(0.5)
         self.tenma_neg.output = True
         self.tenma_pos.output = True
@@ -90,10 +103,11 @@ class IVg(ChipProcedure):
 
     def execute(self):
         log.info("Starting the measurement")
-        self.meter.clear_buffer()
+        self.open_devices()
+        self.meter_pool.read(lambda m: m.clear_buffer())
 
         # Set the Vds
-        self.meter.source_voltage = self.vds
+        self.meter_pool.read(lambda m: setattr(m, 'source_voltage', self.vds))
 
         # Set the laser if toggled and wait for burn-in
         if self.laser_toggle:
@@ -103,54 +117,85 @@ class IVg(ChipProcedure):
             )
             time.sleep(self.burn_in_t)
 
-        temperature_data = ()
-
         # Set the Vg ramp and the measuring loop
-        self.vg_ramp = voltage_sweep_ramp(self.vg_start, self.vg_end, self.vg_step)
-        type(self).DATA[0] = list(self.vg_ramp)
-        for i, vg in enumerate(self.vg_ramp):
+        sweep = self.make_sweep()
+        self.set_running()
+        completed = self.sweep_gate(sweep)
+
+        if self.adaptive_sweep:
+            self.emit_metadata(sweep.stats())
+
+        # Stored in the header, where the catalog indexes it for `get_latest_DP`
+        if completed and self.live is not None:
+            dirac_point = find_dp(self.live.frame())
+            if math.isfinite(dirac_point):
+                self.emit_metadata({DIRAC_POINT: dirac_point})
+
+    def sweep_gate(
+        self,
+        sweep: FixedSweep | AdaptiveSweep,
+        tags: Mapping[str, float] | None = None,
+        progress: Callable[[float], float] = lambda p: p,
+    ) -> bool:
+        """Runs a gate sweep, emitting one row per point for the main device
+        and writing one for each extra device.
+
+        :param sweep: The sweep, from `make_sweep`
+        :param tags: Constant values of other data columns during the sweep
+        :param progress: Maps the progress of the sweep to the progress of the
+            procedure
+        :return: False if the sweep was aborted
+        """
+        temperature_data = ()
+        for vg in sweep:
             if self.should_stop():
                 log.warning('Measurement aborted')
-                break
+                return False
 
-            self.emit('progress', 100 * i / len(self.vg_ramp))
+            self.emit_progress(progress(sweep.progress))
 
             self.tenma_neg.voltage = -vg * (vg < 0)
             self.tenma_pos.voltage = vg * (vg >= 0)
 
             time.sleep(self.step_time)
 
-            current = self.meter.current
+            current, *extra_currents = self.meter_pool.read(lambda m: m.current)
             if self.sense_T:
                 temperature_data = self.temperature_sensor.data
 
-            type(self).DATA[1].append(current)
-            self.emit('results', dict(zip(
-                self.DATA_COLUMNS,
-                [vg, type(self).DATA[1][-1], *temperature_data]
-            )))
+            sweep.update(vg, current)
+            self.dp_estimator.update(vg, current)
+            row = dict(zip(IVg.DATA_COLUMNS, [vg, current, *temperature_data])) | (tags or {})
+            self.emit('results', row)
+            for device, extra_current in zip(self.extra_devices, extra_currents):
+                device.write(row | {'I (A)': extra_current})
+
+        return True
+
+    def make_sweep(self, dirac_point: float = math.nan) -> FixedSweep | AdaptiveSweep:
+        """Creates the gate sweep and the Dirac point estimator of the run. The
+        adaptive sweep has the same vertices as `voltage_sweep_ramp`, and
+        refines its step around the Dirac point found by the estimator.
 
-    def shutdown(self):
-        type(self).DATA = [[], []]
-        super().shutdown()
+        :param dirac_point: Known Dirac point to refine around until the
+            estimator finds one, e.g. from a previous sweep
+        """
+        self.vg_ramp = voltage_sweep_ramp(self.vg_start, self.vg_end, self.vg_step)
+        if not self.adaptive_sweep:
+            self.dp_estimator = DiracPointEstimator(len(self.vg_ramp))
+            return FixedSweep(self.vg_ramp)
+
+        self.dp_estimator = DiracPointEstimator(self.max_points)
+        return AdaptiveSweep(
+            [0., self.vg_start, self.vg_end, self.vg_start, 0.],
+            self.vg_step,
+            self.max_points,
+            focus=lambda: np.nan_to_num(self.dp_estimator.dirac_point, nan=dirac_point),
+        )
 
     def get_estimates(self):
-        """Estimate the Dirac Point.
+        """Estimate the Dirac Point from the running sweep.
         """
-        try:
-            x = np.array(type(self).DATA[0])
-            y = np.array(type(self).DATA[1])
-            if x.size == 0 or y.size == 0:
-                raise ValueError("Data is empty")
-
-            # Find peaks in the resistance data
-            peaks, _ = find_peaks(1/y)
-
-            estimates = [
-                ('Dirac Point', f"{x[peaks].mean():.1f}"),
-            ]
-            return estimates
-
-        except Exception as e:
-            log.debug(e)
-            return [('Dirac Point', 'None')]
+        procedure = self.get_running() or self
+        estimator = procedure.dp_estimator or DiracPointEstimator(0)
+        return estimator.estimates()
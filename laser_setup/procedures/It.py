@@ -5,6 +5,8 @@ from ..instruments import (TENMA, Clicker, InstrumentManager, Keithley2450,
                            PT100SerialSensor)
 from ..utils import get_latest_DP
 from .ChipProcedure import ChipProcedure
+from .estimators import PhotoresponseEstimator
+from .timeline import Segment, Timeline
 from .utils import Instruments, Parameters
 
 log = logging.getLogger(__name__)
@@ -50,12 +52,15 @@ class It(ChipProcedure):
 
     INPUTS = ChipProcedure.INPUTS + [
         'vds', 'Irange', 'vg', 'laser_wl', 'laser_v', 'laser_T', 'sampling_t', 'sense_T',
-        'initial_T', 'target_T', 'T_start_t', 'NPLC'
+        'initial_T', 'target_T', 'T_start_t', 'NPLC',
+        'steady_state_stop', 'steady_state_tol', 'steady_state_window', 'steady_state_hold'
     ]
     DATA_COLUMNS = ['t (s)', 'I (A)', 'VL (V)'] + PT100SerialSensor.DATA_COLUMNS
     EXCLUDE = ChipProcedure.EXCLUDE + ['sense_T']
     SEQUENCER_INPUTS = ['laser_v', 'vg', 'target_T']
 
+    photoresponse: PhotoresponseEstimator | None = None
+
     def connect_instruments(self):
         self.temperature_sensor = None if not self.sense_T else self.temperature_sensor
         self.clicker = None if not self.sense_T else self.clicker
@@ -115,31 +120,49 @@ class It(ChipProcedure):
             self.tenma_pos.ramp_to_voltage(0)
             self.tenma_neg.ramp_to_voltage(-self.vg)
 
-        def measuring_loop(t_end: float, laser_v: float):
+        self.photoresponse = PhotoresponseEstimator('I', 'A')
+        self.set_running()
+
+        def read():
             keithley_time = self.meter.get_time()
-            temperature_data = ()
-            while keithley_time < t_end:
-                if self.should_stop():
-                    log.warning('Measurement aborted')
-                    return
-
-                self.emit('progress', 100 * keithley_time / (self.laser_T * 3/2))
-
-                keithley_time = self.meter.get_time()
-                current = self.meter.current
-                if self.sense_T:
-                    temperature_data = self.temperature_sensor.data
-                    if keithley_time > self.T_start_t:
-                        self.clicker.go()
-
-                self.emit('results', dict(zip(
-                    self.DATA_COLUMNS, [keithley_time, current, laser_v, *temperature_data]
-                )))
-                time.sleep(self.sampling_t)
-
-        self.tenma_laser.voltage = 0.
-        measuring_loop(self.laser_T * 1/2, 0.)
-        self.tenma_laser.voltage = self.laser_v
-        measuring_loop(self.laser_T, self.laser_v)
-        self.tenma_laser.voltage = 0.
-        measuring_loop(self.laser_T * 3/2, 0.)
+            current = self.meter.current
+            self.photoresponse.update(keithley_time, current)
+            if not self.sense_T:
+                return keithley_time, current
+
+            if keithley_time > self.T_start_t:
+                self.clicker.go()
+            return (keithley_time, current, *self.temperature_sensor.data)
+
+        timeline = Timeline(self, self.segments(), self.DATA_COLUMNS)
+        self.run_timeline(timeline, read, self.sampling_t)
+
+    def segments(self) -> list[Segment]:
+        """Returns the laser program of the run: off, on and off again, each
+        for half of `laser_T`.
+        """
+        laser_v = self.laser_v
+        fit = self.photoresponse.start
+        steady_state = self.steady_state()
+        return [
+            Segment(
+                self.laser_T * 1/2, {'tenma_laser.voltage': 0.}, {'VL (V)': 0.},
+                steady_state=steady_state,
+            ),
+            Segment(
+                self.laser_T * 1/2, {'tenma_laser.voltage': laser_v}, {'VL (V)': laser_v},
+                on_enter=lambda: fit(PhotoresponseEstimator.RISE), steady_state=steady_state,
+            ),
+            Segment(
+                self.laser_T * 1/2, {'tenma_laser.voltage': 0.}, {'VL (V)': 0.},
+                on_enter=lambda: fit(PhotoresponseEstimator.DECAY), steady_state=steady_state,
+            ),
+        ]
+
+    def get_estimates(self):
+        """Estimate the photoresponse time constants and amplitude from the
+        running measurement.
+        """
+        procedure = self.get_running() or self
+        estimator = procedure.photoresponse or PhotoresponseEstimator('I', 'A')
+        return estimator.estimates()
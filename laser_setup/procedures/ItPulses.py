@@ -0,0 +1,109 @@
+import logging
+
+import numpy as np
+
+from ..instruments import PT100SerialSensor
+from .estimators import PhotoresponseEstimator
+from .It import It
+from .timeline import Segment
+from .utils import Parameters
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+def parse_pulses(spec: str) -> list[tuple[float, float, float]]:
+    """Parses the laser pulses parameter. Each pulse is written as
+    'laser voltage, ON time, OFF time', separated by ';'.
+
+    :param spec: The parameter value
+    :return: The list of (laser voltage, ON time, OFF time) pulses
+    """
+    pulses = []
+    for entry in filter(None, (e.strip() for e in str(spec or '').split(';'))):
+        try:
+            laser_v, on_t, off_t = (float(v) for v in entry.split(','))
+        except ValueError as e:
+            raise ValueError(
+                f"Invalid pulse '{entry}'. Expected 'laser voltage, ON time, OFF time'"
+            ) from e
+
+        if on_t < 0 or off_t < 0:
+            raise ValueError(f"Invalid pulse '{entry}'. Times must be non-negative")
+        pulses.append((laser_v, on_t, off_t))
+
+    if not pulses:
+        raise ValueError("At least one laser pulse is required")
+
+    return pulses
+
+
+class ItPulses(It):
+    """Measures a time-dependant current under a list of laser pulses, run
+    back-to-back after a single gate ramp, on one Keithley buffer and into a
+    single data file. The samples of each pulse are tagged with its number,
+    starting from 1, and the dark baseline before the first pulse with 0.
+    The baseline lasts as long as the OFF time of the first pulse.
+    """
+    name = 'I vs t (pulses)'
+
+    # Replaced by the pulses
+    laser_v = None
+    laser_T = None
+
+    pulses = Parameters.Laser.pulses
+
+    INPUTS = [
+        'pulses' if i == 'laser_v' else i for i in It.INPUTS if i != 'laser_T'
+    ]
+    DATA_COLUMNS = ['t (s)', 'I (A)', 'VL (V)', 'Pulse'] + PT100SerialSensor.DATA_COLUMNS
+    SEQUENCER_INPUTS = ['pulses', 'vg', 'target_T']
+
+    def pre_startup(self):
+        super().pre_startup()
+        parse_pulses(self.pulses)
+
+    def execute(self):
+        super().execute()
+
+        self.photoresponse.start(None)
+        fits = {PhotoresponseEstimator.RISE: [], PhotoresponseEstimator.DECAY: []}
+        for kind, tau, _ in self.photoresponse.history:
+            fits[kind].append(tau)
+
+        self.emit_metadata({
+            'Pulse rise times': ', '.join(
+                'nan' if np.isnan(tau) else f"{tau:.3g}" for tau in fits['rise']
+            ) + ' s',
+            'Pulse decay times': ', '.join(
+                'nan' if np.isnan(tau) else f"{tau:.3g}" for tau in fits['decay']
+            ) + ' s',
+        })
+
+    def segments(self) -> list[Segment]:
+        """Returns the laser program of the run: a dark baseline, then an ON
+        and an OFF segment for each pulse.
+        """
+        pulses = parse_pulses(self.pulses)
+        fit = self.photoresponse.start
+        steady_state = self.steady_state()
+
+        segments = [Segment(
+            pulses[0][2], {'tenma_laser.voltage': 0.}, {'VL (V)': 0., 'Pulse': 0},
+            name='baseline', steady_state=steady_state,
+        )]
+        for i, (laser_v, on_t, off_t) in enumerate(pulses, start=1):
+            segments += [
+                Segment(
+                    on_t, {'tenma_laser.voltage': laser_v}, {'VL (V)': laser_v, 'Pulse': i},
+                    on_enter=lambda: fit(PhotoresponseEstimator.RISE),
+                    name=f"pulse {i} ON", steady_state=steady_state,
+                ),
+                Segment(
+                    off_t, {'tenma_laser.voltage': 0.}, {'VL (V)': 0., 'Pulse': i},
+                    on_enter=lambda: fit(PhotoresponseEstimator.DECAY),
+                    name=f"pulse {i} OFF", steady_state=steady_state,
+                ),
+            ]
+
+        return segments
@@ -4,6 +4,7 @@ import time
 from ..instruments import TENMA, InstrumentManager, Keithley2450
 from ..utils import up_down_ramp
 from .ChipProcedure import ChipProcedure
+from .timeline import Segment, Timeline
 from .utils import Instruments, Parameters
 
 log = logging.getLogger(__name__)
@@ -46,7 +47,8 @@ class ItVg(ChipProcedure):
 
     INPUTS = ChipProcedure.INPUTS + [
         'vds', 'Irange', 'laser_toggle', 'laser_wl', 'laser_v', 'burn_in_t', 'vg_start', 'vg_end',
-        'vg_step', 'step_time', 'sampling_t', 'NPLC'
+        'vg_step', 'step_time', 'sampling_t', 'NPLC',
+        'steady_state_stop', 'steady_state_tol', 'steady_state_window', 'steady_state_hold'
         ]
     DATA_COLUMNS = ['t (s)', 'I (A)', 'Vg (V)']
 
@@ -87,7 +89,6 @@ class ItVg(ChipProcedure):
         step = self.vg_step if self.vg_step else self.vg_end - self.vg_start
         self.vg_ramp = up_down_ramp(self.vg_start, self.vg_end, step)
         log.info(f'Gate voltage ramp: {self.vg_ramp}')
-        t_total = self.step_time * len(self.vg_ramp) + self.burn_in_t * self.laser_toggle
 
         self.meter.source_voltage = self.vds
 
@@ -98,30 +99,27 @@ class ItVg(ChipProcedure):
             self.tenma_pos.ramp_to_voltage(0)
             self.tenma_neg.ramp_to_voltage(-self.vg_ramp[0])
 
-        def measuring_loop(t_end: float, vg: float):
-            t_keithley = self.meter.get_time()
-            while t_keithley < t_end:
-                if self.should_stop():
-                    log.warning('Measurement aborted')
-                    return
+        def read():
+            current = self.meter.current
+            return self.meter.get_time(), current
 
-                self.emit('progress', 100 * t_keithley / t_total)
-
-                current = self.meter.current
-
-                t_keithley = self.meter.get_time()
-                self.emit('results', dict(zip(self.DATA_COLUMNS, [t_keithley, current, vg])))
-                time.sleep(self.sampling_t)
+        def gate(vg: float) -> dict[str, float]:
+            return {'tenma_neg.voltage': -vg * (vg < 0), 'tenma_pos.voltage': vg * (vg >= 0)}
 
+        steady_state = self.steady_state()
+        segments = [
+            Segment(self.step_time, gate(vg), {'Vg (V)': vg}, steady_state=steady_state)
+            for vg in self.vg_ramp
+        ]
         if self.laser_toggle:
-            self.tenma_laser.voltage = self.laser_v
             log.info(
-                f"Laser is ON. Sleeping for {self.burn_in_t} seconds to let the current stabilize."
+                f"Laser is ON. Sleeping for {self.burn_in_t} seconds to let the current "
+                "stabilize."
             )
-            measuring_loop(self.burn_in_t, self.vg_ramp[0])
-
-        for i, vg in enumerate(self.vg_ramp):
-            self.tenma_neg.voltage = -vg * (vg < 0)
-            self.tenma_pos.voltage = vg * (vg >= 0)
+            segments.insert(0, Segment(
+                self.burn_in_t, {'tenma_laser.voltage': self.laser_v}, {'Vg (V)': self.vg_ramp[0]},
+                steady_state=steady_state,
+            ))
 
-            measuring_loop(self.step_time * (i + 1) + self.burn_in_t * self.laser_toggle, vg)
+        timeline = Timeline(self, segments, self.DATA_COLUMNS)
+        self.run_timeline(timeline, read, self.sampling_t)
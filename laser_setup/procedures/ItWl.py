@@ -1,9 +1,14 @@
 import logging
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
 
 from ..instruments import TENMA, Bentham, Keithley2450, InstrumentManager
 from ..utils import get_latest_DP
 from .ChipProcedure import ChipProcedure
+from .estimators import PhotoresponseEstimator
+from .timeline import Segment, Timeline
 from .utils import Instruments, Parameters
 
 log = logging.getLogger(__name__)
@@ -15,6 +20,11 @@ class ItWl(ChipProcedure):
     turning on the light source with a specific wavelength. The drain-source voltage is
     fixed. The gate voltage is controlled by two TENMA sources. The light source is
     controlled by a Bentham.
+
+    In spectral mode, every wavelength from `wl_start` to `wl_end` is measured
+    in a single run, with a dark segment before each one. The monochromator
+    moves to the next wavelength in the background during the dark segment,
+    so only the filter wheel moves when the light is turned on.
     """
     name = 'I vs t (Wl)'
 
@@ -32,6 +42,10 @@ class ItWl(ChipProcedure):
     # Wavelength Array Parameters
     wl = Parameters.Laser.wl
     step_time = Parameters.Control.step_time
+    spectral_mode = Parameters.Laser.spectral_mode
+    wl_start = Parameters.Laser.wl_start
+    wl_end = Parameters.Laser.wl_end
+    wl_step = Parameters.Laser.wl_step
 
     # Additional Parameters, preferably don't change
     sampling_t = Parameters.Control.sampling_t
@@ -39,11 +53,16 @@ class ItWl(ChipProcedure):
     NPLC = Parameters.Instrument.NPLC
 
     INPUTS = ChipProcedure.INPUTS + [
-        'vds', 'Irange', 'vg', 'wl', 'burn_in_t', 'step_time', 'sampling_t', 'NPLC'
+        'vds', 'Irange', 'vg', 'spectral_mode', 'wl', 'wl_start', 'wl_end', 'wl_step',
+        'burn_in_t', 'step_time', 'sampling_t', 'NPLC',
+        'steady_state_stop', 'steady_state_tol', 'steady_state_window', 'steady_state_hold'
         ]
     DATA_COLUMNS = ['t (s)', 'I (A)', 'wl (nm)']
     SEQUENCER_INPUTS = ['vg', 'wl']
 
+    photoresponse: PhotoresponseEstimator | None = None
+    mover: ThreadPoolExecutor | None = None
+
     def startup(self):
         self.connect_instruments()
 
@@ -86,8 +105,7 @@ class ItWl(ChipProcedure):
         self.meter.source_voltage = self.vds
 
         # Turn off the light source
-        self.light_source.filt = 1
-        self.light_source.move
+        self.light_source.set_filter(1)
 
         if self.vg >= 0:
             self.tenma_pos.ramp_to_voltage(self.vg)
@@ -96,27 +114,95 @@ class ItWl(ChipProcedure):
             self.tenma_pos.ramp_to_voltage(0)
             self.tenma_neg.ramp_to_voltage(-self.vg)
 
-        def measuring_loop(t_end: float, wl: float):
-            keithley_time = self.meter.get_time()
-            while keithley_time < t_end:
-                if self.should_stop():
-                    log.warning('Measurement aborted')
-                    return
-
-                self.emit('progress', 100 * keithley_time / (self.burn_in_t + self.step_time))
+        self.photoresponse = PhotoresponseEstimator('I', 'A')
+        self.set_running()
 
-                keithley_time = self.meter.get_time()
-                current = self.meter.current
-
-                self.emit('results', dict(zip(
-                    self.DATA_COLUMNS, [keithley_time, current, wl]
-                )))
-                time.sleep(self.sampling_t)
-
-        log.info(
-            f"Sleeping for {self.burn_in_t} seconds to let the current stabilize."
-        )
-        measuring_loop(self.burn_in_t, 0.)
-        log.info('Turning on the light source')
-        self.light_source.set_wavelength(self.wl)
-        measuring_loop(self.step_time, self.wl)
+        def read():
+            keithley_time = self.meter.get_time()
+            current = self.meter.current
+            self.photoresponse.update(keithley_time, current)
+            return keithley_time, current
+
+        log.info(f"Sleeping for {self.burn_in_t} seconds to let the current stabilize.")
+        self.mover = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Bentham')
+        try:
+            timeline = Timeline(self, self.segments(), self.DATA_COLUMNS)
+            self.run_timeline(timeline, read, self.sampling_t)
+        finally:
+            self.mover.shutdown(wait=True)
+
+        self.photoresponse.start(None)
+        if self.spectral_mode:
+            rises = [h for h in self.photoresponse.history if h[0] == PhotoresponseEstimator.RISE]
+            self.emit_metadata({'Spectral ΔI': ', '.join(
+                f"{wl:g} nm: {amplitude:.3e} A"
+                for wl, (_, _, amplitude) in zip(self.wavelengths(), rises)
+            )})
+
+    def wavelengths(self) -> np.ndarray:
+        """Returns the wavelengths of the run, in nm."""
+        if not self.spectral_mode:
+            return np.array([self.wl])
+        if not self.wl_step or self.wl_start == self.wl_end:
+            return np.array([self.wl_start])
+
+        n = round(abs(self.wl_end - self.wl_start) / abs(self.wl_step))
+        return np.linspace(self.wl_start, self.wl_end, n + 1)
+
+    def segments(self) -> list[Segment]:
+        """Returns the program of the run: a dark burn-in, then each
+        wavelength, preceded by a dark segment of `step_time` in spectral mode.
+        The monochromator of the next wavelength is moved in the background
+        while the output is dark.
+        """
+        fit = self.photoresponse.start
+        steady_state = self.steady_state()
+        moves: dict[float, Future] = {}
+
+        def prepare(wl: float):
+            moves[wl] = self.mover.submit(self.light_source.set_monochromator, wl)
+            fit(PhotoresponseEstimator.DECAY)
+
+        def light(wl: float):
+            move = moves.pop(wl, None)
+            if move is not None:
+                move.result()
+            else:
+                # The dark segment did not queue the move
+                self.light_source.set_monochromator(wl)
+            self.light_source.set_filter(wl)
+            fit(PhotoresponseEstimator.RISE)
+
+        def dark(wl: float):
+            self.light_source.set_filter(1)
+            prepare(wl)
+
+        segments = []
+        for i, wl in enumerate(self.wavelengths()):
+            if i == 0:
+                segments.append(Segment(
+                    self.burn_in_t, tags={'wl (nm)': 0.},
+                    on_enter=lambda wl=wl: prepare(wl), name='burn-in',
+                ))
+            else:
+                segments.append(Segment(
+                    self.step_time, tags={'wl (nm)': 0.},
+                    on_enter=lambda wl=wl: dark(wl), name=f'dark before {wl:g} nm',
+                    steady_state=steady_state,
+                ))
+
+            segments.append(Segment(
+                self.step_time, tags={'wl (nm)': wl},
+                on_enter=lambda wl=wl: light(wl), name=f'light source on at {wl:g} nm',
+                steady_state=steady_state,
+            ))
+
+        return segments
+
+    def get_estimates(self):
+        """Estimate the photoresponse of the current wavelength from the
+        running measurement.
+        """
+        procedure = self.get_running() or self
+        estimator = procedure.photoresponse or PhotoresponseEstimator('I', 'A')
+        return estimator.estimates()
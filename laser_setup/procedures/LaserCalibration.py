@@ -58,7 +58,7 @@ class LaserCalibration(BaseProcedure):
             if self.should_stop():
                 break
 
-            self.emit('progress', 100 * i / len(self.vl_ramp))
+            self.emit_progress(100 * i / len(self.vl_ramp))
 
             self.tenma_laser.voltage = vl
 
@@ -55,30 +55,27 @@ class Pt(BaseProcedure):
     def execute(self):
         log.info("Starting the measurement")
 
-        def measuring_loop(initial_time: float, t_end: float, laser_v: float):
+        def measuring_loop(t_end: float, laser_v: float):
             avg_array = np.zeros(self.N_avg)
-            while (time.time() - initial_time) < t_end:
+            while scheduler.elapsed() < t_end:
                 if self.should_stop():
                     log.warning('Measurement aborted')
                     break
 
-                self.emit('progress', 100 * (time.time() - initial_time) / (self.laser_T * 3/2))
-
                 # Take the average of N_avg measurements
                 for j in range(self.N_avg):
                     avg_array[j] = self.power_meter.power
 
-                current_time = time.time() - initial_time
-                self.emit('results', dict(
-                    zip(self.DATA_COLUMNS, [current_time, np.mean(avg_array), laser_v])
-                ))
+                publisher.push((scheduler.elapsed(), np.mean(avg_array), laser_v))
                 avg_array[:] = 0.
-                time.sleep(self.sampling_t)
-
-        self.tenma_laser.voltage = 0.
-        initial_time = time.time()
-        measuring_loop(initial_time, self.laser_T * 1/2, 0.)
-        self.tenma_laser.voltage = self.laser_v
-        measuring_loop(initial_time, self.laser_T, self.laser_v)
-        self.tenma_laser.voltage = 0.
-        measuring_loop(initial_time, self.laser_T * 3/2, 0.)
+                scheduler.wait()
+
+        t_total = self.laser_T * 3/2
+        with self.scheduler(self.sampling_t) as scheduler, \
+                self.publisher(progress=lambda row: 100 * row[0] / t_total) as publisher:
+            self.tenma_laser.voltage = 0.
+            measuring_loop(self.laser_T * 1/2, 0.)
+            self.tenma_laser.voltage = self.laser_v
+            measuring_loop(self.laser_T, self.laser_v)
+            self.tenma_laser.voltage = 0.
+            measuring_loop(self.laser_T * 3/2, 0.)
@@ -57,7 +57,7 @@ class Pwl(BaseProcedure):
                 log.warning("Measurement aborted")
                 break
 
-            self.emit('progress', 100 * i / len(wl_range))
+            self.emit_progress(100 * i / len(wl_range))
 
             # Set the light source and power meter to the current wavelength
 
@@ -5,6 +5,7 @@ import numpy as np
 
 from ..instruments import Clicker, PT100SerialSensor, InstrumentManager
 from .BaseProcedure import BaseProcedure
+from .timeline import Segment, Timeline
 from .utils import Parameters, Instruments
 
 log = logging.getLogger(__name__)
@@ -29,9 +30,11 @@ class Tt(BaseProcedure):
     T_end = Parameters.Control.T_end
     T_step = Parameters.Control.T_step
     step_time = Parameters.Control.step_time
+    steady_state_tol = Parameters.Control.steady_state_tol_T
 
     INPUTS = BaseProcedure.INPUTS + [
-        'sampling_t', 'initial_T', 'T_start', 'T_end', 'T_step', 'step_time'
+        'sampling_t', 'initial_T', 'T_start', 'T_end', 'T_step', 'step_time',
+        'steady_state_stop', 'steady_state_tol', 'steady_state_window', 'steady_state_hold'
     ]
     DATA_COLUMNS = ['Time (s)'] + PT100SerialSensor.DATA_COLUMNS
 
@@ -47,25 +50,26 @@ class Tt(BaseProcedure):
             self.clicker.CT = self.initial_T
 
         self.T_ramp = np.arange(self.T_start, self.T_end + self.T_step, self.T_step)
-        t_total = len(self.T_ramp) * self.step_time
-        initial_time = time.time()
 
-        def measuring_loop(t_end: float):
-            while (time_elapsed := time.time() - initial_time) < t_end:
-                if self.should_stop():
-                    log.warning('Measurement aborted.')
-                    break
-
-                temperature_data = self.temperature_sensor.data
-
-                self.emit('progress', 100 * time_elapsed / t_total)
-                self.emit('results', dict(zip(
-                    self.DATA_COLUMNS, [time_elapsed, *temperature_data]
-                )))
-                time.sleep(self.sampling_t)
-
-        for i, T in enumerate(self.T_ramp):
+        def set_temperature(T: float):
             if self.clicker is not None:
                 self.clicker.set_target_temperature(T)
                 self.clicker.go()
-            measuring_loop(self.step_time * (i + 1))
+
+        # The plate temperature is monitored for the steady state, with an
+        # absolute tolerance, since its zero in degC is arbitrary
+        steady_state = self.steady_state(index=1, absolute=True)
+        timeline = Timeline(self, [
+            Segment(
+                self.step_time,
+                on_enter=lambda T=T: set_temperature(T),
+                steady_state=steady_state,
+            ) for T in self.T_ramp
+        ], self.DATA_COLUMNS)
+
+        initial_time = time.perf_counter()
+        self.run_timeline(
+            timeline,
+            lambda: (time.perf_counter() - initial_time, *self.temperature_sensor.data),
+            self.sampling_t,
+        )
@@ -19,5 +19,5 @@ class Wait(BaseProcedure):
         t0 = time.time()
         tc = t0
         while tc - t0 < self.wait_time:
-            self.emit('progress', (tc - t0)/self.wait_time*100)
+            self.emit_progress((tc - t0)/self.wait_time*100)
             tc = time.time()
@@ -2,9 +2,11 @@ from .BaseProcedure import BaseProcedure, Procedure
 from .ChipProcedure import ChipProcedure
 from .IVg import IVg
 from .It import It
+from .ItPulses import ItPulses
 from .Vt import Vt
 from .ItVg import ItVg
 from .IV import IV
+from .IVMap import IVMap
 from .Pt import Pt
 from .Pwl import Pwl
 from .Tt import Tt
@@ -0,0 +1,273 @@
+import logging
+import re
+import time
+from pathlib import Path
+
+from pymeasure.experiment import unique_filename
+
+from ...config import CONFIG
+from ...instruments import InstrumentManager, Keithley2460, SerialSensor
+from ...storage import split_filename_config
+from ..utils import Instruments, Parameters
+from .CellProcedure import CellProcedure
+from .checkpoint import Checkpoint, ChunkFile
+from .DischargeCC import CoulombCounter, DischargeCC
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class CycleCC(CellProcedure):
+    """Cycles a cell with constant current charges and discharges, with a
+    rest after each one. The samples of each cycle are written to their own
+    data file, while the data file of the run gets one summary row per
+    cycle.
+
+    The state of the campaign is checkpointed every `checkpoint_t` seconds,
+    keyed by the cell identifier. If the run stops before the last cycle, for
+    example after a crash or a lost connection, the next run for the same
+    cell resumes from the last checkpoint, appending to the file of the
+    interrupted cycle.
+    """
+    name = "CC cycling"
+
+    STEPS = ('charge', 'rest', 'discharge', 'rest')
+
+    # Instruments
+    instruments = InstrumentManager()
+    meter: Keithley2460 = instruments.queue(**Instruments.Keithley2460)
+    temperature_sensor: SerialSensor = instruments.queue(
+        **Instruments.SerialSensor,
+        name="Temperature sensor",
+        kwargs={
+            "data_structure": {
+                "clock": int,
+                "surface1": float,
+                "surface2": float,
+                "air1": float,
+                "air2": float,
+            },
+            "data_columns": DischargeCC._temperature_columns,
+        }
+    )
+
+    # Cell parameters
+    soc = Parameters.Cell.soc
+    capacity = Parameters.Cell.capacity
+
+    # Cycle parameters
+    n_cycles = Parameters.Cell.n_cycles
+    charge_current = Parameters.Cell.charge_current
+    discharge_current = Parameters.Cell.discharge_current
+    charge_limit = Parameters.Cell.charge_limit
+    volt_limit = Parameters.Instrument.volt_limit
+    rest_t = Parameters.Cell.rest_t
+    sampling_t = Parameters.Control.sampling_t
+
+    # Campaign parameters
+    checkpoint_t = Parameters.Cell.checkpoint_t
+    resume = Parameters.Cell.resume
+
+    # Temperature parameters
+    sense_T = Parameters.Instrument.sense_T
+
+    INPUTS = CellProcedure.INPUTS + [
+        "soc",
+        "capacity",
+        "n_cycles",
+        "charge_current",
+        "discharge_current",
+        "charge_limit",
+        "volt_limit",
+        "rest_t",
+        "sampling_t",
+        "checkpoint_t",
+        "resume",
+        "sense_T",
+    ]
+    DATA_COLUMNS = [
+        "Cycle", "Discharge (mAh)", "Charge (mAh)", "Efficiency (-)", "SoC (-)", "Duration (s)"
+    ]
+    CYCLE_COLUMNS = [
+        "t (s)", "I (A)", "V (V)", "SoC (-)", "Q (mAh)", "Step"
+    ] + DischargeCC._temperature_columns
+    EXCLUDE = CellProcedure.EXCLUDE + ["sense_T"]
+
+    def connect_instruments(self):
+        self.temperature_sensor = None if not self.sense_T else self.temperature_sensor
+        super().connect_instruments()
+
+    def startup(self):
+        self.connect_instruments()
+
+        # Keithley 2460 meter, sourcing current and measuring voltage. With
+        # source readback, the actual current is measured with each reading
+        self.meter.reset()
+        self.meter.make_buffer()
+        self.meter.wires = 4
+        self.meter.voltage_output_off_state = "HIMP"
+        self.meter.use_front_terminals()
+        self.meter.apply_current(compliance_voltage=self.charge_limit + 0.1)
+        self.meter.write(':SOURce:CURRent:READ:BACK ON')
+        self.meter.measure_voltage(auto_range=True)
+        self.meter.source_current = 0.
+
+        self.meter.enable_source()
+        time.sleep(1.0)
+
+    def checkpoint_path(self) -> Path:
+        """Returns the path of the checkpoint of the campaign of this cell."""
+        cell_id = re.sub(r'[^\w\-]', '_', str(self.cell_id)) or 'unnamed'
+        return Path(CONFIG.Dir.data_dir) / 'checkpoints' / f"{type(self).__name__}_{cell_id}.json"
+
+    def load_checkpoint(self) -> Checkpoint:
+        """Returns the checkpoint to resume from, or a new one."""
+        path = self.checkpoint_path()
+        state = Checkpoint.load(path) if self.resume else None
+        if state is not None and state.cycle < self.n_cycles:
+            log.info(
+                f"Resuming cycle {state.cycle + 1}, step '{self.STEPS[state.step]}', from "
+                f"the checkpoint of {state.updated}"
+            )
+            self.emit_metadata({
+                'Resumed from': f"cycle {state.cycle + 1}, step {self.STEPS[state.step]}",
+            })
+            return state
+
+        charge = self.soc * self.capacity
+        return Checkpoint(soc=self.soc, charge=charge, step_charge=charge)
+
+    def open_cycle(self, state: Checkpoint) -> ChunkFile:
+        """Opens the data file of the current cycle, creating it if needed."""
+        cycle_procedure = type(self)()
+        cycle_procedure.set_parameters(self.parameter_values(), except_missing=False)
+
+        filename_kwargs, storage_kwargs = split_filename_config(CONFIG.Filename)
+        if state.cycle not in state.files:
+            prefix = filename_kwargs.pop('prefix', '') or type(self).__name__
+            suffix = filename_kwargs.pop('suffix', '') + f"_cycle{state.cycle + 1}"
+            state.files[state.cycle] = unique_filename(
+                CONFIG.Dir.data_dir, prefix=prefix, suffix=suffix, **filename_kwargs
+            )
+            log.info(f"Saving cycle {state.cycle + 1} to {state.files[state.cycle]}")
+
+        return ChunkFile(
+            cycle_procedure,
+            state.files[state.cycle],
+            self.CYCLE_COLUMNS,
+            offset=state.offsets.get(state.cycle),
+            backend=storage_kwargs.get('backend'),
+        )
+
+    def execute(self):
+        log.info("Starting the campaign")
+        self.meter.clear_buffer()
+
+        path = self.checkpoint_path()
+        state = self.load_checkpoint()
+        counter = CoulombCounter(state.soc, self.capacity, sign=1.)
+        counter.charge = state.charge
+        chunk = None
+
+        def save():
+            state.charge, state.soc = counter.charge, counter.soc
+            state.elapsed = t0 + scheduler.elapsed()
+            if chunk is not None:
+                state.offsets[state.cycle] = chunk.flush()
+            state.save(path)
+
+        t0 = state.elapsed
+        with self.scheduler(self.sampling_t) as scheduler:
+            try:
+                while state.cycle < self.n_cycles:
+                    chunk = self.open_cycle(state)
+                    while state.step < len(self.STEPS):
+                        if not self.run_step(state, counter, chunk, scheduler, save, t0):
+                            log.warning("Measurement aborted")
+                            return
+
+                        step = self.STEPS[state.step]
+                        if step != 'rest':
+                            state.totals[step] = abs(counter.charge - state.step_charge)
+                        state.step += 1
+                        state.step_charge = counter.charge
+                        save()
+
+                    self.end_cycle(state, counter, t0 + scheduler.elapsed())
+                    chunk = None
+                    save()
+
+            finally:
+                if state.cycle < self.n_cycles:
+                    save()
+
+        path.unlink(missing_ok=True)
+        log.info("Finished the campaign")
+
+    def run_step(self, state: Checkpoint, counter: CoulombCounter, chunk: ChunkFile,
+                 scheduler, save, t0: float) -> bool:
+        """Runs the current step of the cycle until its end condition. The
+        measured current, which differs from the setpoint in compliance or
+        at rest, is integrated and recorded.
+
+        :return: False if the measurement was aborted
+        """
+        step = self.STEPS[state.step]
+        setpoint = {
+            'charge': self.charge_current, 'discharge': -self.discharge_current
+        }.get(step, 0.)
+        log.info(f"Cycle {state.cycle + 1}: {step}")
+        self.meter.source_current = setpoint
+
+        temperature_data = ()
+        start = scheduler.elapsed()
+        last_save = start
+        while True:
+            if self.should_stop():
+                return False
+
+            voltage, current = self.meter.get_reading(('READ', 'SOUR'))
+            elapsed = scheduler.elapsed()
+            t = t0 + elapsed
+            counter.update(t, current)
+            if self.sense_T:
+                temperature_data = self.temperature_sensor.data
+
+            chunk.write(dict(zip(
+                self.CYCLE_COLUMNS,
+                (t, current, voltage, counter.soc, counter.charge, state.step, *temperature_data)
+            )))
+            self.emit_progress(100 * (state.cycle + state.step / len(self.STEPS)) / self.n_cycles)
+
+            if step == 'charge' and voltage >= self.charge_limit:
+                break
+            if step == 'discharge' and voltage <= self.volt_limit:
+                break
+            if step == 'rest' and elapsed - start >= self.rest_t:
+                break
+
+            if elapsed - last_save >= self.checkpoint_t:
+                save()
+                last_save = elapsed
+
+            scheduler.wait()
+
+        return True
+
+    def end_cycle(self, state: Checkpoint, counter: CoulombCounter, t: float):
+        """Emits the summary row of the current cycle and starts the next one."""
+        charged = state.totals.get('charge', 0.)
+        discharged = state.totals.get('discharge', 0.)
+        self.emit('results', dict(zip(self.DATA_COLUMNS, (
+            state.cycle + 1,
+            discharged,
+            charged,
+            discharged / charged if charged else float('nan'),
+            counter.soc,
+            t - state.cycle_start,
+        ))))
+
+        state.cycle += 1
+        state.step = 0
+        state.totals = {}
+        state.cycle_start = t
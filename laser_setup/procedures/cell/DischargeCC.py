@@ -1,6 +1,8 @@
 import logging
 import time
 
+import numpy as np
+
 from ...instruments import InstrumentManager, Keithley2460, SerialSensor
 from ...utils import get_latest_DP
 from .CellProcedure import CellProcedure
@@ -10,6 +12,43 @@ log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
 
+class CoulombCounter:
+    """Integrates the charge of a cell with the trapezoidal rule over the
+    sample timestamps, one sample or a whole block of samples at a time.
+
+    :param soc: Initial state of charge, from 0 to 1
+    :param capacity: Capacity of the cell, in mAh
+    :param sign: Sign of the current that charges the cell. By default, a
+        positive current discharges it
+    """
+    def __init__(self, soc: float, capacity: float, sign: float = -1.):
+        self.soc = soc
+        self.capacity = capacity
+        self.sign = sign
+        self.charge = soc * capacity
+        self._last: tuple[float, float] | None = None
+
+    def update(self, t: np.ndarray | float, current: np.ndarray | float):
+        """Adds samples to the integral.
+
+        :param t: Timestamps of the samples, in seconds
+        :param current: Currents of the samples, in A
+        """
+        t, current = np.atleast_1d(t), np.atleast_1d(current)
+        if len(t) == 0:
+            return
+
+        if self._last is not None:
+            t = np.concatenate(([self._last[0]], t))
+            current = np.concatenate(([self._last[1]], current))
+        self._last = (float(t[-1]), float(current[-1]))
+
+        # A s to mAh
+        charge_change = self.sign * np.sum((current[1:] + current[:-1]) * np.diff(t)) / 2 / 3.6
+        self.charge += charge_change
+        self.soc += charge_change / self.capacity
+
+
 class DischargeCC(CellProcedure):
     """Discharges a cell using a CC procedure, while measuring surface and
     surrounding air temperatures at two different points.
@@ -51,6 +90,8 @@ class DischargeCC(CellProcedure):
     volt_limit = Parameters.Instrument.volt_limit
     Irange = Parameters.Instrument.Irange
     sampling_t = Parameters.Control.sampling_t
+    buffer_mode = Parameters.Control.buffer_mode
+    report_t = Parameters.Control.report_t
 
     # Temperature parameters
     sense_T = Parameters.Instrument.sense_T
@@ -61,12 +102,17 @@ class DischargeCC(CellProcedure):
         "volt_limit",
         "Irange",
         "sampling_t",
+        "buffer_mode",
+        "report_t",
         "sense_T",
     ]
     DATA_COLUMNS = ["t (s)", "I (A)", "V (V)", "SoC (-)", "Q (mAh)"] + _temperature_columns
     EXCLUDE = CellProcedure.EXCLUDE + ["sense_T"]
     SEQUENCER_INPUTS = ["laser_v", "vg", "target_T"]
 
+    # Report periods without new readings before a buffered run fails
+    max_stalled_reports: int = 5
+
     def connect_instruments(self):
         self.temperature_sensor = None if not self.sense_T else self.temperature_sensor
         super().connect_instruments()
@@ -116,56 +162,118 @@ class DischargeCC(CellProcedure):
     def execute(self):
         log.info("Starting the measurement")
         self.meter.clear_buffer()
-        done = False
-        prev_time = self.meter.get_time()
-        iteration = 0
+        counter = CoulombCounter(self.soc, self.capacity)
 
-        temperature_data = ()  # If temperature is measured, this gets replaced
-        soc = self.soc
-        charge = soc * self.capacity
+        # Main loop
+        with self.publisher(progress=lambda row: 100 * (1 - row[3])) as publisher:
+            if self.buffer_mode:
+                self.discharge_buffered(counter, publisher.push)
+            else:
+                self.discharge(counter, publisher.push)
 
-        # TODO: Test if the loop is correct
+        log.info("Finished discharge")
 
-        # Main loop
-        while not done:
-            # Handle critical stop
-            if self.should_stop():
-                log.warning("Measurement aborted")
-                return
-
-            # Take measurements
-            voltage = self.meter.voltage
-            current = self.meter.current
-            time = self.meter.get_time()
-            time_delta = time - prev_time
-            prev_time = time
-            log.debug(f"Voltage {voltage} V")
-            log.debug(f"Current {current} A")
-
-            if voltage <= self.volt_limit:
-                log.info("Voltage under limit, stopping")
-                break
-
-            # Coulomb counting
-            charge_change = -current * time_delta / 3.6
-            charge += charge_change
-            soc += charge_change / self.capacity
-
-            # Report progress
-            self.emit("progress", 100 * (1 - soc))
-
-            if self.sense_T:
-                temperature_data = self.temperature_sensor.data
-
-            self.emit(
-                "results",
-                dict(
-                    zip(
-                        self.DATA_COLUMNS,
-                        [time, current, voltage, soc, charge, *temperature_data],
-                    )
-                ),
+    def discharge(self, counter: CoulombCounter, push):
+        """Discharges the cell, querying one sample at a time every
+        `sampling_t` seconds.
+        """
+        temperature_data = ()  # If temperature is measured, this gets replaced
+        with self.scheduler(self.sampling_t) as scheduler:
+            while True:
+                # Handle critical stop
+                if self.should_stop():
+                    log.warning("Measurement aborted")
+                    return
+
+                # Take measurements
+                voltage = self.meter.voltage
+                current = self.meter.current
+                t = self.meter.get_time()
+
+                if voltage <= self.volt_limit:
+                    log.info("Voltage under limit, stopping")
+                    return
+
+                counter.update(t, current)
+                if self.sense_T:
+                    temperature_data = self.temperature_sensor.data
+
+                push((t, current, voltage, counter.soc, counter.charge, *temperature_data))
+                scheduler.wait()
+
+    def discharge_buffered(self, counter: CoulombCounter, push):
+        """Discharges the cell with the readings timed by the meter, every
+        `sampling_t` seconds, into its buffer. Every `report_t` seconds, the
+        new readings are fetched in a single query and integrated over their
+        timestamps, and one row is pushed with the time of the last reading
+        and the mean current and voltage of the block.
+
+        The readings of a report must fit in half the buffer, leaving room for
+        late reports, or the buffer would wrap around between two of them.
+        If the meter stops taking readings, e.g. at the end of the duration
+        of its trigger model, they are started again. The run fails if no
+        new readings arrive for `max_stalled_reports` report periods.
+        """
+        if self.sampling_t <= 0 or \
+                self.report_t / self.sampling_t >= self.meter.buffer_size / 2:
+            raise ValueError(
+                f"The {self.report_t:g} s report period holds too many readings at a "
+                f"{self.sampling_t:g} s sampling period for a buffer of "
+                f"{self.meter.buffer_size} readings"
             )
-            time.sleep(self.sampling_t)
 
-        log.info("Finished discharge")
+        temperature_data = ()
+        last = 0
+        stalled = 0
+        self.meter.start_buffer(delay=self.sampling_t)
+        try:
+            with self.scheduler(self.report_t) as scheduler:
+                while True:
+                    if self.should_stop():
+                        log.warning("Measurement aborted")
+                        return
+
+                    scheduler.wait()
+                    end = self.meter.buffer_end()
+                    if end >= last:
+                        block = self.meter.get_buffer_data(last + 1, end)
+                    else:
+                        # The buffer wrapped around
+                        block = np.concatenate((
+                            self.meter.get_buffer_data(last + 1, self.meter.buffer_size),
+                            self.meter.get_buffer_data(1, end),
+                        ))
+                    last = end
+                    if len(block) == 0:
+                        stalled += 1
+                        if stalled >= self.max_stalled_reports:
+                            raise RuntimeError(
+                                f"No new readings from the meter in {stalled} report periods"
+                            )
+                        if not self.meter.buffer_running():
+                            log.warning("The meter stopped taking readings, starting them again")
+                            self.meter.start_buffer(delay=self.sampling_t)
+                        continue
+
+                    stalled = 0
+
+                    t, current, voltage = block.T
+                    below = np.flatnonzero(voltage <= self.volt_limit)
+                    if len(below):
+                        t, current, voltage = t[:below[0]], current[:below[0]], voltage[:below[0]]
+
+                    counter.update(t, current)
+                    if self.sense_T:
+                        temperature_data = self.temperature_sensor.data
+
+                    if len(t):
+                        push((
+                            t[-1], current.mean(), voltage.mean(), counter.soc, counter.charge,
+                            *temperature_data
+                        ))
+
+                    if len(below):
+                        log.info("Voltage under limit, stopping")
+                        return
+        finally:
+            self.meter.stop_buffer()
@@ -1,3 +1,3 @@
 from .CellProcedure import CellProcedure
 from .DischargeCC import DischargeCC
-
+from .CycleCC import CycleCC
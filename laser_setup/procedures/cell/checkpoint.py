@@ -0,0 +1,131 @@
+"""Checkpoints of long cell campaigns. The state of the campaign is saved to a
+JSON file at intervals, together with the byte offset of each data file, so
+an interrupted campaign can resume from its last checkpoint.
+"""
+import json
+import logging
+import os
+from collections.abc import Mapping, Sequence
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from pymeasure.experiment import Procedure, Results
+
+from ...patches import ResultsBatch
+from ...storage import data_path
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+@dataclass
+class Checkpoint:
+    """State of a cycling campaign.
+
+    :param cycle: Index of the current cycle, from 0
+    :param step: Index of the current step of the cycle
+    :param charge: Charge of the cell, in mAh
+    :param soc: State of charge of the cell
+    :param elapsed: Time since the start of the campaign, in seconds
+    :param step_charge: Charge at the start of the current step, in mAh
+    :param cycle_start: Time at which the current cycle started, in seconds
+    :param totals: Charge moved by each step of the current cycle, in mAh
+    :param files: Data file of each cycle
+    :param offsets: Size of the data file of each cycle, in bytes
+    """
+    cycle: int = 0
+    step: int = 0
+    charge: float = 0.
+    soc: float = 0.
+    elapsed: float = 0.
+    step_charge: float = 0.
+    cycle_start: float = 0.
+    totals: dict[str, float] = field(default_factory=dict)
+    files: dict[int, str] = field(default_factory=dict)
+    offsets: dict[int, int] = field(default_factory=dict)
+    updated: str = ''
+
+    @classmethod
+    def load(cls, path: str | Path) -> 'Checkpoint | None':
+        """Loads a checkpoint, or returns None if there is none."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        state['files'] = {int(k): v for k, v in state.get('files', {}).items()}
+        state['offsets'] = {int(k): v for k, v in state.get('offsets', {}).items()}
+        return cls(**state)
+
+    def save(self, path: str | Path):
+        """Saves the checkpoint. The file is replaced atomically, so a crash
+        while saving keeps the previous checkpoint.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.updated = datetime.now().isoformat(timespec='seconds')
+
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+
+class ChunkFile:
+    """Data file of one part of a campaign, e.g. a cycle. Rows are buffered
+    and appended in batches. When an offset is given, the file is first cut
+    to that size, dropping the rows written after the last checkpoint.
+
+    :param procedure: Procedure whose parameters are written in the header
+    :param filename: Path of the data file
+    :param columns: Data columns of the file
+    :param offset: Size of the file at the last checkpoint, in bytes
+    :param backend: Storage backend of a new data file
+    """
+    def __init__(
+        self,
+        procedure: Procedure,
+        filename: str,
+        columns: Sequence[str],
+        offset: int | None = None,
+        backend: str | None = None,
+    ):
+        path = data_path(filename)
+        if offset is not None and path.exists():
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+
+        self.columns = list(columns)
+        self.rows: list[Mapping[str, Any]] = []
+        procedure.DATA_COLUMNS = self.columns
+        self.results = Results(procedure, filename, backend=backend)
+
+    @property
+    def filename(self) -> str:
+        return self.results.data_filename
+
+    def write(self, row: Mapping[str, Any], flush_every: int = 100):
+        """Buffers a row and writes the buffer when it is full."""
+        self.rows.append(row)
+        if len(self.rows) >= flush_every:
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes the buffered rows to the file.
+
+        :return: Size of the file that holds the rows, in bytes
+        """
+        if self.rows:
+            batch = ResultsBatch.from_data(
+                {c: [row.get(c, float('nan')) for row in self.rows] for c in self.columns},
+                self.columns,
+            )
+            self.results.write(batch)
+            self.rows.clear()
+
+        return os.path.getsize(data_path(self.filename))
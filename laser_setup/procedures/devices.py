@@ -0,0 +1,133 @@
+"""Parallel measurement of several devices. Each extra device is read by its
+own meter, bound to its own chip metadata and written to its own data file,
+while all meters are read concurrently on every step of the procedure.
+"""
+import logging
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from pymeasure.experiment import Results, unique_filename
+
+from ..config import CONFIG
+from ..patches import ResultsBatch
+from ..storage import split_filename_config
+
+if TYPE_CHECKING:
+    from .ChipProcedure import ChipProcedure
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+@dataclass
+class Device:
+    """A device measured by an extra meter.
+
+    :param instrument: Key of the meter in the instruments configuration
+    :param chip_group: Chip group name of the device
+    :param chip_number: Chip number of the device
+    :param sample: Sample of the device
+    """
+    instrument: str
+    chip_group: str
+    chip_number: int
+    sample: str
+
+    meter: Any = None
+    results: Results | None = None
+    rows: list[Mapping[str, float]] = field(default_factory=list)
+
+    @property
+    def chip(self) -> dict[str, Any]:
+        """Chip parameters of the device."""
+        return {
+            'chip_group': self.chip_group,
+            'chip_number': self.chip_number,
+            'sample': self.sample,
+        }
+
+    def open(self, procedure: 'ChipProcedure'):
+        """Creates the data file of the device, with the parameters of the
+        procedure and the chip parameters of the device.
+
+        :param procedure: The running procedure
+        """
+        device_procedure = type(procedure)()
+        device_procedure.set_parameters(procedure.parameter_values(), except_missing=False)
+        device_procedure.set_parameters(self.chip | {'devices': ''}, except_missing=False)
+        device_procedure.evaluate_metadata()
+
+        filename_kwargs, storage_kwargs = split_filename_config(CONFIG.Filename)
+        prefix = filename_kwargs.pop('prefix', '') or type(procedure).__name__
+        filename = unique_filename(CONFIG.Dir.data_dir, prefix=prefix, **filename_kwargs)
+        self.results = Results(device_procedure, filename, **storage_kwargs)
+        self.results.store_metadata()
+        log.info(f"Saving {self.chip_group} {self.chip_number} {self.sample} to {filename}")
+
+    def write(self, row: Mapping[str, float], flush_every: int = 100):
+        """Buffers a row of results and writes the buffer when it is full."""
+        self.rows.append(row)
+        if len(self.rows) >= flush_every:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows to the data file of the device."""
+        if not self.rows or self.results is None:
+            return
+
+        columns = self.results.procedure.DATA_COLUMNS
+        batch = ResultsBatch.from_data(
+            {c: [row.get(c, float('nan')) for row in self.rows] for c in columns}, columns
+        )
+        self.results.write(batch)
+        self.rows.clear()
+
+
+def parse_devices(spec: str) -> list[Device]:
+    """Parses the extra devices parameter. Each device is written as
+    'instrument: chip group, chip number, sample', separated by ';'.
+
+    :param spec: The parameter value
+    :return: The list of devices
+    """
+    devices = []
+    for entry in filter(None, (e.strip() for e in str(spec or '').split(';'))):
+        try:
+            instrument, chip = entry.split(':', 1)
+            chip_group, chip_number, sample = (c.strip() for c in chip.rsplit(',', 2))
+            devices.append(Device(instrument.strip(), chip_group, int(chip_number), sample))
+        except ValueError as e:
+            raise ValueError(
+                f"Invalid device '{entry}'. Expected 'instrument: chip group, chip number, "
+                "sample'"
+            ) from e
+
+    return devices
+
+
+class MeterPool:
+    """Reads several meters concurrently, with one thread per meter.
+
+    :param meters: The meters to read
+    """
+    def __init__(self, meters: Sequence[Any]):
+        self.meters = list(meters)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(len(self.meters), 1), thread_name_prefix='MeterPool'
+        )
+
+    def read(self, func: Callable[[Any], Any]) -> list[Any]:
+        """Calls a function on every meter concurrently.
+
+        :param func: Function that takes a meter, e.g. `lambda m: m.current`
+        :return: The results, in the order of the meters
+        """
+        if len(self.meters) == 1:
+            return [func(self.meters[0])]
+
+        return list(self._executor.map(func, self.meters))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,245 @@
+"""Streaming estimators for the PyMeasure estimator widget. They are updated
+with each new sample from the acquisition loop, at a constant cost per
+sample, so polling an estimate never goes through the whole data.
+"""
+import logging
+from collections import deque
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class DiracPointEstimator:
+    """Streaming estimate of the Dirac point of a gate sweep. The resistance
+    is smoothed with a centered moving average, and the local maxima of the
+    smoothed resistance are tracked separately for the forward (increasing
+    Vg) and backward (decreasing Vg) branches of the sweep. The Dirac point of
+    each direction is the highest resistance peak found in its branches.
+
+    :param capacity: Number of points of the sweep, used to preallocate the
+        data buffer
+    :param window: Number of points of the moving average. It is rounded up
+        to an odd number
+    """
+    FORWARD = 1
+    BACKWARD = -1
+
+    def __init__(self, capacity: int, window: int = 5):
+        self.data = np.full((max(int(capacity), 1), 2), np.nan)
+        self.size = 0
+        self.window = max(int(window), 1) | 1
+
+        self.peaks: dict[int, tuple[float, float]] = {}
+        self._direction = 0
+        self._last_vg: float | None = None
+        self._last_r = np.nan
+        self._reset_branch()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _reset_branch(self):
+        self._points: deque[tuple[float, float]] = deque(maxlen=self.window)
+        self._sum = 0.
+        self._smoothed: deque[tuple[float, float]] = deque(maxlen=2)
+
+    def update(self, vg: float, current: float):
+        """Adds a point of the sweep.
+
+        :param vg: Gate voltage, in V
+        :param current: Drain-source current, in A
+        """
+        if self.size < len(self.data):
+            self.data[self.size] = vg, current
+        self.size += 1
+
+        r = 1 / abs(current) if current else np.nan
+        if self._last_vg is not None and vg != self._last_vg:
+            direction = self.FORWARD if vg > self._last_vg else self.BACKWARD
+            if direction != self._direction:
+                # The turning point belongs to both branches
+                self._direction = direction
+                self._reset_branch()
+                self._add(self._last_vg, self._last_r)
+
+        self._last_vg, self._last_r = vg, r
+        if self._direction != 0:
+            self._add(vg, r)
+
+    def _add(self, vg: float, r: float):
+        if np.isnan(r):
+            return
+
+        if len(self._points) == self.window:
+            self._sum -= self._points[0][1]
+        self._points.append((vg, r))
+        self._sum += r
+        if len(self._points) < self.window:
+            return
+
+        center = self._points[self.window // 2][0]
+        smoothed = self._sum / self.window
+        if len(self._smoothed) == 2:
+            (_, s0), (v1, s1) = self._smoothed
+            if s0 < s1 >= smoothed:
+                best = self.peaks.get(self._direction)
+                if best is None or s1 > best[1]:
+                    self.peaks[self._direction] = (v1, s1)
+
+        self._smoothed.append((center, smoothed))
+
+    @property
+    def forward(self) -> float:
+        """Dirac point of the forward branches, in V."""
+        return self.peaks.get(self.FORWARD, (np.nan,))[0]
+
+    @property
+    def backward(self) -> float:
+        """Dirac point of the backward branches, in V."""
+        return self.peaks.get(self.BACKWARD, (np.nan,))[0]
+
+    @property
+    def dirac_point(self) -> float:
+        """Mean of the Dirac points found in each direction, in V."""
+        found = [vg for vg, _ in self.peaks.values()]
+        return float(np.mean(found)) if found else np.nan
+
+    def estimates(self) -> list[tuple[str, str]]:
+        """Returns the estimates for the estimator widget."""
+        return [
+            (label, 'None' if np.isnan(value) else f"{value:.1f}")
+            for label, value in (
+                ('Dirac Point', self.dirac_point),
+                ('DP forward', self.forward),
+                ('DP backward', self.backward),
+            )
+        ]
+
+
+class ExponentialFit:
+    """Recursive least squares fit of an exponential relaxation
+    `y(t) = y_inf + (y_0 - y_inf) * exp(-(t - t_0) / tau)` to a stream of
+    samples. The relaxation is linear in its integral form:
+
+        y(t) = y_0 + (y_inf / tau) * (t - t_0) - (1 / tau) * integral(y, t_0, t)
+
+    so the parameters are obtained with a three-parameter RLS, updated in
+    constant time per sample. The integral is accumulated with the
+    trapezoidal rule, which also handles uneven sampling.
+
+    :param delta: Initial diagonal of the inverse correlation matrix
+    """
+    def __init__(self, delta: float = 1e6):
+        self.delta = delta
+        self.reset()
+
+    def reset(self):
+        """Discards all the samples."""
+        self.theta = np.zeros(3)
+        self.P = np.eye(3) * self.delta
+        self.samples = 0
+        self._t0 = 0.
+        self._scale = 1.
+        self._last: tuple[float, float] | None = None
+        self._integral = 0.
+
+    def update(self, t: float, y: float):
+        """Adds a sample of the relaxation.
+
+        :param t: Time of the sample, in s
+        :param y: Value of the sample
+        """
+        if not np.isfinite(y):
+            return
+
+        if self._last is None:
+            self._t0 = t
+            self._scale = abs(y) or 1.
+        else:
+            t_prev, y_prev = self._last
+            self._integral += (t - t_prev) * (y + y_prev) / 2 / self._scale
+        self._last = (t, y)
+        self.samples += 1
+
+        x = np.array([1., t - self._t0, self._integral])
+        Px = self.P @ x
+        gain = Px / (1. + x @ Px)
+        self.theta += gain * (y / self._scale - x @ self.theta)
+        self.P -= np.outer(gain, Px)
+
+    @property
+    def tau(self) -> float:
+        """Time constant of the relaxation, in s. NaN until it is resolved."""
+        if self.samples < 4 or self.theta[2] >= 0:
+            return np.nan
+        return -1 / self.theta[2]
+
+    @property
+    def initial(self) -> float:
+        """Fitted value at the start of the relaxation."""
+        return self.theta[0] * self._scale if self.samples >= 4 else np.nan
+
+    @property
+    def final(self) -> float:
+        """Fitted asymptotic value of the relaxation."""
+        if np.isnan(self.tau):
+            return np.nan
+        return -self.theta[1] / self.theta[2] * self._scale
+
+    @property
+    def amplitude(self) -> float:
+        """Change from the initial to the asymptotic value."""
+        return self.final - self.initial
+
+
+class PhotoresponseEstimator:
+    """Live fit of the photoresponse of an It or Vt run. A rise is fitted
+    while the laser is on, and a decay after it is turned off. Only the fit of
+    the active segment is updated, so each sample costs O(1).
+
+    :param label: Label of the measured quantity in the estimates (e.g. 'I')
+    :param units: Units of the measured quantity
+    """
+    RISE = 'rise'
+    DECAY = 'decay'
+
+    def __init__(self, label: str = 'I', units: str = 'A'):
+        self.label = label
+        self.units = units
+        self.fits = {self.RISE: ExponentialFit(), self.DECAY: ExponentialFit()}
+        self.history: list[tuple[str, float, float]] = []
+        self._active: ExponentialFit | None = None
+        self._kind: str | None = None
+
+    def start(self, kind: str | None):
+        """Starts fitting a new segment. The result of the previous segment is
+        kept in `history`, as (kind, tau, amplitude).
+
+        :param kind: 'rise', 'decay' or None to stop fitting
+        """
+        if self._active is not None:
+            self.history.append((self._kind, self._active.tau, self._active.amplitude))
+
+        self._kind = kind
+        self._active = self.fits[kind] if kind is not None else None
+        if self._active is not None:
+            self._active.reset()
+
+    def update(self, t: float, y: float):
+        """Adds a sample to the fit of the active segment."""
+        if self._active is not None:
+            self._active.update(t, y)
+
+    def estimates(self) -> list[tuple[str, str]]:
+        """Returns the estimates for the estimator widget."""
+        rise, decay = self.fits[self.RISE], self.fits[self.DECAY]
+        return [
+            ('Rise time', 'None' if np.isnan(rise.tau) else f"{rise.tau:.3g} s"),
+            ('Decay time', 'None' if np.isnan(decay.tau) else f"{decay.tau:.3g} s"),
+            (
+                f"Δ{self.label}",
+                'None' if np.isnan(rise.amplitude) else f"{rise.amplitude:.3e} {self.units}"
+            ),
+        ]
@@ -0,0 +1,175 @@
+"""Producer/consumer pipeline for procedures. The acquisition thread (the one
+running `Procedure.execute`) only pushes raw samples into a bounded buffer,
+while a publisher thread formats them, emits them in batches and reports the
+progress. Slow consumers (file writes, the GUI) can then no longer delay the
+next instrument read.
+"""
+import logging
+import threading
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .BaseProcedure import BaseProcedure
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class RingBuffer:
+    """Bounded single-producer, single-consumer buffer of numeric rows.
+
+    The rows are stored in a preallocated array. The producer only writes the
+    head counter and the consumer only writes the tail counter, so no lock is
+    needed between them. When the buffer is full, new rows are dropped and
+    counted instead of blocking the producer.
+
+    :param capacity: Maximum number of rows held by the buffer
+    :param width: Number of columns of each row
+    """
+    def __init__(self, capacity: int, width: int):
+        if capacity < 1:
+            raise ValueError(f"Invalid buffer capacity: {capacity}")
+
+        self.capacity = int(capacity)
+        self.width = int(width)
+        self._array = np.full((self.capacity, self.width), np.nan)
+        self._head = 0
+        self._tail = 0
+
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self) -> int:
+        return self._head - self._tail
+
+    @property
+    def pushed(self) -> int:
+        """Number of rows accepted by the buffer."""
+        return self._head
+
+    def push(self, row: Sequence[float]) -> bool:
+        """Pushes a row into the buffer. Rows shorter than the buffer width
+        are padded with NaN. Only the producer thread may call this method.
+
+        :param row: The values of the row
+        :return: False if the buffer was full and the row was dropped
+        """
+        head = self._head
+        fill = head - self._tail
+        if fill >= self.capacity:
+            self.dropped += 1
+            return False
+
+        i = head % self.capacity
+        n = len(row)
+        self._array[i, :n] = row
+        if n < self.width:
+            self._array[i, n:] = np.nan
+
+        self._head = head + 1
+        if fill >= self.high_water:
+            self.high_water = fill + 1
+        return True
+
+    def pop_all(self) -> np.ndarray:
+        """Removes and returns all the available rows, in order. Only the
+        consumer thread may call this method.
+
+        :return: A copy of the rows, with shape (rows, width)
+        """
+        head, tail = self._head, self._tail
+        if head == tail:
+            return self._array[:0].copy()
+
+        start, end = tail % self.capacity, head % self.capacity
+        if start < end:
+            rows = self._array[start:end].copy()
+        else:
+            rows = np.concatenate((self._array[start:], self._array[:end]))
+
+        self._tail = head
+        return rows
+
+
+class SamplePublisher(threading.Thread):
+    """Thread that drains a RingBuffer at a fixed interval, emitting the
+    samples as batches and the progress through the procedure.
+
+    :param procedure: The procedure whose emit methods are used
+    :param columns: Names of the columns of each sample
+    :param progress: Function that returns the progress from the last row
+        of each batch. If None, no progress is emitted
+    :param capacity: Capacity of the sample buffer, in rows
+    :param interval: Time between publications, in seconds
+    """
+    def __init__(
+        self,
+        procedure: 'BaseProcedure',
+        columns: Sequence[str],
+        progress: Callable[[np.ndarray], float] | None = None,
+        capacity: int = 65536,
+        interval: float = 0.1,
+    ):
+        super().__init__(name=f"{type(procedure).__name__}Publisher", daemon=True)
+        self.procedure = procedure
+        self.columns = list(columns)
+        self.progress = progress
+        self.interval = interval
+        self.buffer = RingBuffer(capacity, len(self.columns))
+        self.published = 0
+        self.batches = 0
+
+        self._stop_event = threading.Event()
+        self._warned = False
+
+    def push(self, row: Sequence[float]) -> bool:
+        """Pushes a sample into the buffer. Called from the acquisition thread.
+
+        :param row: Values of the sample, in the order of the columns
+        :return: False if the sample was dropped because the buffer was full
+        """
+        if self.buffer.push(row):
+            return True
+
+        if not self._warned:
+            self._warned = True
+            log.warning(
+                f"Sample buffer full ({self.buffer.capacity} rows). Dropping samples "
+                "until the publisher catches up."
+            )
+        return False
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.publish()
+
+    def publish(self):
+        """Emits all the buffered samples as a single batch."""
+        rows = self.buffer.pop_all()
+        if len(rows) == 0:
+            return
+
+        self.procedure.emit_batch(rows, self.columns)
+        self.published += len(rows)
+        self.batches += 1
+        if self.progress is not None:
+            self.procedure.emit_progress(self.progress(rows[-1]))
+
+    def stop(self):
+        """Stops the thread and publishes any remaining samples."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.publish()
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the backpressure and drop statistics of the pipeline."""
+        return {
+            'Samples acquired': self.buffer.pushed + self.buffer.dropped,
+            'Samples dropped': self.buffer.dropped,
+            'Buffer high water': f"{self.buffer.high_water}/{self.buffer.capacity}",
+            'Batches published': self.batches,
+        }
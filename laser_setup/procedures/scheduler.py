@@ -0,0 +1,124 @@
+"""Deadline-based pacing of sampling loops. Samples are taken on a fixed grid
+of a monotonic clock, so the instrument I/O time does not add up to the
+sampling period and the rate does not drift over long runs.
+"""
+import logging
+import math
+import time
+from collections.abc import Callable
+from typing import Any
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class SampleScheduler:
+    """Paces a loop on absolute deadlines `t0 + k * period` of a monotonic
+    clock. When a sample takes longer than its slot, the missed slots are
+    skipped (or flagged) and counted, and the loop resumes on the grid.
+
+    Example:
+
+        scheduler = SampleScheduler(0.1)
+        while scheduler.elapsed() < t_end:
+            take_sample()
+            scheduler.wait()
+
+    :param period: Target sampling period in seconds. 0 samples as fast as
+        possible, while still recording the timing statistics
+    :param skip_missed: If True, missed slots are skipped to stay on the
+        grid. Otherwise, the next sample is taken immediately after an overrun
+    :param clock: Monotonic clock function, in seconds
+    :param sleep: Sleep function, in seconds
+    """
+    def __init__(
+        self,
+        period: float,
+        skip_missed: bool = True,
+        clock: Callable[[], float] = time.perf_counter,
+        sleep: Callable[[float], Any] = time.sleep,
+    ):
+        self.period = max(float(period), 0.)
+        self.skip_missed = skip_missed
+        self.clock = clock
+        self.sleep = sleep
+        self.start()
+
+    def start(self):
+        """Resets the grid and the statistics, starting at the current time."""
+        self.t0 = self.clock()
+        self.deadline = self.t0 + self.period
+        self.samples = 0
+        self.overruns = 0
+        self.missed = 0
+        self.max_interval = 0.
+        self._last_tick: float | None = None
+        self._mean = 0.
+        self._m2 = 0.
+
+    def elapsed(self) -> float:
+        """Seconds since the scheduler was started, on the monotonic clock."""
+        return self.clock() - self.t0
+
+    def wait(self) -> int:
+        """Marks the end of a sample and sleeps until the next deadline.
+
+        :return: The number of slots missed by this sample (0 if on time)
+        """
+        now = self.clock()
+        self._tick(now)
+
+        if self.period == 0.:
+            return 0
+
+        missed = 0
+        if now > self.deadline:
+            self.overruns += 1
+            missed = math.floor((now - self.deadline) / self.period)
+            self.missed += missed
+            if self.skip_missed:
+                self.deadline += (missed + 1) * self.period
+            else:
+                self.deadline = now + self.period
+            return missed
+
+        self.sleep(self.deadline - now)
+        self.deadline += self.period
+        return missed
+
+    def _tick(self, now: float):
+        """Updates the interval statistics with Welford's algorithm."""
+        self.samples += 1
+        if self._last_tick is None:
+            self._last_tick = now
+            return
+
+        interval = now - self._last_tick
+        self._last_tick = now
+        n = self.samples - 1
+        delta = interval - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (interval - self._mean)
+        self.max_interval = max(self.max_interval, interval)
+
+    @property
+    def achieved_period(self) -> float:
+        """Mean time between consecutive samples, in seconds."""
+        return self._mean if self.samples > 1 else float('nan')
+
+    @property
+    def jitter(self) -> float:
+        """Standard deviation of the time between samples, in seconds."""
+        return math.sqrt(self._m2 / (self.samples - 2)) if self.samples > 2 else float('nan')
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the timing statistics, to be stored in the run metadata."""
+        return {
+            'Target period': f"{self.period:g} s",
+            'Achieved period': f"{self.achieved_period:.6g} s",
+            'Period jitter': f"{self.jitter:.3g} s",
+            'Max period': f"{self.max_interval:.6g} s",
+            'Samples': self.samples,
+            'Overruns': self.overruns,
+            'Missed slots': self.missed,
+        }
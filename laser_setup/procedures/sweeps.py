@@ -0,0 +1,177 @@
+"""Voltage sweeps for IVg and IV. A FixedSweep goes through a precomputed ramp,
+while an AdaptiveSweep chooses each step from the data measured so far. Both
+are iterated by the measuring loop, which reports every point back with
+`update`.
+"""
+import logging
+import math
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from typing import Any
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class FixedSweep:
+    """Sweep through a precomputed ramp, e.g. from `voltage_sweep_ramp`.
+
+    :param ramp: Voltages to apply, in order
+    """
+    def __init__(self, ramp: Sequence[float]):
+        self.ramp = np.asarray(ramp)
+        self.points = 0
+
+    def __iter__(self) -> Iterator[float]:
+        for v in self.ramp:
+            yield v
+
+    def update(self, v: float, y: float):
+        self.points += 1
+
+    @property
+    def progress(self) -> float:
+        """Progress percentage of the sweep."""
+        return 100 * self.points / max(len(self.ramp), 1)
+
+    def stats(self) -> dict[str, Any]:
+        return {'Sweep points': self.points}
+
+
+class AdaptiveSweep:
+    """Monotonic sweep legs between vertices, with a step chosen from the
+    measured data. Flat regions are crossed with a coarse step, and the step
+    is refined where the measured curve bends and around focus points (e.g.
+    the Dirac point found in a previous leg). Each leg ends exactly at its
+    vertex, so forward and backward legs cover the same range and the
+    hysteresis structure of the fixed ramps is kept.
+
+    The step is never smaller than needed to finish the sweep within
+    `max_points`.
+
+    :param vertices: Turning points of the sweep, e.g. [0, start, end, start, 0]
+    :param step: Finest step, in V
+    :param max_points: Maximum number of points of the whole sweep
+    :param coarse_factor: Largest step, as a multiple of `step`
+    :param tolerance: Maximum change of the slope over a step, relative to the
+        range of the measured values. Lower values refine more
+    :param focus: Function that returns the voltage to refine around, or NaN
+    :param focus_width: Half-width of the refined region around the focus.
+        Defaults to the coarse step
+    """
+    def __init__(
+        self,
+        vertices: Sequence[float],
+        step: float,
+        max_points: int,
+        coarse_factor: float = 5.,
+        tolerance: float = 0.002,
+        focus: Callable[[], float] | None = None,
+        focus_width: float | None = None,
+    ):
+        if step <= 0:
+            raise ValueError(f"Invalid sweep step: {step}")
+
+        self.vertices = [float(v) for v in vertices]
+        self.step = abs(step)
+        self.coarse = self.step * max(coarse_factor, 1.)
+        self.max_points = max(int(max_points), len(self.vertices))
+        self.tolerance = tolerance
+        self.focus = focus
+        self.focus_width = self.coarse if focus_width is None else focus_width
+
+        self.span = float(np.abs(np.diff(self.vertices)).sum())
+        self.points = 0
+        self.swept = 0.
+        self.min_step = math.inf
+        self.max_step = 0.
+
+        self._recent: deque[tuple[float, float]] = deque(maxlen=3)
+        self._y_min = math.inf
+        self._y_max = -math.inf
+
+    def __iter__(self) -> Iterator[float]:
+        v = self.vertices[0]
+        yield v
+
+        for i, (a, b) in enumerate(zip(self.vertices[:-1], self.vertices[1:])):
+            direction = math.copysign(1., b - a)
+            if a == b:
+                continue
+
+            # Slopes are not carried over a turning point
+            self._recent = deque(list(self._recent)[-1:], maxlen=3)
+            while (b - v) * direction > 0:
+                remaining = abs(b - v) + sum(
+                    abs(d - c) for c, d in zip(self.vertices[i + 1:-1], self.vertices[i + 2:])
+                )
+                h = self._next_step(v, direction, remaining)
+                v_next = v + direction * h
+                if (b - v_next) * direction < self.step / 2:
+                    v_next = b
+
+                h = abs(v_next - v)
+                self.min_step, self.max_step = min(self.min_step, h), max(self.max_step, h)
+                self.swept += h
+                v = v_next
+                yield v
+
+    def update(self, v: float, y: float):
+        """Reports the value measured at a point of the sweep.
+
+        :param v: Applied voltage, in V
+        :param y: Measured value, e.g. the current
+        """
+        self.points += 1
+        if not np.isfinite(y):
+            return
+
+        self._recent.append((v, y))
+        self._y_min, self._y_max = min(self._y_min, y), max(self._y_max, y)
+
+    def _next_step(self, v: float, direction: float, remaining: float) -> float:
+        h = self.coarse
+
+        if len(self._recent) == 3:
+            (v0, y0), (v1, y1), (v2, y2) = self._recent
+            if v0 != v1 and v1 != v2 and v0 != v2:
+                d2y = 2 * ((y2 - y1) / (v2 - v1) - (y1 - y0) / (v1 - v0)) / (v2 - v0)
+                scale = self._y_max - self._y_min
+                if d2y and scale > 0:
+                    h = min(h, math.sqrt(self.tolerance * scale / abs(d2y)))
+
+        center = self.focus() if self.focus is not None else math.nan
+        if np.isfinite(center):
+            distance = (center - v) * direction
+            if abs(distance) <= self.focus_width:
+                h = self.step
+            elif distance > 0:
+                h = min(h, distance - self.focus_width)
+
+        # Keep enough points to finish the sweep with coarse steps, and never
+        # exceed the point budget
+        budget = self.max_points - self.points
+        if budget <= 0:
+            return remaining
+        if remaining / budget > self.coarse:
+            return remaining / budget
+
+        h = max(h, remaining - (budget - 1) * self.coarse)
+
+        return max(h, self.step)
+
+    @property
+    def progress(self) -> float:
+        """Progress percentage of the sweep."""
+        return 100 * self.swept / self.span if self.span else 100.
+
+    def stats(self) -> dict[str, Any]:
+        """Returns a summary of the grid, to be stored in the run metadata."""
+        return {
+            'Sweep points': self.points,
+            'Fixed grid points': round(self.span / self.step) + 1,
+            'Min sweep step': f"{self.min_step:.3g} V",
+            'Max sweep step': f"{self.max_step:.3g} V",
+        }
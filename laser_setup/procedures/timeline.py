@@ -0,0 +1,274 @@
+"""Declarative timelines for time-series procedures. A procedure describes its
+program as a list of segments (e.g. laser off/on/off, or one segment per gate
+step), and a single acquisition loop applies the setpoints of each segment at
+its boundary and tags every sample with the segment values.
+"""
+import logging
+import math
+from collections import deque
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+@dataclass
+class SteadyState:
+    """Criterion to end a segment before its duration, once the signal is
+    stable. Over a rolling time window, both the drift (slope times window)
+    and the standard deviation of the signal must stay below `tolerance`
+    times its mean, or below `tolerance` itself if it is absolute, for at
+    least `hold` seconds.
+
+    :param tolerance: Maximum relative drift and spread over the window
+    :param window: Length of the rolling window, in seconds
+    :param hold: Time the criterion must hold to end the segment, in seconds
+    :param index: Index of the monitored value in the values returned by the
+        read function (0 is the time)
+    :param absolute: The tolerance is in the units of the signal, e.g. for
+        temperatures, whose zero is arbitrary
+    """
+    tolerance: float
+    window: float
+    hold: float = 0.
+    index: int = 1
+    absolute: bool = False
+
+
+class SteadyStateDetector:
+    """Streaming evaluation of a SteadyState criterion. The linear regression
+    over the window is kept with running sums, so each sample costs O(1)
+    amortized.
+
+    :param criterion: The SteadyState criterion
+    """
+    def __init__(self, criterion: SteadyState):
+        self.criterion = criterion
+        self._samples: deque[tuple[float, float]] = deque()
+        self._sums = np.zeros(5)  # t, y, t*t, t*y, y*y
+        self._ref: tuple[float, float] | None = None
+        self._stable_since = math.nan
+
+    def update(self, t: float, y: float) -> bool:
+        """Adds a sample and returns True once the signal has been stable for
+        the hold time.
+        """
+        if not math.isfinite(y):
+            return False
+
+        if self._ref is None:
+            self._ref = (t, y)
+        t, y = t - self._ref[0], y - self._ref[1]
+
+        self._samples.append((t, y))
+        self._sums += (t, y, t * t, t * y, y * y)
+        while t - self._samples[0][0] > self.criterion.window:
+            t_old, y_old = self._samples.popleft()
+            self._sums -= (t_old, y_old, t_old * t_old, t_old * y_old, y_old * y_old)
+
+        if not self._is_stable(t):
+            self._stable_since = math.nan
+            return False
+
+        if math.isnan(self._stable_since):
+            self._stable_since = t
+        return t - self._stable_since >= self.criterion.hold
+
+    def _is_stable(self, t: float) -> bool:
+        n = len(self._samples)
+        # The window must be (almost) full
+        if n < 3 or t - self._samples[0][0] < 0.9 * self.criterion.window:
+            return False
+
+        s_t, s_y, s_tt, s_ty, s_yy = self._sums / n
+        var_t = s_tt - s_t * s_t
+        var_y = max(s_yy - s_y * s_y, 0.)
+        if var_t <= 0:
+            return False
+
+        slope = (s_ty - s_t * s_y) / var_t
+        threshold = self.criterion.tolerance
+        if not self.criterion.absolute:
+            threshold *= abs(s_y + self._ref[1])
+        return (
+            abs(slope) * self.criterion.window <= threshold
+            and math.sqrt(var_y) <= threshold
+        )
+
+
+@dataclass
+class Segment:
+    """A step of a timeline.
+
+    :param duration: Duration of the segment, in seconds
+    :param setpoints: Values to apply when the segment starts, keyed by the
+        attribute path relative to the procedure (e.g. 'tenma_laser.voltage')
+    :param tags: Constant values of the data columns during the segment,
+        keyed by the column name (e.g. {'VL (V)': 1.5})
+    :param on_enter: Function called when the segment starts, after the
+        setpoints are applied
+    :param name: Name of the segment, used for logging
+    :param steady_state: If given, the segment ends as soon as this criterion
+        is met, even if its duration has not passed
+    """
+    duration: float
+    setpoints: Mapping[str, Any] = field(default_factory=dict)
+    tags: Mapping[str, float] = field(default_factory=dict)
+    on_enter: Callable[[], Any] | None = None
+    name: str = ''
+    steady_state: SteadyState | None = None
+
+
+class Timeline:
+    """Runs a sequence of segments in a single acquisition loop. The segment
+    boundaries and the row layout of each segment are computed once, so each
+    sample only costs a comparison against the current boundary.
+
+    The `read` function passed to `run` returns the measured values of a
+    sample, in the order of the columns that are not tagged. The first value
+    is the time, which is compared against the segment boundaries. When a
+    segment ends early, the following segments are shifted to start at that
+    time, and the actual durations are kept in `durations`. Segments whose
+    end has already passed, e.g. after a slow read, are entered and skipped.
+
+    :param target: Object on which the setpoints are applied, usually the
+        procedure
+    :param segments: Segments of the timeline, in order
+    :param columns: Names of the data columns
+    :param start: Time at which the first segment starts, in the time base of
+        the samples
+    """
+    def __init__(
+        self,
+        target: Any,
+        segments: Sequence[Segment],
+        columns: Sequence[str],
+        start: float = 0.,
+    ):
+        self.target = target
+        self.segments = list(segments)
+        self.columns = list(columns)
+        self.start = start
+
+        durations = np.array([s.duration for s in self.segments], dtype=float)
+        if np.any(durations < 0):
+            raise ValueError("Segment durations must be non-negative")
+
+        self.total = float(durations.sum())
+        self.durations: list[float] = []
+        self._saved = 0.
+        self._layouts = [self._layout(s) for s in self.segments]
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def _layout(self, segment: Segment) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the row template of a segment, with its tags filled in, and
+        the indices of the columns filled by the measured values.
+        """
+        template = np.full(len(self.columns), np.nan)
+        for column, value in segment.tags.items():
+            template[self.columns.index(column)] = value
+
+        tagged = {self.columns.index(column) for column in segment.tags}
+        slots = np.array([i for i in range(len(self.columns)) if i not in tagged], dtype=int)
+        return template, slots
+
+    def progress(self, row: Sequence[float]) -> float:
+        """Returns the progress percentage given a sample row."""
+        if self.total <= 0:
+            return 100.
+        return 100 * (row[0] + self._saved - self.start) / self.total
+
+    def enter(self, segment: Segment):
+        """Applies the setpoints of a segment and calls its on_enter function."""
+        if segment.name:
+            log.info(f"Starting segment '{segment.name}' ({segment.duration:g} s)")
+
+        for path, value in segment.setpoints.items():
+            *parents, attribute = path.split('.')
+            obj = self.target
+            for parent in parents:
+                obj = getattr(obj, parent)
+            setattr(obj, attribute, value)
+
+        if segment.on_enter is not None:
+            segment.on_enter()
+
+    def run(
+        self,
+        read: Callable[[], Sequence[float]],
+        push: Callable[[np.ndarray], Any],
+        wait: Callable[[], Any] | None = None,
+        should_stop: Callable[[], bool] | None = None,
+    ) -> bool:
+        """Runs the timeline.
+
+        :param read: Function that takes a sample and returns its values
+        :param push: Function that receives each sample row, e.g. the push
+            method of a SamplePublisher
+        :param wait: Function called between samples of a segment, e.g. the
+            wait method of a SampleScheduler
+        :param should_stop: Function that returns True to abort the timeline
+        :return: False if the timeline was aborted
+        """
+        wait = wait or (lambda: None)
+        should_stop = should_stop or (lambda: False)
+
+        self.durations = []
+        self._saved = 0.
+
+        t = float('-inf')
+        boundary = self.start
+        for segment, (template, slots) in zip(self.segments, self._layouts):
+            end = boundary + segment.duration
+            if t >= end:
+                # Skipped, but its setpoints still apply to the next segments
+                self.enter(segment)
+                self.durations.append(end - boundary)
+                boundary = end
+                continue
+
+            self.enter(segment)
+            detector = None
+            if segment.steady_state is not None:
+                detector = SteadyStateDetector(segment.steady_state)
+                index = segment.steady_state.index
+
+            while t < end:
+                if should_stop():
+                    self.durations.append(t - boundary)
+                    return False
+
+                values = read()
+                t = values[0]
+
+                row = template.copy()
+                row[slots[:len(values)]] = values
+                push(row)
+
+                if detector is not None and detector.update(t, values[index]) and t < end:
+                    log.info(f"Steady state reached after {t - boundary:.1f} s")
+                    self._saved += end - t
+                    end = t
+                    break
+
+                if t < end:
+                    wait()
+
+            self.durations.append(end - boundary)
+            boundary = end
+
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the actual duration of each segment, to be stored in the run
+        metadata.
+        """
+        return {
+            'Segment durations': ', '.join(f"{d:.2f}" for d in self.durations) + ' s',
+        }
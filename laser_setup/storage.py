@@ -0,0 +1,554 @@
+"""Storage backends of the data files. The default backend writes the rows
+as text to the CSV data file. The 'npy' backend keeps the same text header
+in the data file, with the column labels, and appends the rows as float64
+to a binary .npy file next to it, named after the data file (e.g.
+`IVg2025-01-01_1.csv.npy`). Appending to it does not format any text, and
+reading it back does not parse any, so long runs reload much faster.
+
+While a procedure runs, its results are also kept in memory by a LiveStore,
+which the plots and estimators read instead of the data file. Past a
+million rows, it only keeps the latest ones, and the results are read back
+from the data file once the run ends.
+
+Old data files can be archived as gzip-compressed CSV files (e.g.
+`IVg2025-01-01_1.csv.gz`). The readers of this module decompress them on the
+fly, and only the selected columns are kept in memory.
+"""
+import csv
+import gzip
+import io
+import logging
+import os
+import shutil
+import threading
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+BACKENDS = ('csv', 'npy')
+STORAGE_OPTIONS = ('backend', 'export_csv')
+ARCHIVE_SUFFIX = '.gz'
+
+
+def binary_path(filename: str | Path) -> Path:
+    """Returns the path of the binary file of a data file."""
+    return Path(f"{filename}.npy")
+
+
+def data_path(filename: str | Path) -> Path:
+    """Returns the path of the file that holds the rows of a data file: its
+    binary file if there is one, or the data file itself.
+    """
+    path = binary_path(filename)
+    return path if path.exists() else Path(filename)
+
+
+def is_archived(filename: str | Path) -> bool:
+    """Returns whether a data file is an archived, compressed file."""
+    return str(filename).endswith(ARCHIVE_SUFFIX)
+
+
+def open_data(filename: str | Path, mode: str = 'rb', encoding: str | None = None):
+    """Opens a data file for reading, decompressing archived files on the fly.
+
+    :param filename: Path of the data file
+    :param mode: 'rb' for bytes or 'r' for text
+    :param encoding: Encoding of text mode
+    """
+    if is_archived(filename):
+        return gzip.open(filename, mode if 'b' in mode else 'rt', encoding=encoding)
+    return open(filename, mode, encoding=encoding)
+
+
+def split_filename_config(config: Mapping) -> tuple[dict, dict]:
+    """Splits the filename configuration into the arguments of
+    `unique_filename` and the storage options of `Results`.
+
+    :param config: The filename configuration
+    :return: The filename arguments and the storage options
+    """
+    filename_kwargs = dict(config).copy()
+    storage_kwargs = {k: filename_kwargs.pop(k) for k in STORAGE_OPTIONS if k in filename_kwargs}
+    return filename_kwargs, storage_kwargs
+
+
+class BinaryStore:
+    """Append-only table of float64 rows, saved as a .npy file. The header of
+    the file has a fixed size, so it can be rewritten with the new shape after
+    every append. The number of rows is taken from the size of the file, so
+    rows appended after the last header update are read as well.
+
+    :param path: Path of the .npy file
+    :param n_columns: Number of columns. Required to create the file
+    """
+    HEADER_SIZE = 128
+    DTYPE = np.dtype('<f8')
+
+    def __init__(self, path: str | Path, n_columns: int | None = None):
+        self.path = Path(path)
+        self._file = None
+        if self.path.exists():
+            with open(self.path, 'rb') as f:
+                np.lib.format.read_magic(f)
+                shape, _, _ = np.lib.format.read_array_header_1_0(f)
+                self.offset = f.tell()
+            self.n_columns = shape[1] if len(shape) > 1 else 1
+
+        elif n_columns is None:
+            raise FileNotFoundError(f"File not found: {self.path}")
+
+        else:
+            self.n_columns = n_columns
+            self.offset = self.HEADER_SIZE
+            with open(self.path, 'wb') as f:
+                self._write_header(f, 0)
+
+    def _write_header(self, f, rows: int):
+        header = repr({
+            'descr': self.DTYPE.str, 'fortran_order': False, 'shape': (rows, self.n_columns),
+        })
+        magic = np.lib.format.magic(1, 0)
+        padding = self.HEADER_SIZE - len(magic) - 2 - len(header) - 1
+        f.seek(0)
+        f.write(magic + np.uint16(len(header) + padding + 1).tobytes() +
+                (header + ' ' * padding + '\n').encode('latin1'))
+
+    @property
+    def row_size(self) -> int:
+        return self.n_columns * self.DTYPE.itemsize
+
+    @property
+    def rows(self) -> int:
+        """Number of complete rows in the file."""
+        return max(0, os.path.getsize(self.path) - self.offset) // self.row_size
+
+    def append(self, values: np.ndarray):
+        """Appends rows to the file and updates its header.
+
+        :param values: 2D array with shape (rows, n_columns)
+        """
+        values = np.asarray(values, dtype=self.DTYPE).reshape(-1, self.n_columns)
+        if self._file is None:
+            self._file = open(self.path, 'r+b')
+
+        # Drop any partial row left by an interrupted write
+        rows = self.rows
+        self._file.seek(self.offset + rows * self.row_size)
+        self._file.truncate()
+        self._file.write(values.tobytes())
+        self._write_header(self._file, rows + len(values))
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+
+    def read(self, start: int = 0, stop: int | None = None, mmap: bool = False) -> np.ndarray:
+        """Reads a range of rows.
+
+        :param start: First row to read
+        :param stop: Row to stop at. Reads up to the last row by default
+        :param mmap: Maps the rows from the file instead of copying them
+        :return: 2D array with shape (rows, n_columns)
+        """
+        rows = self.rows
+        stop = rows if stop is None else min(stop, rows)
+        count = max(0, stop - start)
+        if count == 0:
+            return np.empty((0, self.n_columns), dtype=self.DTYPE)
+
+        offset = self.offset + start * self.row_size
+        if mmap:
+            return np.memmap(
+                self.path, dtype=self.DTYPE, mode='r', offset=offset,
+                shape=(count, self.n_columns)
+            )
+
+        return np.fromfile(
+            self.path, dtype=self.DTYPE, count=count * self.n_columns, offset=offset
+        ).reshape(count, self.n_columns)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def to_rows(record, columns: Sequence[str]) -> np.ndarray:
+    """Converts a results record, a row dictionary or a batch of rows, to a
+    float array with the given column order. Missing and non-numeric values
+    are stored as NaN.
+    """
+    if hasattr(record, 'to_array'):
+        try:
+            return record.to_array(columns)
+        except (TypeError, ValueError):
+            record = pd.DataFrame(record.values, columns=record.columns)
+            return record.apply(pd.to_numeric, errors='coerce') \
+                .reindex(columns=columns).to_numpy(dtype=float)
+
+    row = pd.to_numeric(pd.Series(
+        [record.get(c, np.nan) for c in columns], dtype=object
+    ), errors='coerce')
+    return row.to_numpy(dtype=float).reshape(1, -1)
+
+
+def read_columns(filename: str | Path, header_count: int | None = None) -> list[str]:
+    """Reads the column labels of a data file.
+
+    :param filename: Path of the data file
+    :param header_count: Number of header lines, if known
+    """
+    return pd.read_csv(filename, nrows=0, **_csv_options(header_count)).columns.tolist()
+
+
+def _csv_options(header_count: int | None) -> dict:
+    """Returns the options of `pd.read_csv` that skip the header of a data
+    file. If the number of header lines is known, they are skipped without
+    scanning every line for comments.
+    """
+    if header_count is None:
+        return {'comment': '#'}
+    return {'skiprows': header_count, 'header': 0}
+
+
+def _select_columns(
+    filename: str | Path, labels: list[str], columns: Sequence[str] | None
+) -> tuple[list[str], list[int]]:
+    """Returns the labels and indices of the selected columns."""
+    if columns is None:
+        return labels, list(range(len(labels)))
+
+    missing = [c for c in columns if c not in labels]
+    if missing:
+        raise ValueError(f"Columns {missing} not found in {filename}")
+    return list(columns), [labels.index(c) for c in columns]
+
+
+def read_data(
+    filename: str | Path,
+    columns: Sequence[str] | None = None,
+    dtype=None,
+    header_count: int | None = None,
+    mmap: bool = False,
+) -> pd.DataFrame:
+    """Reads the rows of a data file, from its binary file if it has one.
+    Archived files are decompressed on the fly.
+
+    :param filename: Path of the data file
+    :param columns: Columns to read. Reads all of them by default
+    :param dtype: Type of the values, e.g. float. Inferred from the values by
+        default
+    :param header_count: Number of header lines, if known, to skip them
+        without scanning for comments
+    :param mmap: Maps the file into memory instead of reading it. The
+        columns of a binary file are returned as views of the mapped rows
+    :return: The selected columns
+    """
+    binary = binary_path(filename)
+    if not binary.exists():
+        frame = pd.read_csv(
+            filename, usecols=columns, dtype=dtype, memory_map=mmap and not is_archived(filename),
+            **_csv_options(header_count)
+        )
+        return frame if columns is None else frame[list(columns)]
+
+    store = BinaryStore(binary)
+    labels, indices = _select_columns(
+        filename, read_columns(filename, header_count)[:store.n_columns], columns
+    )
+    values = store.read(mmap=mmap)
+    frame = pd.DataFrame(
+        {label: values[:, i] for label, i in zip(labels, indices)}, copy=not mmap
+    )
+    return frame if dtype is None else frame.astype(dtype, copy=False)
+
+
+def iter_data(
+    filename: str | Path,
+    columns: Sequence[str] | None = None,
+    dtype=None,
+    header_count: int | None = None,
+    chunksize: int = 100_000,
+) -> Iterator[pd.DataFrame]:
+    """Reads the rows of a data file in chunks, so files of any size are
+    read with bounded memory.
+
+    :param chunksize: Number of rows of each chunk
+    :return: An iterator over the chunks, with the selected columns
+    """
+    binary = binary_path(filename)
+    if not binary.exists():
+        with pd.read_csv(
+            filename, usecols=columns, dtype=dtype, chunksize=chunksize,
+            **_csv_options(header_count)
+        ) as reader:
+            for chunk in reader:
+                yield chunk if columns is None else chunk[list(columns)]
+        return
+
+    store = BinaryStore(binary)
+    labels, indices = _select_columns(
+        filename, read_columns(filename, header_count)[:store.n_columns], columns
+    )
+    for start in range(0, store.rows, chunksize):
+        chunk = pd.DataFrame(store.read(start, start + chunksize)[:, indices], columns=labels)
+        yield chunk if dtype is None else chunk.astype(dtype, copy=False)
+
+
+class TailReader:
+    """Reads the rows of a data file incrementally. The first read parses
+    the whole file, and later reads only parse the rows appended since, from
+    the byte offset (or row count, for binary files) reached by the previous
+    read. A partial last line is left for the next read. The offset is kept
+    relative to the end of the header, so metadata inserted in the header
+    does not invalidate it. If the file shrinks or its columns change, the
+    reader starts over.
+
+    :param filename: Path of the data file
+    """
+    def __init__(self, filename: str | Path, encoding: str = 'utf-8'):
+        self.filename = Path(filename)
+        self.encoding = encoding
+        self.columns: list[str] | None = None
+        self.rows = 0
+        self.offset = 0
+
+    def _read_labels(self, f) -> tuple[int, list[str]] | None:
+        """Returns the offset of the first data row and the column labels."""
+        position = 0
+        for line in f:
+            position += len(line)
+            if line.startswith(b'#'):
+                continue
+            if not line.endswith(b'\n'):
+                return None
+            return position, next(csv.reader([line.decode(self.encoding).strip()]))
+        return None
+
+    def _restart(self, columns: list[str]):
+        self.columns = columns
+        self.rows = 0
+        self.offset = 0
+
+    def read(self) -> tuple[pd.DataFrame, bool]:
+        """Reads the rows appended since the last read.
+
+        :return: The new rows, and whether the reader started over, in which
+            case they are all the rows of the file
+        """
+        if is_archived(self.filename):
+            # Archived files do not change
+            if self.columns is not None:
+                return pd.DataFrame(columns=self.columns), False
+
+            frame = read_data(self.filename)
+            self._restart(frame.columns.tolist())
+            self.rows = len(frame)
+            return frame, True
+
+        binary = binary_path(self.filename)
+        if binary.exists():
+            store = BinaryStore(binary)
+            restart = self.columns is None or store.rows < self.rows
+            if restart:
+                self._restart(read_columns(self.filename)[:store.n_columns])
+
+            values = store.read(start=self.rows)[:, :len(self.columns)]
+            self.rows += len(values)
+            return pd.DataFrame(values, columns=self.columns), restart
+
+        with open(self.filename, 'rb') as f:
+            labels = self._read_labels(f)
+            if labels is None:
+                return pd.DataFrame(columns=self.columns or []), self.columns is None
+
+            start, columns = labels
+            size = os.fstat(f.fileno()).st_size
+            restart = columns != self.columns or start + self.offset > size
+            if restart:
+                self._restart(columns)
+
+            f.seek(start + self.offset)
+            chunk = f.read()
+
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return pd.DataFrame(columns=self.columns), restart
+
+        self.offset += end
+        frame = pd.read_csv(
+            io.BytesIO(chunk if end == len(chunk) else chunk[:end]),
+            names=self.columns, header=None, comment='#', encoding=self.encoding,
+        )
+        self.rows += len(frame)
+        return frame, restart
+
+
+def _format_rows(values: np.ndarray) -> str:
+    return '\n'.join(map(','.join, values.astype(str).tolist())) + '\n'
+
+
+def export_csv(filename: str | Path, chunk_size: int = 100_000):
+    """Appends the rows of the binary file of a data file to the data file
+    as text, so it can be read without this package. The binary file is kept
+    for faster reloads.
+    """
+    store = BinaryStore(binary_path(filename))
+    with open(filename, 'a', encoding='utf-8') as f:
+        for start in range(0, store.rows, chunk_size):
+            f.write(_format_rows(store.read(start, start + chunk_size)))
+
+    log.info(f"Exported {store.rows} rows to {filename}")
+
+
+def archive_file(filename: str | Path, chunk_size: int = 100_000) -> Path:
+    """Compresses a data file with gzip into `{filename}.gz`, and removes the
+    original file and its binary file. The rows of a binary file are written
+    as text, so every archived file is a gzip-compressed CSV file.
+
+    :param filename: Path of the data file
+    :return: Path of the archived file
+    """
+    filename = Path(filename)
+    archive = Path(f"{filename}{ARCHIVE_SUFFIX}")
+    binary = binary_path(filename)
+    tmp_path = archive.with_name(f".{archive.name}.tmp")
+    try:
+        with open(filename, 'rb') as src, gzip.open(tmp_path, 'wb', compresslevel=6) as dst:
+            if not binary.exists():
+                shutil.copyfileobj(src, dst, 1 << 20)
+            else:
+                # Header and column labels, without any exported rows
+                for line in src:
+                    dst.write(line)
+                    if not line.startswith(b'#'):
+                        break
+
+                store = BinaryStore(binary)
+                for start in range(0, store.rows, chunk_size):
+                    dst.write(_format_rows(store.read(start, start + chunk_size)).encode())
+
+        shutil.copystat(filename, tmp_path)
+        os.replace(tmp_path, archive)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    binary.unlink(missing_ok=True)
+    filename.unlink()
+    return archive
+
+
+class BinaryHandler(logging.Handler):
+    """Recorder handler that appends the results to the binary file of a
+    data file.
+
+    :param filename: Path of the data file
+    :param columns: Data columns, in the order they are stored
+    :param export: Exports the rows to the data file as CSV when closed
+    """
+    def __init__(self, filename: str | Path, columns: Sequence[str], export: bool = False):
+        super().__init__()
+        self.filename = filename
+        self.columns = list(columns)
+        self.export = export
+        self.store = BinaryStore(binary_path(filename), len(self.columns))
+
+    def emit(self, record):
+        try:
+            self.store.append(to_rows(record, self.columns))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.store.close()
+        if self.export:
+            self.export = False
+            export_csv(self.filename)
+        super().close()
+
+
+class LiveStore:
+    """In-memory columns of the results of a running procedure. Rows are
+    appended as they are emitted, and each column is a contiguous float
+    array that doubles its capacity when full. Columns are returned as views
+    of the stored arrays, so reading them does not copy or parse any data.
+
+    The store holds at most `2 * max_rows` rows. When it is full, only the
+    last `max_rows` rows are kept, and the count of the rows dropped so far is
+    kept in `dropped`. The complete results are always in the data file.
+
+    :param columns: Data columns, in the order they are stored
+    :param capacity: Initial number of rows
+    :param max_rows: Number of rows kept when the store is full
+    """
+    def __init__(
+        self, columns: Sequence[str], capacity: int = 1024, max_rows: int = 1_000_000
+    ):
+        self.columns = list(columns)
+        self.max_rows = max(int(max_rows), 1)
+        self.dropped = 0
+        self._index = {c: i for i, c in enumerate(self.columns)}
+        self._values = np.full(
+            (len(self.columns), min(max(int(capacity), 1), 2 * self.max_rows)), np.nan
+        )
+        self._size = 0
+        self._lock = threading.Lock()
+        self._frame: pd.DataFrame | None = None
+        self._frame_key = (0, 0)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, values: np.ndarray):
+        """Appends rows to the store. Views returned before the oldest rows
+        are dropped keep their values.
+
+        :param values: 2D array with shape (rows, len(columns))
+        """
+        values = np.asarray(values, dtype=float).reshape(-1, len(self.columns))
+        with self._lock:
+            size = self._size + len(values)
+            limit = 2 * self.max_rows
+            if size > limit:
+                # Keeps the last max_rows rows, in a new array
+                values = values[-self.max_rows:]
+                kept = min(self.max_rows - len(values), self._size)
+                trimmed = np.full((len(self.columns), limit), np.nan)
+                trimmed[:, :kept] = self._values[:, self._size - kept:self._size]
+                self.dropped += size - kept - len(values)
+                self._values, self._size = trimmed, kept
+                size = kept + len(values)
+            elif size > self._values.shape[1]:
+                grown = np.full(
+                    (len(self.columns), min(max(size, 2 * self._values.shape[1]), limit)),
+                    np.nan,
+                )
+                grown[:, :self._size] = self._values[:, :self._size]
+                self._values = grown
+
+            self._values[:, self._size:size] = values.T
+            self._size = size
+
+    def column(self, name: str, start: int = 0) -> np.ndarray:
+        """Returns a view of the values of a column.
+
+        :param name: Name of the column
+        :param start: First row to return, counted from the oldest row kept
+        """
+        with self._lock:
+            values, size = self._values, self._size
+        return values[self._index[name], start:size]
+
+    def frame(self) -> pd.DataFrame:
+        """Returns the rows as a DataFrame. The frame is cached until new
+        rows are appended.
+        """
+        with self._lock:
+            values, size, key = self._values, self._size, (self.dropped, self._size)
+        if self._frame is None or self._frame_key != key:
+            self._frame = pd.DataFrame(values[:, :size].T, columns=self.columns)
+            self._frame_key = key
+        return self._frame
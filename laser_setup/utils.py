@@ -1,13 +1,20 @@
 import datetime
+import gzip
 import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Generator, List, Tuple
+from typing import Callable, Dict, Generator, List, Tuple
 
 import numpy as np
 import pandas as pd
 import requests
 
 from .config import CONFIG
+from .headers import read_header
+from .storage import binary_path, is_archived, open_data, read_data
 
 log = logging.getLogger(__name__)
 
@@ -82,8 +89,11 @@ def voltage_ds_sweep_ramp(v_start: float, v_end: float, v_step: float) -> np.nda
 
 
 def get_data_files(pattern: str = '*.csv') -> List[Path]:
-    data_path = Path(CONFIG.Dir.data_dir)
-    return list(data_path.rglob(pattern))
+    """Returns the data files whose name matches the pattern, sorted by date
+    and index. The files are listed from the catalog of the data directory.
+    """
+    from .catalog import get_catalog
+    return get_catalog().files(pattern)
 
 
 def iter_file_lines(
@@ -109,34 +119,34 @@ def iter_file_lines(
 def remove_empty_data(days: int = 2):
     """This function removes all the empty files in the data folder,
     up to a certain number of days back. Empty files are considered files with
-    only the header and no data.
+    only the header and no data. Files modified after the function is called,
+    e.g. by a run started meanwhile, are kept, so it can run in the background.
     """
-    data = get_data_files()
-    data = [file for file in data if (
-        datetime.datetime.now() - extract_date_and_number(file)[0]
-        ).days <= days]
-
-    at_least_one = False
-    for file in data:
-        nonheader_count = 0
-        for line in iter_file_lines(file):
-            if not line.startswith('#'):
-                nonheader_count += 1
-
-            if nonheader_count > 1:
-                break
-
-        if nonheader_count <= 1:
-            at_least_one = True
-            file.unlink()
-            log.debug(f"Removed empty file: {file}")
-
-    for directory in Path(CONFIG.Dir.data_dir).rglob('*'):
-        if directory.is_dir() and not list(directory.iterdir()):
+    from .catalog import get_catalog
+    start = time.time_ns()
+    catalog = get_catalog()
+    since = datetime.date.today() - datetime.timedelta(days=days)
+    data = []
+    for entry in catalog.entries(since=since, max_rows=0):
+        try:
+            if entry.path.stat().st_mtime_ns >= start:
+                continue
+        except FileNotFoundError:
+            continue
+
+        binary_path(entry.path).unlink(missing_ok=True)
+        entry.path.unlink(missing_ok=True)
+        data.append(entry.path)
+        log.debug(f"Removed empty file: {entry.path}")
+
+    catalog.refresh(*data)
+    for directory in {file.parent for file in data}:
+        if directory != Path(CONFIG.Dir.data_dir) and directory.is_dir() \
+                and not any(directory.iterdir()):
             directory.rmdir()
             log.debug(f"Removed empty directory: {directory}")
 
-    if at_least_one:
+    if data:
         log.info('Empty files removed')
 
 
@@ -180,32 +190,31 @@ def get_status_message(timeout: float = .5) -> str:
 
 
 def read_file_parameters(file_path: str | Path) -> Dict[str, str]:
-    """Reads the parameters from a PyMeasure data file."""
-    parameters = {}
+    """Reads the parameters from a PyMeasure data file. The header is only
+    parsed again if the file changed since it was last read.
+    """
     file_path = Path(file_path)
     if not file_path.is_file():
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    for line in iter_file_lines(file_path):
-        line = line.strip()
-        if not line or line.startswith('#Data:'):
-            break           # Stop reading after the data starts
-
-        if ':' in line:
-            if line.startswith(('#Parameters:', '#Metadata:')):
-                continue    # Skip these lines
+    return dict(read_header(file_path).parameters)
 
-            key, value = map(str.strip, line.split(':', 1))
-            key = key.lstrip('#\t')
-            parameters[key] = value
-    return parameters
 
+def read_pymeasure(
+    file_path: str | Path, columns: List[str] | None = None, dtype=None
+) -> Tuple[Dict, pd.DataFrame]:
+    """Reads the parameters and data from a PyMeasure data file. The header
+    length is taken from the header cache, so the data is read without
+    scanning for comments.
 
-def read_pymeasure(file_path: str, comment='#') -> Tuple[Dict, pd.DataFrame]:
-    """Reads the parameters and data from a PyMeasure data file."""
-    parameters = read_file_parameters(file_path)
-    data = pd.read_csv(file_path, comment=comment)
-    return parameters, data
+    :param file_path: Path of the data file
+    :param columns: Columns to read. Reads all of them by default
+    :param dtype: Type of the values, e.g. float. Inferred by default
+    :return: The parameters and the data
+    """
+    header = read_header(file_path)
+    data = read_data(file_path, columns, dtype, header_count=header.count)
+    return dict(header.parameters), data
 
 
 def find_dp(df: pd.DataFrame) -> float:
@@ -236,29 +245,18 @@ def get_latest_DP(chip_group: str, chip_number: int | str, sample: str, max_file
     :param chip_group: The chip group name
     :param chip_number: The chip number
     :param sample: The sample name
-    :param max_files: The maximum number of files to look for, starting from the
-    latest one.
+    :param max_files: The maximum number of IVg files of the chip to look for,
+    starting from the latest one.
     :return: The latest Dirac Point found
     """
-    data_total = get_data_files()
-    data_sorted: list[Path] = sorted(data_total, key=extract_date_and_number)
-    data_files: list[Path] = [d for d in data_sorted if 'IVg' in str(d.stem)][-1:-max_files-1:-1]
-    for file in data_files:
-        params, data = read_pymeasure(file)
-        if all((
-            params['Chip group name'] == chip_group,
-            params['Chip number'] == str(chip_number),
-            params['Sample'] == sample
-        )):
-            DP = find_dp(data)
-            if not isinstance(DP, float) or np.isnan(DP):
-                continue
-
-            log.info(
-                f"Dirac Point found for {chip_group} {chip_number} {sample} "
-                f"in {file.name}: {DP:.2f} [V]"
-            )
-            return DP
+    from .catalog import get_catalog
+    DP, file = get_catalog().latest_dirac_point(chip_group, chip_number, sample, max_files)
+    if file is not None:
+        log.info(
+            f"Dirac Point found for {chip_group} {chip_number} {sample} "
+            f"in {file.name}: {DP:.2f} [V]"
+        )
+        return DP
 
     log.warning(
         f"Dirac Point not found for {chip_group} {chip_number} {sample}. (Using DP = 0. instead)"
@@ -266,24 +264,101 @@ def get_latest_DP(chip_group: str, chip_number: int | str, sample: str, max_file
     return 0.
 
 
-def rename_data_value(original: str, replace: str) -> None:
-    """Takes all .csv files in data/**/*.csv, checks for
-    headers and replaces all strings matching original with replace
+def rewrite_header(
+    file_path: str | Path, original: str, replace: str, dry_run: bool = False
+) -> bool:
+    """Replaces all strings matching original with replace in the header of
+    a data file. The header is rewritten in place if its length does not
+    change. Otherwise, or if the file is archived, the file is streamed to a
+    temporary file that then replaces it, so the data is never loaded in
+    memory.
 
+    :param file_path: Path of the data file
     :param original: The string to replace
     :param replace: The string to replace with
+    :param dry_run: Only checks if the header would change
+    :return: True if the header changed, or would change
     """
-    data_total = get_data_files()
-    for file in data_total:
-        with file.open('r+') as f:
-            lines = f.readlines()
-
-            for i, line in enumerate(lines):
-                if line.startswith('#'):
-                    lines[i] = line.replace(original, replace)
-
-            f.seek(0)
-            f.writelines(lines)
-            f.truncate()
+    file_path = Path(file_path)
+    original_bytes, replace_bytes = original.encode('utf-8'), replace.encode('utf-8')
+    with open_data(file_path) as f:
+        lines = []
+        while (line := f.readline()).startswith(b'#'):
+            lines.append(line)
+
+    header = b''.join(lines)
+    new_header = b''.join(line.replace(original_bytes, replace_bytes) for line in lines)
+    if new_header == header:
+        return False
+
+    if dry_run:
+        return True
+
+    archived = is_archived(file_path)
+    if len(new_header) == len(header) and not archived:
+        with file_path.open('r+b') as f:
+            f.write(new_header)
+        return True
+
+    tmp_path = file_path.with_name(f".{file_path.name}.tmp")
+    try:
+        with open_data(file_path) as src, (gzip.open if archived else open)(tmp_path, 'wb') as dst:
+            dst.write(new_header)
+            src.seek(len(header))
+            shutil.copyfileobj(src, dst, 1 << 20)
+        shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return True
+
+
+def rename_data_value(
+    original: str,
+    replace: str,
+    dry_run: bool = False,
+    max_workers: int | None = None,
+    progress: Callable[[int, int], None] | None = None,
+) -> List[Path]:
+    """Takes all the data files in the catalog, checks for headers and
+    replaces all strings matching original with replace. Only the files whose
+    cached header contains the string are opened, and their headers are
+    rewritten in parallel by a process pool.
 
-    log.info(f"Replaced '{original}' with '{replace}' in all data files.")
+    :param original: The string to replace
+    :param replace: The string to replace with
+    :param dry_run: Only lists the files that would change
+    :param max_workers: Number of processes. Defaults to the number of CPUs
+    :param progress: Called with the number of files done and the total
+    :return: The files that changed, or would change, in catalog order
+    """
+    from .catalog import get_catalog
+    catalog = get_catalog()
+    # The cached header text has its lines stripped
+    key = original.strip('\t\v\n\r\f')
+    data_total = [file for file in catalog.files() if key in read_header(file).text]
+
+    done = set()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(rewrite_header, file, original, replace, dry_run): file
+            for file in data_total
+        }
+        for i, future in enumerate(as_completed(futures)):
+            try:
+                if future.result():
+                    done.add(futures[future])
+            except OSError as e:
+                log.error(f"Error rewriting {futures[future]}: {e}")
+
+            if progress is not None:
+                progress(i + 1, len(data_total))
+
+    changed = [file for file in data_total if file in done]
+    if dry_run:
+        log.info(f"Would replace '{original}' with '{replace}' in {len(changed)} data files.")
+        return changed
+
+    catalog.refresh(*changed)
+    log.info(f"Replaced '{original}' with '{replace}' in {len(changed)} data files.")
+    return changed
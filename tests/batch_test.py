@@ -0,0 +1,38 @@
+import numpy as np
+from pymeasure.experiment import Results, Worker
+
+from laser_setup.procedures import BaseProcedure
+
+
+class BatchProcedure(BaseProcedure):
+    DATA_COLUMNS = ['t (s)', 'I (A)', 'VL (V)']
+
+    def execute(self):
+        t = np.arange(100) * 0.01
+        self.emit_batch(np.column_stack([t, 1e-9 * t]), columns=self.DATA_COLUMNS[:2])
+        self.emit_batch({'t (s)': t + 1, 'VL (V)': np.ones_like(t)}, progress=100.)
+        self.emit('results', {'t (s)': 2., 'I (A)': 0., 'VL (V)': 0.})
+
+
+def test_emit_batch(tmp_path):
+    results = Results(BatchProcedure(), str(tmp_path / 'batch.csv'))
+    worker = Worker(results)
+    worker.start()
+    worker.join(timeout=10)
+
+    data = results.data
+    assert len(data) == 201
+    assert np.allclose(data['t (s)'][:100], np.arange(100) * 0.01)
+    assert data['I (A)'][100:200].isna().all()
+    assert (data['VL (V)'][100:200] == 1.).all()
+
+
+def test_emit_progress():
+    procedure = BatchProcedure()
+    emitted = []
+    procedure.emit = lambda topic, record: emitted.append(record)
+    for progress in (10., 50., 99., 100.):
+        procedure.emit_progress(progress)
+
+    # Updates are coalesced, but the final one is always sent
+    assert emitted == [10., 100.]
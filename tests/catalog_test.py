@@ -0,0 +1,145 @@
+import datetime
+import math
+import os
+import time
+
+from laser_setup.catalog import Catalog, count_rows
+from laser_setup.storage import archive_file
+from laser_setup.utils import remove_empty_data, rename_data_value
+
+
+def write_file(path, sample: str, rows: int = 0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(
+            "#Procedure: <IVg>\n#Parameters:\n#\tChip group name: Chip\n#\tChip number: 1\n"
+            f"#\tSample: {sample}\n#Data:\nVg (V),I (A)\n"
+        )
+        f.writelines(f"{i},{i}\n" for i in range(rows))
+
+
+def test_catalog(tmp_path):
+    today = datetime.date.today().isoformat()
+    data_dir = tmp_path / 'data'
+    write_file(data_dir / '2020-01-01' / 'IVg2020-01-01_1.csv', 'A', rows=3)
+    write_file(data_dir / today / f'IVg{today}_1.csv', 'B')
+    write_file(data_dir / today / f'It{today}_1.csv', 'A', rows=2)
+
+    catalog = Catalog(data_dir, tmp_path / 'catalog.db')
+    assert catalog.update() == 3
+    assert catalog.update() == 0
+
+    entries = catalog.entries(procedure='IVg', latest_first=True)
+    assert [e.parameters['Sample'] for e in entries] == ['B', 'A']
+    assert entries[1].rows == 3 and entries[1].number == 1
+    assert catalog.files(parameters={'Sample': 'A'})[0].name == 'IVg2020-01-01_1.csv'
+
+    # Recent files are checked even if their directory did not change
+    write_file(data_dir / today / f'IVg{today}_1.csv', 'B', rows=5)
+    assert catalog.files(max_rows=0) == []
+
+    write_file(data_dir / today / f'IVg{today}_2.csv', 'C')
+    (data_dir / '2020-01-01' / 'IVg2020-01-01_1.csv').unlink()
+    assert catalog.update() == 2
+    assert [e.parameters['Sample'] for e in catalog.entries('IVg*', update=False)] == ['B', 'C']
+
+
+def test_dirac_points(tmp_path):
+    data_dir = tmp_path / 'data'
+    first = data_dir / '2020-01-01' / 'IVg2020-01-01_1.csv'
+    write_file(first, 'A')
+    with open(first, 'a') as f:
+        f.writelines(f"{vg},{abs(vg - 1) + 1}\n" for vg in range(-3, 4))
+    write_file(data_dir / '2020-01-02' / 'IVg2020-01-02_1.csv', 'A')
+
+    # Lookups only read the catalog, and skip the Dirac points not indexed
+    catalog = Catalog(data_dir, tmp_path / 'catalog.db')
+    assert catalog.latest_dirac_point('Chip', 1, 'A', max_files=2)[1] is None
+    catalog.update()
+    assert catalog.latest_dirac_point('Chip', 1, 'A', max_files=2)[1] is None
+
+    entries = catalog.entries(procedure='IVg', latest_first=True)
+    assert math.isnan(catalog.dirac_point(entries[0])) and catalog.dirac_point(entries[1]) == 1.
+    assert catalog.latest_dirac_point('Chip', 1, 'A')[1] is None
+    assert catalog.latest_dirac_point('Chip', 1, 'A', max_files=2) == (1., first)
+
+    # The Dirac point stored in the header by the run takes precedence
+    with open(first, 'r+') as f:
+        lines = f.readlines()
+        lines.insert(5, "#Metadata:\n#\tDirac point: -2.0\n")
+        f.seek(0)
+        f.writelines(lines)
+    catalog.refresh(first)
+    assert catalog.latest_dirac_point('Chip', 1, 'B', max_files=2)[1] is None
+    assert catalog.latest_dirac_point('Chip', 1, 'A', max_files=2)[0] == -2.
+
+
+def test_remove_empty_data(tmp_path, monkeypatch):
+    today = datetime.date.today().isoformat()
+    data_dir = tmp_path / 'data'
+    empty, running = data_dir / today / f'IVg{today}_1.csv', data_dir / today / f'IVg{today}_2.csv'
+    write_file(empty, 'A')
+    write_file(running, 'A')
+    write_file(data_dir / today / f'IVg{today}_3.csv', 'A', rows=1)
+    os.utime(empty, (time.time() - 60,) * 2)
+    os.utime(running, (time.time() + 60,) * 2)
+
+    # Files that cannot be read are never considered empty
+    latin1, locked = data_dir / today / f'It{today}_1.csv', data_dir / today / f'It{today}_2.csv'
+    latin1.write_bytes(b"#Procedure: <It>\n#\tT: 20 \xb0C\n#Data:\nt (s),I (A)\n0,0\n1,1\n")
+    write_file(locked, 'A')
+
+    def count_unlocked_rows(file):
+        if file == locked:
+            raise PermissionError(f"Locked: {file}")
+        return count_rows(file)
+
+    monkeypatch.setattr('laser_setup.catalog.count_rows', count_unlocked_rows)
+    catalog = Catalog(data_dir, tmp_path / 'catalog.db')
+    monkeypatch.setattr('laser_setup.catalog.get_catalog', lambda: catalog)
+    remove_empty_data()
+
+    # Files modified after the cleanup started belong to runs started meanwhile
+    assert not empty.exists() and running.exists()
+    assert latin1.exists() and locked.exists()
+    assert {f.name for f in catalog.files(update=False)} == {
+        running.name, f'IVg{today}_3.csv', latin1.name, locked.name
+    }
+
+
+def test_rename_data_value(tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    files = [data_dir / '2020-01-01' / f'IVg2020-01-01_{i}.csv' for i in (1, 2, 3)]
+    for file, sample in zip(files, ('A', 'AB', 'C')):
+        write_file(file, sample, rows=3)
+
+    catalog = Catalog(data_dir, tmp_path / 'catalog.db')
+    monkeypatch.setattr('laser_setup.catalog.get_catalog', lambda: catalog)
+    assert rename_data_value('Sample: A', 'Sample: X', dry_run=True, max_workers=2) == files[:2]
+    assert catalog.files(parameters={'Sample': 'X'}) == []
+
+    # Headers of the same length are rewritten in place, others streamed
+    progress = []
+    changed = rename_data_value('Sample: A', 'Sample: XY', max_workers=2,
+                                progress=lambda *p: progress.append(p))
+    assert changed == files[:2] and progress[-1] == (2, 2)
+    assert rename_data_value('Sample: XY', 'Sample: XZ', max_workers=1) == files[:2]
+    assert [e.parameters['Sample'] for e in catalog.entries()] == ['XZ', 'XZB', 'C']
+    assert all(e.rows == 3 for e in catalog.entries())
+
+
+def test_archived_files(tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    file = data_dir / '2020-01-01' / 'IVg2020-01-01_1.csv'
+    write_file(file, 'A', rows=3)
+    catalog = Catalog(data_dir, tmp_path / 'catalog.db')
+    catalog.update()
+
+    archive = archive_file(file)
+    entry, = catalog.entries('IVg*.csv', until=datetime.date(2020, 1, 1))
+    assert entry.path == archive and entry.rows == 3 and entry.number == 1
+
+    # Headers of archived files are rewritten by streaming
+    monkeypatch.setattr('laser_setup.catalog.get_catalog', lambda: catalog)
+    assert rename_data_value('Sample: A', 'Sample: B') == [archive]
+    assert catalog.entries(update=False)[0].parameters['Sample'] == 'B'
@@ -0,0 +1,41 @@
+import os
+
+from pymeasure.experiment import FloatParameter, Procedure
+
+from laser_setup.procedures.cell.checkpoint import Checkpoint, ChunkFile
+
+
+class CycleProcedure(Procedure):
+    capacity = FloatParameter('Capacity', units='mAh', default=2200.)
+    DATA_COLUMNS = ['Cycle']
+
+
+def test_checkpoint(tmp_path):
+    path = tmp_path / 'checkpoints' / 'cell.json'
+    assert Checkpoint.load(path) is None
+
+    state = Checkpoint(cycle=3, step=1, charge=1500., soc=0.5, files={3: 'cycle4.csv'})
+    state.offsets[3] = 1024
+    state.save(path)
+
+    loaded = Checkpoint.load(path)
+    assert loaded == state
+    assert loaded.files == {3: 'cycle4.csv'}
+    assert not os.path.exists(str(path) + '.tmp')
+
+
+def test_chunk_file(tmp_path):
+    filename = str(tmp_path / 'cycle1.csv')
+    columns = ['t (s)', 'V (V)']
+
+    chunk = ChunkFile(CycleProcedure(), filename, columns)
+    chunk.write({'t (s)': 0., 'V (V)': 4.1})
+    offset = chunk.flush()
+    chunk.write({'t (s)': 1., 'V (V)': 4.0})
+    assert chunk.flush() > offset
+
+    # Rows written after the checkpoint are dropped when resuming
+    ChunkFile(CycleProcedure(), filename, columns, offset=offset)
+    assert os.path.getsize(filename) == offset
+    with open(filename, encoding='utf-8') as f:
+        assert f.read().splitlines()[-2:] == ['t (s),V (V)', '0.0,4.1']
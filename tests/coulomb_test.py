@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from laser_setup.procedures.cell.DischargeCC import CoulombCounter, DischargeCC
+
+
+def test_coulomb_counter():
+    t = np.sort(np.random.default_rng(0).uniform(0., 3600., 1000))
+    current = 1. + t / 3600  # Linear, so the trapezoidal rule is exact
+
+    counter = CoulombCounter(1., 3000.)
+    for block_t, block_i in zip(np.array_split(t, 7), np.array_split(current, 7)):
+        counter.update(block_t, block_i)
+
+    t0, t1 = t[0], t[-1]
+    expected = -(t1 - t0 + (t1**2 - t0**2) / 7200) / 3.6
+    assert np.isclose(counter.charge, 3000. + expected)
+    assert np.isclose(counter.soc, 1. + expected / 3000.)
+
+    single = CoulombCounter(1., 3000.)
+    for ti, ii in zip(t, current):
+        single.update(ti, ii)
+    assert np.isclose(single.charge, counter.charge)
+
+
+class FakeBufferMeter:
+    """Meter whose trigger model stops after `readings` readings, with five
+    readings taken per report and the voltage falling 0.1 V per reading.
+    """
+    buffer_size = 100
+
+    def __init__(self, readings: int):
+        self.readings = readings
+        self.values = []
+        self.starts = 0
+
+    def start_buffer(self, delay: float = 0.):
+        self.starts += 1
+        self.stop = len(self.values) + self.readings
+
+    def stop_buffer(self):
+        pass
+
+    def buffer_running(self) -> bool:
+        return len(self.values) < self.stop
+
+    def buffer_end(self) -> int:
+        for _ in range(min(5, self.stop - len(self.values))):
+            self.values.append((len(self.values), 1., 4. - 0.1 * len(self.values)))
+        return (len(self.values) - 1) % self.buffer_size + 1 if self.values else 0
+
+    def get_buffer_data(self, start: int, end: int) -> np.ndarray:
+        values = np.array(self.values)
+        lap = (len(values) - 1) // self.buffer_size * self.buffer_size
+        return values[lap + start - 1:lap + end]
+
+
+def discharge_procedure(meter):
+    procedure = DischargeCC()
+    procedure.meter = meter
+    procedure.sampling_t, procedure.report_t = 0.001, 0.001
+    procedure.volt_limit, procedure.sense_T = 1., False
+    procedure.should_stop = lambda: False
+    procedure.emit = lambda *args: None
+    return procedure
+
+
+def test_discharge_buffered():
+    # The readings are started again when the trigger model ends
+    meter = FakeBufferMeter(readings=12)
+    rows = []
+    discharge_procedure(meter).discharge_buffered(CoulombCounter(1., 3000.), rows.append)
+    assert meter.starts == 3
+    # Readings 0 to 29 are above the voltage limit
+    assert rows[-1][0] == 29 and np.isclose(rows[-1][4], 3000. - 29 / 3.6)
+
+    # Stalled readings fail the run
+    meter = FakeBufferMeter(readings=0)
+    meter.buffer_running = lambda: True
+    with pytest.raises(RuntimeError):
+        discharge_procedure(meter).discharge_buffered(CoulombCounter(1., 3000.), rows.append)
+
+    procedure = discharge_procedure(FakeBufferMeter(readings=0))
+    procedure.report_t = 1.
+    with pytest.raises(ValueError):
+        procedure.discharge_buffered(CoulombCounter(1., 3000.), rows.append)
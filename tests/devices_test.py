@@ -0,0 +1,65 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from laser_setup.procedures import ChipProcedure
+from laser_setup.procedures.devices import MeterPool, parse_devices
+
+
+def test_parse_devices():
+    assert parse_devices('') == []
+    first, second = parse_devices('Keithley2460: Margarita, 7, A; Keithley2450: Box, 2, B;')
+    assert first.instrument == 'Keithley2460'
+    assert first.chip == {'chip_group': 'Margarita', 'chip_number': 7, 'sample': 'A'}
+    assert second.chip_group == 'Box'
+
+    with pytest.raises(ValueError):
+        parse_devices('Keithley2460: Margarita, A')
+
+
+def test_meter_pool():
+    def read(meter):
+        time.sleep(0.1)
+        return meter.current
+
+    pool = MeterPool([SimpleNamespace(current=i) for i in range(4)])
+    t0 = time.perf_counter()
+    assert pool.read(read) == [0, 1, 2, 3]
+    assert time.perf_counter() - t0 < 0.3
+    pool.close()
+
+
+class DevicesProcedure(ChipProcedure):
+    def execute(self):
+        self.meter_pool = MeterPool([SimpleNamespace(current=i) for i in range(2)])
+        self.extra_devices = [SimpleNamespace(flush=lambda: self.flushed.append(True))]
+        raise RuntimeError("Measurement failed")
+
+
+def test_close_devices():
+    # The devices are closed when execute ends, even if shutdown is skipped
+    procedure = DevicesProcedure(skip_shutdown=True)
+    procedure.flushed = []
+    with pytest.raises(RuntimeError):
+        procedure.execute()
+
+    assert procedure.flushed == [True] and procedure.meter_pool is None
+    assert DevicesProcedure().extra_devices == []
+
+
+def test_check_devices():
+    from laser_setup.procedures import IVg
+
+    procedure = IVg()
+    procedure.devices = 'Keithley2460: Margarita, 7, A'
+    assert [d.instrument for d in procedure.check_devices()] == ['Keithley2460']
+
+    for devices, error in [
+        ('Keithley2450: Margarita, 7, A', 'main meter'),
+        ('Keithley2460: Margarita, 7, A; Keithley2460: Box, 2, B', 'more than one device'),
+        ('Keithley9999: Margarita, 7, A', 'not configured'),
+    ]:
+        procedure.devices = devices
+        with pytest.raises(ValueError, match=error):
+            procedure.pre_startup()
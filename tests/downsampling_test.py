@@ -0,0 +1,35 @@
+import numpy as np
+
+from laser_setup.display.downsampling import MinMaxPyramid
+
+
+def test_min_max_pyramid():
+    rng = np.random.default_rng(0)
+    x = np.arange(100_000) * 0.1
+    y = rng.standard_normal(len(x))
+    y[[123, 54_321]] = [10., -10.]
+    y[7] = np.nan
+
+    pyramid = MinMaxPyramid()
+    pyramid.update(x[:30_000], y[:30_000])
+    pyramid.update(x, y)
+    full = MinMaxPyramid()
+    full.update(x, y)
+    assert all(
+        np.array_equal(a.values, b.values)
+        for levels in zip(pyramid._levels, full._levels) for a, b in zip(*levels)
+    )
+
+    # Peaks and bounds are kept at every resolution
+    xv, yv = pyramid.view(width=500)
+    assert len(xv) <= 2_100 and (xv[0], xv[-1]) == (x[0], x[-1])
+    assert (np.nanmin(yv), np.nanmax(yv)) == (-10., 10.)
+
+    # The visible range is drawn at full resolution
+    xv, yv = pyramid.view((1000., 1010.), width=500)
+    visible = (xv >= 1000.) & (xv <= 1010.)
+    assert np.array_equal(xv[visible], x[(x >= 1000.) & (x <= 1010.)])
+
+    # Changed points rebuild the pyramid
+    pyramid.update(x[::-1], y)
+    assert not pyramid.monotonic and len(pyramid.view((1000., 1010.), width=500)[0]) <= 2_100
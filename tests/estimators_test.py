@@ -0,0 +1,52 @@
+import numpy as np
+
+from laser_setup.procedures.estimators import (DiracPointEstimator,
+                                               PhotoresponseEstimator)
+from laser_setup.utils import voltage_sweep_ramp
+
+
+def test_dirac_point_estimator():
+    rng = np.random.default_rng(0)
+    vg_ramp = voltage_sweep_ramp(-10., 10., 0.1)
+    estimator = DiracPointEstimator(len(vg_ramp))
+    assert estimator.estimates()[0] == ('Dirac Point', 'None')
+
+    direction = np.sign(np.diff(vg_ramp, prepend=vg_ramp[0] - 0.1))
+    for vg, d in zip(vg_ramp, direction):
+        dp = 2. if d > 0 else 1.
+        current = 1e-6 * (1 + 0.1 * (vg - dp)**2) * (1 + rng.normal(0, 1e-3))
+        estimator.update(vg, current)
+
+    assert len(estimator) == len(vg_ramp)
+    assert np.allclose(estimator.data[:, 0], vg_ramp)
+    assert abs(estimator.forward - 2.) < 0.2
+    assert abs(estimator.backward - 1.) < 0.2
+    assert dict(estimator.estimates())['Dirac Point'] == '1.5'
+
+
+def test_photoresponse_estimator():
+    rng = np.random.default_rng(0)
+    estimator = PhotoresponseEstimator('I', 'A')
+    assert estimator.estimates()[0] == ('Rise time', 'None')
+
+    t = np.arange(0., 180., 0.2)
+    i_dark, delta_i = 1e-6, 5e-8
+    segments = [(0., 60., None), (60., 120., 'rise'), (120., 180., 'decay')]
+    for start, end, kind in segments:
+        estimator.start(kind)
+        ts = t[(t >= start) & (t < end)]
+        if kind == 'rise':
+            i = i_dark + delta_i * (1 - np.exp(-(ts - start) / 5.))
+        elif kind == 'decay':
+            i = i_dark + delta_i * np.exp(-(ts - start) / 10.)
+        else:
+            i = np.full_like(ts, i_dark)
+
+        for t_i, i_i in zip(ts, i * (1 + rng.normal(0, 1e-4, len(ts)))):
+            estimator.update(t_i, i_i)
+
+    rise, decay = estimator.fits['rise'], estimator.fits['decay']
+    assert abs(rise.tau - 5.) < 0.5
+    assert abs(decay.tau - 10.) < 1.
+    assert abs(rise.amplitude - delta_i) < 0.05 * delta_i
+    assert dict(estimator.estimates())['ΔI'].endswith(' A')
@@ -0,0 +1,30 @@
+from laser_setup.headers import HeaderCache
+
+
+def write_file(path, sample: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        f"#Procedure: <IVg>\n#Parameters:\n#\tSample: {sample}\n#Data:\nVg (V),I (A)\n0,1\n"
+    )
+
+
+def test_header_cache(tmp_path, monkeypatch):
+    data_dir = tmp_path / 'data'
+    first, second = data_dir / 'IVg_1.csv', data_dir / 'IVg_2.csv'
+    write_file(first, 'A')
+    write_file(second, 'B')
+
+    cache = HeaderCache(data_dir, tmp_path / 'catalog.db', maxsize=1)
+    header = cache.get(first)
+    assert header.count == 4 and header.parameters == {'Procedure': '<IVg>', 'Sample': 'A'}
+    assert cache.get(first) is header
+
+    # Least recently used headers are evicted, and changed files read again
+    assert cache.get(second).parameters['Sample'] == 'B'
+    assert list(cache._memory) == [str(second)]
+    write_file(second, 'C')
+    assert cache.get(second).parameters['Sample'] == 'C'
+
+    # Headers of unchanged files are found in the database by other caches
+    monkeypatch.setattr('laser_setup.headers.parse_file_header', None)
+    assert HeaderCache(data_dir, tmp_path / 'catalog.db').get(first) == header
@@ -0,0 +1,10 @@
+import numpy as np
+
+from laser_setup.display.widgets.heatmap_widget import ResultsHeatmap
+
+
+def test_heatmap_index():
+    grid = np.linspace(-1., 1., 5)
+    index, inside = ResultsHeatmap._index(grid, np.array([-1.3, -0.9, 0.3, 1.1, 1.3]))
+    assert index[inside].tolist() == [0, 3, 4]
+    assert inside.tolist() == [False, True, True, True, False]
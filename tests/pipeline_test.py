@@ -0,0 +1,46 @@
+import numpy as np
+from pymeasure.experiment import Results, Worker
+
+from laser_setup.procedures import BaseProcedure
+from laser_setup.procedures.pipeline import RingBuffer
+from laser_setup.utils import read_file_parameters
+
+
+def test_ring_buffer():
+    buffer = RingBuffer(4, 3)
+    for i in range(3):
+        assert buffer.push((i, 2 * i))
+
+    assert np.allclose(buffer.pop_all()[:, 1], [0, 2, 4])
+    assert np.isnan(buffer.pop_all()).size == 0
+
+    for i in range(6):
+        buffer.push((i, i, i))
+    assert buffer.dropped == 2
+    assert np.allclose(buffer.pop_all()[:, 0], [0, 1, 2, 3])
+
+
+class PublisherProcedure(BaseProcedure):
+    DATA_COLUMNS = ['t (s)', 'I (A)']
+
+    def execute(self):
+        with self.publisher(progress=lambda row: row[0], interval=0.01) as publisher, \
+                self.scheduler(0.) as scheduler:
+            for i in range(1000):
+                publisher.push((i, 1e-9 * i))
+                scheduler.wait()
+
+
+def test_publisher(tmp_path):
+    filename = tmp_path / 'publisher.csv'
+    results = Results(PublisherProcedure(), str(filename))
+    worker = Worker(results)
+    worker.start()
+    worker.join(timeout=10)
+
+    assert np.allclose(results.data['t (s)'], np.arange(1000))
+    # The scheduler metadata is stored after the publisher stopped, so no
+    # rows are lost from the file
+    assert np.allclose(Results.load(str(filename)).data['t (s)'], np.arange(1000))
+    parameters = read_file_parameters(filename)
+    assert parameters['Samples dropped'] == '0' and parameters['Samples'] == '1000'
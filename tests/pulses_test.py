@@ -0,0 +1,11 @@
+import pytest
+
+from laser_setup.procedures.ItPulses import parse_pulses
+
+
+def test_parse_pulses():
+    assert parse_pulses('3.0, 60, 30; 3.5, 10, 20;') == [(3., 60., 30.), (3.5, 10., 20.)]
+
+    for spec in ('', '3.0, 60', '3.0, -1, 10'):
+        with pytest.raises(ValueError):
+            parse_pulses(spec)
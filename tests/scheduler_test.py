@@ -0,0 +1,47 @@
+import math
+
+from laser_setup.procedures.scheduler import SampleScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        assert seconds >= 0
+        self.now += seconds
+
+
+def test_scheduler_grid():
+    clock = FakeClock()
+    scheduler = SampleScheduler(1., clock=clock, sleep=clock.sleep)
+
+    ticks = []
+    for _ in range(5):
+        clock.now += 0.3  # Sample duration
+        ticks.append(clock.now)
+        assert scheduler.wait() == 0
+
+    assert ticks == [0.3, 1.3, 2.3, 3.3, 4.3]
+    assert math.isclose(scheduler.achieved_period, 1.)
+    assert math.isclose(scheduler.jitter, 0., abs_tol=1e-12)
+    assert scheduler.overruns == 0
+
+
+def test_scheduler_missed_slots():
+    clock = FakeClock()
+    scheduler = SampleScheduler(1., clock=clock, sleep=clock.sleep)
+
+    clock.now += 2.5
+    assert scheduler.wait() == 1
+    assert scheduler.deadline == 3.
+    clock.now += 0.2
+    assert scheduler.wait() == 0
+    assert clock.now == 3.
+
+    stats = scheduler.stats()
+    assert stats['Overruns'] == 1
+    assert stats['Missed slots'] == 1
@@ -0,0 +1,169 @@
+import numpy as np
+from pymeasure.experiment import Results, Worker
+
+from laser_setup.procedures import BaseProcedure
+from laser_setup.storage import (BinaryStore, LiveStore, archive_file, binary_path, iter_data,
+                                 read_data)
+from laser_setup.utils import read_file_parameters, read_pymeasure
+
+
+class StorageProcedure(BaseProcedure):
+    DATA_COLUMNS = ['t (s)', 'I (A)', 'VL (V)']
+
+    def execute(self):
+        t = np.arange(1000) * 0.01
+        self.emit_batch({'t (s)': t, 'I (A)': 1e-9 * t})
+        self.emit('results', {'t (s)': 10., 'I (A)': 0., 'VL (V)': 'nan'})
+        self.emit_metadata({'Samples': 1001})
+
+
+def test_binary_store(tmp_path):
+    store = BinaryStore(tmp_path / 'store.npy', 3)
+    store.append(np.arange(6).reshape(2, 3))
+    store.append(np.arange(3))
+    store.close()
+
+    assert np.array_equal(np.load(tmp_path / 'store.npy'), np.arange(9).reshape(3, 3) % 6)
+    assert np.array_equal(BinaryStore(tmp_path / 'store.npy').read(1, mmap=True)[:, 0], [3, 0])
+
+
+def test_npy_backend(tmp_path):
+    filename = tmp_path / 'storage.csv'
+    results = Results(StorageProcedure(), str(filename), backend='npy', export_csv=True)
+    worker = Worker(results)
+    worker.start()
+    worker.join(timeout=10)
+
+    assert BinaryStore(binary_path(filename)).rows == 1001
+    assert read_file_parameters(filename)['Samples'] == '1001'
+
+    data = Results.load(str(filename)).data
+    assert data.columns.tolist() == StorageProcedure.DATA_COLUMNS
+    assert np.allclose(data['t (s)'], np.append(np.arange(1000) * 0.01, 10.))
+    assert data['VL (V)'].isna().all()
+
+    # The exported CSV holds the same rows
+    binary_path(filename).unlink()
+    _, exported = read_pymeasure(filename)
+    assert np.allclose(exported['I (A)'], data['I (A)'])
+
+
+def test_live_store():
+    live = LiveStore(['t (s)', 'I (A)'], capacity=2)
+    live.append([[0., 1.]])
+    column = live.column('t (s)')
+    live.append(np.column_stack([np.arange(1, 5), np.arange(1, 5)]))
+
+    assert len(live) == 5 and column.tolist() == [0.]
+    assert live.column('t (s)', start=3).tolist() == [3., 4.]
+    assert live.frame() is live.frame()
+
+    # Only the last rows are kept past the limit, and earlier views keep their values
+    live = LiveStore(['t (s)'], capacity=2, max_rows=4)
+    live.append(np.arange(8.))
+    column = live.column('t (s)')
+    frame = live.frame()
+    live.append([8.])
+    assert live.column('t (s)').tolist() == [5., 6., 7., 8.] and live.dropped == 5
+    assert column.tolist() == list(range(8)) and live.frame() is not frame
+    live.append(np.arange(9., 20.))
+    assert live.column('t (s)').tolist() == [16., 17., 18., 19.] and live.dropped == 16
+
+
+def test_live_results(tmp_path):
+    results = Results(StorageProcedure(), str(tmp_path / 'live.csv'))
+    worker = Worker(results)
+    worker.start()
+    worker.join(timeout=10)
+
+    t, current = results.get_columns('t (s)', 'I (A)')
+    assert np.shares_memory(t, results.live.column('t (s)'))
+    assert np.allclose(current[:1000], 1e-11 * np.arange(1000))
+    assert len(results.data) == 1001
+    assert np.allclose(Results.load(results.data_filename).data['t (s)'], t)
+
+    # Once the run is over, a store that dropped rows is left for the data file
+    results.live = LiveStore(StorageProcedure.DATA_COLUMNS, max_rows=10)
+    results.live.append(np.zeros((30, len(StorageProcedure.DATA_COLUMNS))))
+    assert len(results.data) == 1001
+
+
+def test_tail_reload(tmp_path):
+    filename = tmp_path / 'tail.csv'
+    results = Results(StorageProcedure(), str(filename))
+    with open(filename, 'a') as f:
+        f.write('0.0,1.0,2.0\n1.0,2.0')
+
+    assert results.data['t (s)'].tolist() == [0.]
+
+    results.append_metadata({'Samples': 2})
+    with open(filename, 'a') as f:
+        f.write(',3.0\n')
+
+    data = results.data
+    assert data['VL (V)'].tolist() == [2., 3.]
+    assert results._tail.rows == 2
+
+    # Columns missing from the file are added once, when it is first read
+    StorageProcedure.DATA_COLUMNS.append('T (degC)')
+    try:
+        assert Results.load(str(filename)).data['T (degC)'].isna().all()
+    finally:
+        StorageProcedure.DATA_COLUMNS.pop()
+
+
+def test_append_metadata(tmp_path):
+    filename = tmp_path / 'metadata.csv'
+    procedure = StorageProcedure()
+    procedure.evaluate_metadata()
+    results = Results(procedure, str(filename))
+    results.store_metadata()
+    with open(filename, 'a') as f:
+        f.write('0.0,1.0,2.0\n')
+        f.flush()
+        size = filename.stat().st_size
+        results.append_metadata({'Samples': 2})
+        f.write('1.0,2.0,3.0\n')
+
+    # The metadata is written over the padding, without moving the rows
+    assert filename.stat().st_size == size + len('1.0,2.0,3.0\n')
+    assert read_file_parameters(filename)['Samples'] == '2'
+    assert Results.load(str(filename)).data['VL (V)'].tolist() == [2., 3.]
+
+    results.append_metadata({'Notes': 'x' * Results.METADATA_RESERVE})
+    assert 'Notes' not in read_file_parameters(filename)
+
+
+def test_read_data(tmp_path):
+    filename = tmp_path / 'read.csv'
+    results = Results(StorageProcedure(), str(filename))
+    results.write({'t (s)': 0., 'I (A)': 1., 'VL (V)': 2.})
+    results.write({'t (s)': 1., 'I (A)': 3., 'VL (V)': 4.})
+    header_count = results._header_count
+
+    data = read_data(filename, ['VL (V)', 't (s)'], dtype=float, header_count=header_count)
+    assert data.columns.tolist() == ['VL (V)', 't (s)'] and data['VL (V)'].tolist() == [2., 4.]
+    assert [len(c) for c in iter_data(filename, ['I (A)'], chunksize=1)] == [1, 1]
+
+    binary = tmp_path / 'binary.csv'
+    results = Results(StorageProcedure(), str(binary), backend='npy')
+    results.write({'t (s)': 0., 'I (A)': 1., 'VL (V)': 2.})
+    data = read_data(binary, ['I (A)'], mmap=True)
+    assert isinstance(data['I (A)'].values, np.memmap) and data['I (A)'].tolist() == [1.]
+    assert next(iter_data(binary, ['VL (V)'])).columns.tolist() == ['VL (V)']
+
+
+def test_archive_file(tmp_path):
+    for backend in ('csv', 'npy'):
+        filename = tmp_path / f'{backend}.csv'
+        results = Results(StorageProcedure(), str(filename), backend=backend)
+        results.write({'t (s)': 0., 'I (A)': 1., 'VL (V)': 2.})
+
+        archive = archive_file(filename)
+        assert archive.name == f'{backend}.csv.gz' and not filename.exists()
+        assert not binary_path(filename).exists()
+
+        parameters, data = read_pymeasure(archive, ['I (A)'], dtype=float)
+        assert parameters['Procedure'].endswith('StorageProcedure>')
+        assert data['I (A)'].tolist() == [1.]
+        assert Results.load(str(archive)).data['VL (V)'].tolist() == [2.]
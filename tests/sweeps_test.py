@@ -0,0 +1,47 @@
+import numpy as np
+
+from laser_setup.procedures.sweeps import AdaptiveSweep, FixedSweep
+from laser_setup.utils import voltage_sweep_ramp
+
+
+def run_sweep(sweep, dp: float = 3.) -> np.ndarray:
+    voltages = []
+    for v in sweep:
+        sweep.update(v, 1e-6 * np.sqrt(1 + 0.05 * (v - dp)**2))
+        voltages.append(v)
+    return np.array(voltages)
+
+
+def test_fixed_sweep():
+    ramp = voltage_sweep_ramp(-1., 1., 0.5)
+    sweep = FixedSweep(ramp)
+    assert np.allclose(run_sweep(sweep), ramp)
+    assert sweep.progress == 100.
+
+
+def test_adaptive_sweep():
+    vertices = [0., -35., 35., -35., 0.]
+    sweep = AdaptiveSweep(vertices, 0.2, 400, focus=lambda: 3.)
+    voltages = run_sweep(sweep)
+
+    fixed_points = len(voltage_sweep_ramp(-35., 35., 0.2))
+    assert sweep.stats()['Fixed grid points'] == fixed_points
+    assert len(voltages) < fixed_points / 3
+    assert sweep.points == len(voltages)
+    assert np.isclose(sweep.progress, 100.)
+
+    # Every vertex is reached and the legs are monotonic
+    turns = np.flatnonzero(np.diff(np.sign(np.diff(voltages)))) + 1
+    assert np.allclose(voltages[[0, *turns, -1]], vertices)
+
+    # Fine steps around the focus, coarse steps on the flat tails
+    steps = np.abs(np.diff(voltages))
+    assert np.allclose(steps[np.abs(voltages[1:] - 3.) < 0.8], 0.2)
+    assert steps.max() == 1.
+
+
+def test_adaptive_sweep_budget():
+    sweep = AdaptiveSweep([0., -35., 35., -35., 0.], 0.2, 100)
+    voltages = run_sweep(sweep)
+    assert len(voltages) <= 100
+    assert voltages[-1] == 0.
@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from laser_setup.procedures.timeline import Segment, SteadyState, SteadyStateDetector, Timeline
+
+
+def test_timeline():
+    target = SimpleNamespace(laser=SimpleNamespace(voltage=None))
+    columns = ['t (s)', 'I (A)', 'VL (V)', 'T (C)']
+    entered = []
+    timeline = Timeline(target, [
+        Segment(1., {'laser.voltage': 0.}, {'VL (V)': 0.}),
+        Segment(2., {'laser.voltage': 3.}, {'VL (V)': 3.}),
+        Segment(0., {'laser.voltage': 5.}, {'VL (V)': 5.},
+                on_enter=lambda: entered.append(target.laser.voltage)),
+        Segment(1., {'laser.voltage': 0.}, {'VL (V)': 0.}),
+    ], columns)
+    assert timeline.progress((2.,)) == 50.
+
+    clock = iter(np.arange(0., 10., 0.25))
+    voltages = []
+
+    def read():
+        voltages.append(target.laser.voltage)
+        return next(clock), 1e-9
+
+    rows = []
+    assert timeline.run(read, rows.append)
+    rows = np.array(rows)
+
+    assert np.allclose(rows[:, 0], np.arange(0., 4.25, 0.25))
+    assert np.isnan(rows[:, 3]).all()
+    # The last sample of a segment is the first with t >= end
+    assert np.allclose(rows[:, 2], [0.] * 5 + [3.] * 8 + [0.] * 4)
+    assert voltages == rows[:, 2].tolist()
+    # Skipped segments are still entered
+    assert entered == [5.]
+
+
+def test_timeline_abort():
+    timeline = Timeline(None, [Segment(10.)], ['t (s)'])
+    rows = []
+    samples = iter(range(100))
+    assert not timeline.run(
+        lambda: (next(samples),), rows.append, should_stop=lambda: len(rows) >= 3
+    )
+    assert len(rows) == 3
+
+
+def test_timeline_steady_state():
+    steady_state = SteadyState(tolerance=0.01, window=5., hold=2.)
+    timeline = Timeline(None, [
+        Segment(100., tags={'VL (V)': 0.}, steady_state=steady_state),
+        Segment(10., tags={'VL (V)': 1.}),
+    ], ['t (s)', 'I (A)', 'VL (V)'])
+
+    clock = iter(np.arange(0., 1000., 0.1))
+
+    def read():
+        t = next(clock)
+        return t, 1e-6 * (1 + np.exp(-t))
+
+    rows = []
+    assert timeline.run(read, rows.append)
+    rows = np.array(rows)
+
+    first, second = timeline.durations
+    assert 5. < first < 20.
+    assert np.isclose(second, 10.)
+    assert np.isclose(rows[-1, 0], first + second)
+    assert np.isclose(timeline.progress(rows[-1]), 100.)
+    assert timeline.stats()['Segment durations'].endswith(' s')
+
+
+def test_steady_state_absolute():
+    # A temperature settling at 0 degC is never stable with a relative
+    # tolerance, but is with an absolute one
+    t = np.arange(0., 100., 0.5)
+    temperature = 5. * np.exp(-t / 5.)
+    for absolute, stable in ((False, False), (True, True)):
+        detector = SteadyStateDetector(SteadyState(0.1, window=10., absolute=absolute))
+        assert any(detector.update(*sample) for sample in zip(t, temperature)) == stable